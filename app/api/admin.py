@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import get_snapshot_dir
+from app.services.maintenance import (
+    MaintenanceJob,
+    compact_vectors,
+    create_snapshot,
+    get_maintenance_jobs,
+    get_request_gate,
+    list_snapshots,
+    restore_snapshot,
+)
+
+
+router = APIRouter()
+
+
+class MaintenanceGateMiddleware:
+    """Answers 503 to API requests while a restore or Chroma rebuild runs.
+
+    Admitted requests are tracked until their response (including a streamed
+    body) is finished, so maintenance can wait for them. Admin routes stay
+    reachable to follow the job.
+    """
+
+    def __init__(self, app) -> None:  # type: ignore[no-untyped-def]
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:  # type: ignore[no-untyped-def]
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if not path.startswith("/api/") or path.startswith("/api/admin/"):
+            await self.app(scope, receive, send)
+            return
+        gate = get_request_gate()
+        reason = gate.enter()
+        if reason is not None:
+            response = JSONResponse(
+                {"detail": f"Maintenance in progress: {reason}"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.leave()
+
+
+def _submit(kind: str, fn) -> dict:  # type: ignore[no-untyped-def]
+    try:
+        job: MaintenanceJob = get_maintenance_jobs().submit(kind, fn)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return job.to_dict()
+
+
+@router.post("/admin/vectors/compact", status_code=status.HTTP_202_ACCEPTED)
+def start_compaction() -> dict:
+    return _submit("compact", lambda progress: compact_vectors(progress=progress))
+
+
+@router.get("/admin/snapshots")
+def get_snapshots() -> list[dict]:
+    return list_snapshots()
+
+
+@router.post("/admin/snapshots", status_code=status.HTTP_202_ACCEPTED)
+def start_snapshot() -> dict:
+    return _submit("snapshot", lambda progress: create_snapshot(progress=progress))
+
+
+@router.post("/admin/snapshots/{name}/restore", status_code=status.HTTP_202_ACCEPTED)
+def start_restore(name: str) -> dict:
+    root = get_snapshot_dir()
+    source = root / name
+    # Only snapshot directories directly under the snapshot root can be restored
+    if Path(name).name != name or not (source / "manifest.json").exists():
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return _submit("restore", lambda progress: restore_snapshot(source, progress=progress))
+
+
+@router.get("/admin/jobs")
+def get_jobs() -> list[dict]:
+    return [job.to_dict() for job in get_maintenance_jobs().list()]
+
+
+@router.get("/admin/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    job = get_maintenance_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -53,7 +53,7 @@ async def upload_audio(
 	# Transcribe -> chunk -> embed -> persist with source_type=audio and timings
 	transcriber = AudioTranscriptionService()
 	try:
-		segments = transcriber.transcribe(data)
+		segments = transcriber.transcribe(data, suffix=suffix)
 	except Exception:
 		raise HTTPException(status_code=400, detail="Invalid or unreadable audio uploaded")
 
@@ -64,20 +64,16 @@ async def upload_audio(
 	# Approximate timings per chunk as overall bounds for now
 	start_time = float(segments[0]["start"]) if segments else 0.0
 	end_time = float(segments[-1]["end"]) if segments else 0.0
-	# Try to detect language if provided by model (monkeypatched tests may return in info instead)
-	transcription_language = None
-	try:
-		# If service exposes last language via attribute or segments metadata, capture it
-		# Our service doesn't expose directly; keep None for now
-		pass
-	except Exception:
-		pass
+	# Language detected by the model for this job (None when unavailable)
+	stats = transcriber.last_stats
+	transcription_language = stats.get("language")
 	metadatas = []
 	for i in range(len(chunks)):
 		m = {
 			"file_id": record.id,
 			"session_id": (session_id if session_id is not None else "GLOBAL"),
 			"chunk_index": i,
+			"file_name": record.name,
 			"source_type": "audio",
 			"start_time": start_time,
 			"end_time": end_time,
@@ -94,6 +90,7 @@ async def upload_audio(
 		"session_id": record.session_id,
 		"size_bytes": record.size_bytes,
 		"created_at": record.created_at.isoformat(),
+		"real_time_factor": stats.get("real_time_factor"),
 	}
 
 
@@ -127,7 +124,7 @@ def delete_audio(audio_id: str, db: Session = Depends(get_session)) -> Response:
 		raise HTTPException(status_code=404, detail="Audio not found")
 	# Delete vectors
 	rag = RagService()
-	rag._collection.delete(where={"file_id": audio_id})
+	rag.delete_file(audio_id)
 	# Delete original file if present
 	base = Path("data") / "uploads" / "audio"
 	for ext in SUPPORTED_EXTS:
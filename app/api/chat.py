@@ -2,23 +2,40 @@ from typing import AsyncGenerator, List
 import json
 import os
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+import asyncio
 
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+
+from sqlalchemy import func
 from sqlmodel import Session, select
 
 from app.core.db import get_session
 from app.models.session import SessionModel, MessageModel
-from app.models.settings import SearchSettingsModel
 from app.services.personality_service import PersonalityService
-from app.models.file import FileModel
-from app.services.rag import RagService
+from app.services.file_catalog import get_file_catalog
+from app.services.rag import RagService, vector_epoch
 from app.services.search_service import get_search_service
 from app.services.context_manager import ContextManager
-from app.services.token_count import TokenCounter
-from app.core.config import get_rag_token_budget, get_default_enabled_sources
+from app.services.cancellation import ClientDisconnected, DisconnectWatcher
+from app.services.llm_backend import LlmError, StreamStats, get_llm_backend_instance, sse_data
+from app.services.memory_artifacts import MemoryArtifactService
+from app.services.metrics import get_metrics
+from app.services.prompt_builder import get_prompt_builder
+from app.services.stage_scheduler import StageResult, StageScheduler
+from app.services.summary_scheduler import get_summary_scheduler
+from app.services.summary_cache import SummaryCache
+from app.services.settings_service import get_effective_settings, get_search_values
+from app.core.config import (
+    get_chat_stage_deadline_seconds,
+    get_default_enabled_sources,
+    get_llm_persist_interval_ms,
+    get_rag_per_turn_memory_budget_tokens,
+    get_rag_token_budget,
+)
 
 
 router = APIRouter()
@@ -27,8 +44,123 @@ router = APIRouter()
 _RAG_CACHE: dict[tuple[str, str], tuple[float, list[dict]]] = {}
 
 
+class _ReplyWriter:
+    """Accumulates streamed pieces and writes the assistant message incrementally."""
+
+    def __init__(self, db: Session, session_id: str, join, interval_seconds: float) -> None:  # type: ignore[no-untyped-def]
+        self._db = db
+        self._session_id = session_id
+        self._join = join
+        self._interval = interval_seconds
+        self._row: MessageModel | None = None
+        self._last_flush = time.perf_counter()
+        self.pieces: list[str] = []
+
+    def add(self, piece: str) -> None:
+        self.pieces.append(piece)
+        # First piece is written right away so a reload mid-stream shows the reply
+        if self._row is None or time.perf_counter() - self._last_flush >= self._interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pieces:
+            return
+        if self._row is None:
+            self._row = MessageModel(session_id=self._session_id, role="assistant", content="")
+        self._row.content = self._join(self.pieces)
+        self._db.add(self._row)
+        self._db.commit()
+        self._last_flush = time.perf_counter()
+
+
+async def _memory_stage(bind, session_id: str, num_msgs: int, question: str = "") -> dict | None:  # type: ignore[no-untyped-def]
+    # Task 013: context trimming & knowledge capture (own DB session: stages run concurrently)
+    with Session(bind) as db:
+        cm = ContextManager(db)
+        if not cm.should_trim(num_msgs):
+            return None
+        # The LLM summary is built in the background for the next turn; this turn uses the
+        # latest completed one, or a quick heuristic summary the first time trimming kicks in
+        summary = cm.get_last_summary(session_id)
+        if not summary:
+            summary = await cm.summarize_and_trim_async(session_id, keep_last_n=10, use_llm=False)
+        get_summary_scheduler().schedule(session_id, bind)
+        # One scoped query recalls older summary segments, facts and tool snippets for this
+        # question; the newest summary leads and everything fits the per-turn memory budget
+        budget = get_rag_per_turn_memory_budget_tokens()
+        bundle = await asyncio.to_thread(cm.recall_memory, session_id, question, budget)
+        summaries = bundle.texts("summary")
+        return {
+            "summary_included": bool(summaries),
+            "knowledge": bundle.texts("facts"),
+            "recalled": summaries[1:] + bundle.texts("tools"),
+            "summary": summaries[0] if summaries else "",
+            "budget_ok": bundle.tokens <= budget,
+            **bundle.to_debug(),
+            "summary_cache": SummaryCache.stats(),
+        }
+
+
+async def _personality_stage(bind, session_id: str, num_msgs: int) -> dict:  # type: ignore[no-untyped-def]
+    # Task 014: personality adaptation
+    with Session(bind) as db:
+        ps = PersonalityService(db)
+        # Throttle: adapt only every 3 user turns (approx by modulo of message count)
+        if num_msgs % 3 == 0:
+            before, after = ps.adapt_global_profile(session_id)
+        else:
+            before = after = ps.get_current()
+        effective = ps.get_effective_for_session(session_id)
+        return {"updated": before != after, "profile": effective, "instructions": ps.build_system_instructions(effective)}
+
+
+async def _search_stage(bind, session_id: str, last_user: str) -> dict | None:  # type: ignore[no-untyped-def]
+    # Task 012: internet search integration (debug-only comment lines)
+    try:
+        with Session(bind) as db:
+            search_settings = get_search_values(db)
+        allow_search = search_settings["allow_internet_search"]
+        debug_search = search_settings["debug_logging"]
+        bing_key = search_settings["bing_api_key"]
+    except Exception:
+        return None
+    if not (allow_search and last_user and any(k in last_user.lower() for k in ("latest", "news", "update", "recent"))):
+        return None
+    try:
+        search = get_search_service(debug_enabled=debug_search, bing_api_key=bing_key)
+        results = await search.search(last_user)
+    except Exception:
+        return {"query": last_user, "results": []}
+    try:
+        # Keep the snippets as `tools` memory so later turns can recall them without searching
+        await asyncio.to_thread(MemoryArtifactService().put_tools, session_id, last_user, results[:3])
+    except Exception:
+        pass
+    return {"query": last_user, "results": results[:3]}
+
+
+def _stage_debug_line(result: StageResult) -> bytes | None:
+    if not result.ok or result.value is None:
+        return None
+    if result.name == "memory":
+        payload = {k: v for k, v in result.value.items() if k != "summary"}
+        return f": MEMORY_DEBUG {json.dumps(payload)}\n\n".encode()
+    if result.name == "personality":
+        payload = {"updated": result.value["updated"], "profile": result.value["profile"]}
+        return f": PERSONALITY_DEBUG {json.dumps(payload)}\n\n".encode()
+    if result.name == "search":
+        return f": SEARCH_DEBUG {json.dumps(result.value)}\n\n".encode()
+    return None
+
+
+def _record_cancel(stage: str) -> None:
+    metrics = get_metrics()
+    metrics.incr("chat_cancelled_total")
+    metrics.incr(f"chat_cancelled_stage.{stage or 'unknown'}")
+
+
 @router.post("/chat")
-async def chat_endpoint(payload: dict, db: Session = Depends(get_session)) -> StreamingResponse:
+async def chat_endpoint(payload: dict, request: Request, db: Session = Depends(get_session)) -> Response:
     session_id = payload.get("session_id")
     messages: List[dict] | None = payload.get("messages")
     if not session_id or not isinstance(messages, list) or not messages:
@@ -43,8 +175,12 @@ async def chat_endpoint(payload: dict, db: Session = Depends(get_session)) -> St
     for msg in messages:
         db.add(MessageModel(session_id=session_id, role=msg.get("role", "user"), content=msg.get("content", "")))
     db.commit()
+    get_metrics().incr("chat_turns_total")
+
+    # Every awaited stage below is raced against client disconnect
+    watcher = DisconnectWatcher(request).start()
 
-    # RAG retrieval debug payload (Task 005 + Task 008)
+    # RAG retrieval always feeds the prompt; the flag only controls the RAG_DEBUG line (Task 005 + Task 008)
     rag_debug_mode = (os.getenv("RAG_DEBUG_MODE") or "true").lower() not in {"0", "false", "no"}
     user_contents = [m.get("content", "") for m in messages if m.get("role", "user") == "user"]
     last_user = user_contents[-1] if user_contents else ""
@@ -69,197 +205,233 @@ async def chat_endpoint(payload: dict, db: Session = Depends(get_session)) -> St
     should_skip_rag = len(last_user) < 10
 
     rag_debug_payload: dict = {"used": False, "citations": [], "chunks": [], "per_source": {"pdf": [], "image": [], "audio": []}}
-    if rag_debug_mode:
-        if not should_skip_rag:
-            # Try cache first
-            cache_key = (session_id, last_user, tuple(allowed_sources))
-            now = time.time()
-            cached = _RAG_CACHE.get(cache_key)
-            if cached and now - cached[0] <= cache_ttl_seconds:
-                results = cached[1]
-            else:
-                rag = RagService()
-                def _q_session() -> list[dict]:
-                    # Query within session scope (no source filter here; we'll split/filter later)
-                    return rag.query(last_user, top_k=rag_top_k_max, where={"session_id": session_id})
-                def _q_global(n: int) -> list[dict]:
-                    # Query within global scope
-                    return rag.query(last_user, top_k=n, where={"session_id": "GLOBAL"})
-
-                results_session: list[dict] = []
-                results_global: list[dict] = []
+    rag_context: list[str] = []
+    if not should_skip_rag:
+        # Try cache first
+        cache_key = (session_id, last_user, tuple(allowed_sources), vector_epoch())
+        now = time.time()
+        cached = _RAG_CACHE.get(cache_key)
+        if cached and now - cached[0] <= cache_ttl_seconds:
+            results = cached[1]
+        else:
+            rag = RagService()
+            # Soft-deleted files are excluded inside the vector query (is_deleted pre-filter)
+            def _q_session() -> list[dict]:
+                # Query within session scope (no source filter here; we'll split/filter later)
+                return rag.query(last_user, top_k=rag_top_k_max, where={"session_id": session_id})
+            def _q_global(n: int) -> list[dict]:
+                # Query within global scope
+                return rag.query(last_user, top_k=n, where={"session_id": "GLOBAL"})
+
+            results_session: list[dict] = []
+            results_global: list[dict] = []
+            # Awaited rather than blocking on .result() so the loop keeps serving and
+            # a disconnect abandons the lookup; queued queries are dropped on shutdown
+            ex = ThreadPoolExecutor(max_workers=2)
+            try:
+                fut_sess = ex.submit(_q_session)
                 try:
-                    with ThreadPoolExecutor(max_workers=2) as ex:
-                        fut_sess = ex.submit(_q_session)
-                        try:
-                            results_session = fut_sess.result(timeout=rag_timeout_seconds)
-                        except FuturesTimeout:
-                            results_session = []
-                        except Exception:
-                            results_session = []
-                        remaining = max(0, rag_top_k_max - len(results_session))
-                        if remaining > 0:
-                            fut_glob = ex.submit(_q_global, remaining)
-                            try:
-                                results_global = fut_glob.result(timeout=max(0.0, rag_timeout_seconds - 0.01))
-                            except FuturesTimeout:
-                                results_global = []
-                            except Exception:
-                                results_global = []
+                    results_session = await watcher.guard(
+                        asyncio.wait_for(asyncio.wrap_future(fut_sess), rag_timeout_seconds), "rag"
+                    )
+                except ClientDisconnected:
+                    results_session = []
                 except Exception:
-                    results_session, results_global = [], []
-                # Merge session+global first
-                results = results_session + results_global
-                _RAG_CACHE[cache_key] = (now, results)
-
-            file_ids = {r.get("metadata", {}).get("file_id") for r in results if r.get("metadata")}
-            id_to_name: dict[str, str] = {}
-            soft_deleted_ids: set[str] = set()
-            if file_ids:
-                rows = db.exec(select(FileModel).where(FileModel.id.in_(list(file_ids)))).all()
-                id_to_name = {row.id: row.name for row in rows}
-                soft_deleted_ids = {row.id for row in rows if getattr(row, "is_soft_deleted", False)}
-
-            # Split by source_type for Task 008; default missing to "pdf"
-            def _infer_source(meta: dict | None) -> str:
-                if not meta:
-                    return "pdf"
-                st = meta.get("source_type")
-                return (st or "pdf").lower()
-
-            # Exclude soft-deleted files from RAG context
-            if soft_deleted_ids:
-                results = [r for r in results if r.get("metadata", {}).get("file_id") not in soft_deleted_ids]
-            # Apply threshold first
-            filtered = [r for r in results if (r.get("score") is None or r.get("score") >= sim_threshold)]
-            per_source: dict[str, list[dict]] = {"pdf": [], "image": [], "audio": []}
-            for r in filtered:
-                src = _infer_source(r.get("metadata"))
-                if src not in per_source:
-                    # Ignore unknown source types in debug
-                    continue
-                per_source[src].append(r)
-
-            # Sort each source list by score desc (None last)
-            def _score_key(item: dict) -> float:
-                s = item.get("score")
-                return s if isinstance(s, (int, float)) else -1.0
-
-            for k in per_source.keys():
-                per_source[k].sort(key=_score_key, reverse=True)
-
-            # Apply source filter: only keep allowed in both per_source and overall selection pool
-            filtered_allowed: list[dict] = []
-            debug_per_source: dict[str, list[dict]] = {"pdf": [], "image": [], "audio": []}
-            for k, vals in per_source.items():
-                if k in allowed_sources:
-                    debug_per_source[k] = [
-                        {"id": v.get("id"), "metadata": v.get("metadata", {}), "score": v.get("score")}
-                        for v in vals
-                    ]
-                    filtered_allowed.extend(vals)
-                else:
-                    debug_per_source[k] = []
-
-            # Build overall selection sorted by score
-            filtered_allowed.sort(key=_score_key, reverse=True)
-            if should_skip_rag and not filtered:
-                rag_debug_payload = {"used": False, "citations": [], "chunks": [], "per_source": debug_per_source}
+                    results_session = []
+                remaining = max(0, rag_top_k_max - len(results_session))
+                if remaining > 0 and not watcher.disconnected:
+                    fut_glob = ex.submit(_q_global, remaining)
+                    try:
+                        results_global = await watcher.guard(
+                            asyncio.wait_for(asyncio.wrap_future(fut_glob), max(0.0, rag_timeout_seconds - 0.01)), "rag"
+                        )
+                    except ClientDisconnected:
+                        results_global = []
+                    except Exception:
+                        results_global = []
+            finally:
+                ex.shutdown(wait=False, cancel_futures=True)
+            if watcher.disconnected:
+                watcher.stop()
+                _record_cancel("rag")
+                # Nobody is listening; 499 is the conventional "client closed request"
+                return Response(status_code=499)
+            # Merge session+global first
+            results = results_session + results_global
+            _RAG_CACHE[cache_key] = (now, results)
+
+        # Citation names come from chunk metadata; the catalog only covers legacy chunks
+        id_to_name: dict[str, str] = {}
+        for r in results:
+            meta = r.get("metadata") or {}
+            if meta.get("file_id") and meta.get("file_name"):
+                id_to_name[meta["file_id"]] = meta["file_name"]
+        unnamed = {(r.get("metadata") or {}).get("file_id") for r in results} - set(id_to_name) - {None}
+        if unnamed:
+            id_to_name.update({fid: e.name for fid, e in get_file_catalog().lookup(unnamed, db).items()})
+
+        # Split by source_type for Task 008; default missing to "pdf"
+        def _infer_source(meta: dict | None) -> str:
+            if not meta:
+                return "pdf"
+            st = meta.get("source_type")
+            return (st or "pdf").lower()
+
+        # Apply threshold first
+        filtered = [r for r in results if (r.get("score") is None or r.get("score") >= sim_threshold)]
+        per_source: dict[str, list[dict]] = {"pdf": [], "image": [], "audio": []}
+        for r in filtered:
+            src = _infer_source(r.get("metadata"))
+            if src not in per_source:
+                # Ignore unknown source types in debug
+                continue
+            per_source[src].append(r)
+
+        # Sort each source list by score desc (None last)
+        def _score_key(item: dict) -> float:
+            s = item.get("score")
+            return s if isinstance(s, (int, float)) else -1.0
+
+        for k in per_source.keys():
+            per_source[k].sort(key=_score_key, reverse=True)
+
+        # Apply source filter: only keep allowed in both per_source and overall selection pool
+        filtered_allowed: list[dict] = []
+        debug_per_source: dict[str, list[dict]] = {"pdf": [], "image": [], "audio": []}
+        for k, vals in per_source.items():
+            if k in allowed_sources:
+                debug_per_source[k] = [
+                    {"id": v.get("id"), "metadata": v.get("metadata", {}), "score": v.get("score")}
+                    for v in vals
+                ]
+                filtered_allowed.extend(vals)
             else:
-                # Truncate by approximate token budget: assume ~500 tokens per chunk as default
-                approx_tokens_per_chunk = 350
-                max_chunks_by_budget = max(1, rag_token_budget // approx_tokens_per_chunk)
-                selected = filtered_allowed[: min(len(filtered_allowed), max_chunks_by_budget, rag_top_k_max)]
-
-                citations: list[str] = []
-                chunks_debug: list[dict] = []
-                for r in selected:
-                    meta = r.get("metadata", {})
-                    fid = meta.get("file_id")
-                    idx = meta.get("chunk_index")
-                    fname = id_to_name.get(fid, fid or "unknown.pdf")
-                    if isinstance(idx, int):
-                        citations.append(f"{fname}#{idx}")
-                    else:
-                        citations.append(f"{fname}#0")
-                    chunks_debug.append({
-                        "id": r.get("id"),
-                        "metadata": meta,
-                        "score": r.get("score"),
-                    })
-
-                rag_debug_payload = {"used": bool(selected), "citations": citations, "chunks": chunks_debug, "per_source": debug_per_source}
-
-    async def event_stream() -> AsyncGenerator[bytes, None]:
-        if rag_debug_mode:
-            yield f": RAG_DEBUG {json.dumps(rag_debug_payload)}\n\n".encode()
+                debug_per_source[k] = []
 
-        # Task 013: Context trimming & knowledge capture
-        cm = ContextManager(db)
-        # Count messages and maybe trim
-        # Note: count includes just-persisted user messages (assistant not yet added)
-        num_msgs = len(
-            db.exec(select(MessageModel).where(MessageModel.session_id == session_id)).all()
-        )
-        memory_debug = {"summary_included": False, "knowledge": [], "budget_ok": True}
-        if cm.should_trim(num_msgs):
-            summary = await cm.summarize_and_trim_async(session_id, keep_last_n=10)
-            memory_debug["summary_included"] = bool(summary)
-            # Retrieve top-5 knowledge entries
-            entries = cm.list_knowledge(session_id, limit=5)
-            memory_debug["knowledge"] = [f"{e.key}: {e.value}" for e in entries]
-            # Crude budget check: ensure total injected memory text length is under limit
-            mem_text = (summary or "") + "\n" + "\n".join(memory_debug["knowledge"])
-            approx_tokens = TokenCounter.estimate_tokens(mem_text)
-            memory_debug["budget_ok"] = approx_tokens <= max(1, get_rag_token_budget())
-            yield f": MEMORY_DEBUG {json.dumps(memory_debug)}\n\n".encode()
-
-        # Task 014: Personality adaptation and debug line
-        ps = PersonalityService(db)
-        # Detect/adapt personality from recent messages (lightweight) with throttling to reduce overhead
-        # Throttle: adapt only every 3 user turns (approx by modulo of message count)
-        should_adapt = (num_msgs % 3 == 0)
-        if should_adapt:
-            before, after = ps.adapt_global_profile(session_id)
+        # Build overall selection sorted by score
+        filtered_allowed.sort(key=_score_key, reverse=True)
+        if should_skip_rag and not filtered:
+            rag_debug_payload = {"used": False, "citations": [], "chunks": [], "per_source": debug_per_source}
         else:
-            before = after = ps.get_current()
-        effective = ps.get_effective_for_session(session_id)
-        # Emit debug line to surface effective profile used for this turn
-        yield f": PERSONALITY_DEBUG {json.dumps({'updated': (before != after), 'profile': effective})}\n\n".encode()
+            # Truncate by approximate token budget: assume ~500 tokens per chunk as default
+            approx_tokens_per_chunk = 350
+            max_chunks_by_budget = max(1, rag_token_budget // approx_tokens_per_chunk)
+            selected = filtered_allowed[: min(len(filtered_allowed), max_chunks_by_budget, rag_top_k_max)]
+            rag_context = [r["text"] for r in selected if r.get("text")]
+
+            citations: list[str] = []
+            chunks_debug: list[dict] = []
+            for r in selected:
+                meta = r.get("metadata", {})
+                fid = meta.get("file_id")
+                idx = meta.get("chunk_index")
+                fname = id_to_name.get(fid, fid or "unknown.pdf")
+                if isinstance(idx, int):
+                    citations.append(f"{fname}#{idx}")
+                else:
+                    citations.append(f"{fname}#0")
+                chunks_debug.append({
+                    "id": r.get("id"),
+                    "metadata": meta,
+                    "score": r.get("score"),
+                })
+
+            rag_debug_payload = {"used": bool(selected), "citations": citations, "chunks": chunks_debug, "per_source": debug_per_source}
 
-        # Task 012: Internet search integration (debug-only comment lines)
+    async def event_stream() -> AsyncGenerator[bytes, None]:
+        reply: _ReplyWriter | None = None
+        scheduler: StageScheduler | None = None
         try:
-            # Load search settings
-            srow = db.get(SearchSettingsModel, 1)
-            allow_search = bool(getattr(srow, "allow_internet_search", False)) if srow else False
-            debug_search = bool(getattr(srow, "debug_logging", False)) if srow else False
-            bing_key = getattr(srow, "bing_api_key", None) if srow else None
-        except Exception:
-            allow_search = False
-            debug_search = False
-            bing_key = None
-
-        search_debug_payload = None
-        if allow_search and last_user and any(k in last_user.lower() for k in ("latest", "news", "update", "recent")):
+            if rag_debug_mode:
+                yield f": RAG_DEBUG {json.dumps(rag_debug_payload)}\n\n".encode()
+
+            # Tasks 012-014: memory trimming, personality adaptation and web search are independent,
+            # so they run concurrently; each debug line is streamed as soon as its stage finishes
+            num_msgs = db.exec(
+                select(func.count()).select_from(MessageModel).where(MessageModel.session_id == session_id)
+            ).one()
+            bind = db.get_bind()
+            scheduler = StageScheduler(get_chat_stage_deadline_seconds())
+            scheduler.add("memory", lambda: _memory_stage(bind, session_id, num_msgs, last_user))
+            scheduler.add("personality", lambda: _personality_stage(bind, session_id, num_msgs))
+            scheduler.add("search", lambda: _search_stage(bind, session_id, last_user))
+            scheduler.start()
+            # Generation needs the trimmed history/summary and the profile, not search results
+            async for result in watcher.iterate(scheduler.until(("memory", "personality")), "stages"):
+                line = _stage_debug_line(result)
+                if line:
+                    yield line
+
+            # Generation: stream backend pieces straight out as SSE while persisting the reply incrementally
+            # Stages committed through their own sessions; drop anything this one cached
+            db.expire_all()
+            history_rows = db.exec(
+                select(MessageModel)
+                .where(MessageModel.session_id == session_id, MessageModel.is_trimmed == False)  # noqa: E712
+                .order_by(MessageModel.created_at)
+            ).all()
+            personality = scheduler.results["personality"].value or {}
+            memory = scheduler.results["memory"].value or {}
+            summary_text = memory.get("summary", "")
+            if not memory:
+                session_row = db.get(SessionModel, session_id)
+                summary_text = ((session_row.metadata_json or {}).get("last_summary") if session_row else None) or ""
+            prompt = get_prompt_builder().build(
+                session_id,
+                history=[{"role": m.role, "content": m.content} for m in history_rows],
+                personality=personality.get("instructions", ""),
+                summary=summary_text,
+                knowledge=memory.get("knowledge", []),
+                recalled=memory.get("recalled", []),
+                context=rag_context,
+            )
+            yield f": PROMPT_DEBUG {json.dumps(prompt.debug())}\n\n".encode()
+            llm_messages = prompt.messages
+            backend = get_llm_backend_instance()
+            stats = StreamStats(backend=backend.name, model=backend.model, started=time.perf_counter())
+            reply = _ReplyWriter(db, session_id, backend.join, get_llm_persist_interval_ms() / 1000.0)
+            error: str | None = None
             try:
-                search = get_search_service(debug_enabled=debug_search, bing_api_key=bing_key)
-                # Perform async search
-                results = await search.search(last_user)
-                search_debug_payload = {"query": last_user, "results": results[:3]}
-            except Exception:
-                search_debug_payload = {"query": last_user, "results": []}
-
-        if search_debug_payload is not None:
-            yield f": SEARCH_DEBUG {json.dumps(search_debug_payload)}\n\n".encode()
-
-        # Persist assistant reply (mock) after memory handling to keep ordering similar to prior tests
-        assistant_full = "Hello from mock AI!"
-        db.add(MessageModel(session_id=session_id, role="assistant", content=assistant_full))
-        db.commit()
-
-        tokens = ["Hello", "from", "mock", "AI!"]
-        for token in tokens:
-            yield f"data: {token}\n\n".encode()
+                stream = backend.stream(llm_messages, get_effective_settings(db, session_id))
+                async for piece in watcher.iterate(stream, "generate"):
+                    stats.mark()
+                    yield sse_data(piece)
+                    reply.add(piece)
+                    # Stages generation did not wait for (search) report in between tokens
+                    for result in scheduler.ready():
+                        line = _stage_debug_line(result)
+                        if line:
+                            yield line
+            except (LlmError, httpx.HTTPError, ValueError) as exc:
+                error = str(exc) or exc.__class__.__name__
+            stats.finished_at = time.perf_counter()
+            reply.flush()
+            debug = stats.to_dict()
+            if debug["ttft_ms"] is not None:
+                get_metrics().observe("chat_ttft_ms", debug["ttft_ms"])
+            get_metrics().observe("chat_generation_ms", debug["total_ms"])
+            if error is not None:
+                debug["error"] = error
+            yield f": LLM_DEBUG {json.dumps(debug)}\n\n".encode()
+            async for result in watcher.iterate(scheduler.until(), "stages"):
+                line = _stage_debug_line(result)
+                if line:
+                    yield line
+            stage_times = {name: r.to_dict() for name, r in scheduler.results.items()}
+            for name, r in scheduler.results.items():
+                get_metrics().observe(f"chat_stage_ms.{name}", r.elapsed_ms)
+            yield f": STAGES_DEBUG {json.dumps(stage_times)}\n\n".encode()
+        except (ClientDisconnected, asyncio.CancelledError, GeneratorExit) as exc:
+            # Client went away: keep what was generated, stop every remaining stage
+            if reply is not None:
+                reply.flush()
+            _record_cancel(exc.stage if isinstance(exc, ClientDisconnected) else "stream")
+            if not isinstance(exc, ClientDisconnected):
+                raise
+        finally:
+            if scheduler is not None:
+                scheduler.cancel()
+            watcher.stop()
     return StreamingResponse(
         event_stream(),
         media_type="text/event-stream",
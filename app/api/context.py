@@ -46,6 +46,15 @@ def restore_trimmed(payload: dict, db: Session = Depends(get_session)) -> dict:
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     cm = ContextManager(db)
+    from_id = payload.get("from_id")
+    if from_id is not None:
+        # Range restore: {"from_id": 10, "to_id": 20} (to_id optional)
+        try:
+            to_id = payload.get("to_id")
+            restored = cm.restore_range(session_id, int(from_id), int(to_id) if to_id is not None else None)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="from_id/to_id must be integers")
+        return {"restored": restored}
     restored = cm.restore_trimmed(session_id, count)
     return {"restored": restored}
 
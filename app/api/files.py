@@ -10,7 +10,9 @@ from sqlmodel import Session, select
 
 from app.core.db import get_session
 from app.models.file import FileModel
+from app.services.file_catalog import get_file_catalog
 from app.services.rag import RagService
+from app.services.ingest import BatchIngestPipeline
 
 
 router = APIRouter()
@@ -44,7 +46,7 @@ async def upload_file(
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid or corrupted PDF uploaded")
     chunks = rag.chunk_text(text, chunk_size=320, overlap=40)
-    rag.persist_chunks(file_id=record.id, session_id=session_id, chunks=chunks)
+    rag.persist_chunks(file_id=record.id, session_id=session_id, chunks=chunks, file_name=record.name)
 
     return {
         "id": record.id,
@@ -141,26 +143,10 @@ def list_files(
     return out
 
 
-@router.delete("/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_file(file_id: str, mode: str = Query(default="hard", pattern="^(soft|hard)$"), db: Session = Depends(get_session)) -> Response:
-    rec = db.get(FileModel, file_id)
-    if not rec:
-        raise HTTPException(status_code=404, detail="File not found")
-    rag = RagService()
-    if mode == "soft":
-        # Mark as soft-deleted to hide from listings but keep vectors/originals
-        rec.is_soft_deleted = True
-        db.add(rec)
-        db.commit()
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
-    # Hard delete: remove vectors and DB record
+def remove_stored_original(file_id: str, name: str) -> None:
+    """Remove a file's stored original if present (pdf/image/audio)."""
     try:
-        rag._collection.delete(where={"file_id": file_id})
-    except Exception:
-        pass
-    # Remove stored originals if present (pdf/image/audio)
-    try:
-        suffix = Path(rec.name).suffix.lower()
+        suffix = Path(name).suffix.lower()
         if suffix == ".pdf":
             pdf_path = Path("data") / "uploads" / "pdfs" / f"{file_id}.pdf"
             if pdf_path.exists():
@@ -179,33 +165,59 @@ def delete_file(file_id: str, mode: str = Query(default="hard", pattern="^(soft|
                     p.unlink(missing_ok=True)  # type: ignore[arg-type]
     except Exception:
         pass
+
+
+@router.delete("/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_file(file_id: str, mode: str = Query(default="hard", pattern="^(soft|hard)$"), db: Session = Depends(get_session)) -> Response:
+    rec = db.get(FileModel, file_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+    rag = RagService()
+    if mode == "soft":
+        # Mark as soft-deleted to hide from listings but keep vectors/originals
+        rec.is_soft_deleted = True
+        db.add(rec)
+        db.commit()
+        get_file_catalog().invalidate(file_id)
+        # Mirror into chunk metadata so retrieval pre-filters it
+        try:
+            rag.set_file_deleted(file_id, True)
+        except Exception:
+            pass
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    # Hard delete: remove vectors and DB record
+    try:
+        rag.delete_file(file_id)
+    except Exception:
+        pass
+    remove_stored_original(file_id, rec.name)
     db.delete(rec)
     db.commit()
+    get_file_catalog().invalidate(file_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.post("/files/{file_id}/restore")
+def restore_file(file_id: str, db: Session = Depends(get_session)) -> dict:
+    rec = db.get(FileModel, file_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+    rec.is_soft_deleted = False
+    db.add(rec)
+    db.commit()
+    get_file_catalog().invalidate(file_id)
+    try:
+        RagService().set_file_deleted(file_id, False)
+    except Exception:
+        pass
+    return {"id": rec.id, "is_soft_deleted": rec.is_soft_deleted}
+
+
 @router.post("/files/upload", status_code=status.HTTP_201_CREATED)
 async def multi_upload(files: list[UploadFile] = File(...), session_id: Optional[str] = Form(default=None), db: Session = Depends(get_session)) -> list[dict]:
-    created: list[dict] = []
-    for uf in files:
-        suffix = Path(uf.filename).suffix.lower()
-        if suffix == ".pdf":
-            # Reuse upload_file logic
-            data = await upload_file(file=uf, session_id=session_id, db=db)
-            created.append(data)
-        elif suffix in {".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"}:
-            # route to images.upload_image
-            from app.api.images import upload_image
-            data = await upload_image(file=uf, session_id=session_id, db=db)
-            created.append(data)
-        elif suffix in {".mp3", ".wav", ".m4a", ".flac", ".ogg"}:
-            from app.api.audio import upload_audio
-            data = await upload_audio(file=uf, session_id=session_id, db=db)
-            created.append(data)
-        else:
-            # skip unsupported file silently for queue robustness
-            continue
-    return created
+    # Concurrent extraction with per-type limits and batched embeddings; one result per input file
+    pipeline = BatchIngestPipeline(db, session_id=session_id)
+    return await pipeline.run(files)
 
 
 @router.post("/files/{file_id}/reassign")
@@ -217,37 +229,39 @@ def reassign_file(file_id: str, payload: dict, db: Session = Depends(get_session
     rec.session_id = new_session_id
     db.add(rec)
     db.commit()
+    get_file_catalog().invalidate(file_id)
 
-    # Update vector metadata session_id
-    rag = RagService()
+    # Move vectors to the new session; stored embeddings are reused, not recomputed
     try:
-        got = rag._collection.get(where={"file_id": file_id})  # returns ids, documents, metadatas
-        ids = got.get("ids", [])
-        documents = got.get("documents", [])
-        metadatas = got.get("metadatas", [])
-        if ids and isinstance(ids[0], list):
-            ids = ids[0]
-            documents = documents[0]
-            metadatas = metadatas[0]
-        if ids:
-            # delete then re-add with updated metadatas and fresh embeddings
-            rag._collection.delete(ids=ids)
-            for m in metadatas:
-                m["session_id"] = new_session_id if new_session_id is not None else "GLOBAL"
-            try:
-                embeddings = rag._embedder.embed(documents)  # type: ignore[attr-defined]
-            except Exception:
-                embeddings = None
-            if embeddings is not None:
-                rag._collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
-            else:
-                rag._collection.add(ids=ids, documents=documents, metadatas=metadatas)
+        RagService().reassign_file(file_id, new_session_id)
     except Exception:
         pass
 
     return {"id": rec.id, "session_id": rec.session_id}
 
 
+@router.post("/files/{file_id}/rename")
+def rename_file(file_id: str, payload: dict, db: Session = Depends(get_session)) -> dict:
+    new_name = str(payload.get("name") or "").strip()
+    if not new_name:
+        raise HTTPException(status_code=400, detail="name is required")
+    rec = db.get(FileModel, file_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+    rec.name = new_name
+    db.add(rec)
+    db.commit()
+    get_file_catalog().invalidate(file_id)
+
+    # Keep the display name stored on chunks in sync for citations
+    try:
+        RagService().rename_file(file_id, new_name)
+    except Exception:
+        pass
+
+    return {"id": rec.id, "name": rec.name}
+
+
 @router.post("/files/{file_id}/reprocess")
 def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
     rec = db.get(FileModel, file_id)
@@ -261,7 +275,7 @@ def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
         if not pdf_path.exists():
             return {"status": "ok", "id": rec.id}
         try:
-            rag._collection.delete(where={"file_id": file_id})
+            rag.delete_file(file_id)
         except Exception:
             pass
         data = pdf_path.read_bytes()
@@ -270,14 +284,14 @@ def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
         except Exception:
             return {"status": "ok", "id": rec.id}
         chunks = rag.chunk_text(text, chunk_size=320, overlap=40)
-        rag.persist_chunks(file_id=file_id, session_id=rec.session_id, chunks=chunks)
+        rag.persist_chunks(file_id=file_id, session_id=rec.session_id, chunks=chunks, file_name=rec.name)
         return {"status": "ok", "id": rec.id}
     else:
         # For image/audio originals we saved on disk; try to rebuild text
         if suffix in {".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".webp"}:
             # Remove existing vectors before re-adding
             try:
-                rag._collection.delete(where={"file_id": file_id})
+                rag.delete_file(file_id)
             except Exception:
                 pass
             base = Path("data") / "uploads" / "images"
@@ -292,10 +306,10 @@ def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
                 ocr = OcrService()
                 text = ocr.extract_text(path.read_bytes())
                 chunks = rag.chunk_text(text, chunk_size=320, overlap=40)
-                rag.persist_chunks(file_id=file_id, session_id=rec.session_id, chunks=chunks, source_type="image")
+                rag.persist_chunks(file_id=file_id, session_id=rec.session_id, chunks=chunks, source_type="image", file_name=rec.name)
         elif suffix in {".mp3", ".wav", ".m4a", ".flac", ".ogg"}:
             try:
-                rag._collection.delete(where={"file_id": file_id})
+                rag.delete_file(file_id)
             except Exception:
                 pass
             base = Path("data") / "uploads" / "audio"
@@ -308,7 +322,7 @@ def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
             if path and path.exists():
                 from app.services.transcription import AudioTranscriptionService
                 transcriber = AudioTranscriptionService()
-                segments = transcriber.transcribe(path.read_bytes())
+                segments = transcriber.transcribe(path.read_bytes(), suffix=path.suffix)
                 full_text = " ".join(s.get("text", "") for s in segments).strip()
                 chunks = rag.chunk_text(full_text, chunk_size=320, overlap=40)
                 metadatas = []
@@ -320,6 +334,7 @@ def reprocess_file(file_id: str, db: Session = Depends(get_session)) -> dict:
                             "file_id": file_id,
                             "session_id": (rec.session_id if rec.session_id is not None else "GLOBAL"),
                             "chunk_index": i,
+                            "file_name": rec.name,
                             "source_type": "audio",
                             "start_time": start_time,
                             "end_time": end_time,
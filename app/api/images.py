@@ -54,7 +54,7 @@ async def upload_image(
         raise HTTPException(status_code=400, detail="Invalid or unreadable image uploaded")
     rag = RagService()
     chunks = rag.chunk_text(text, chunk_size=320, overlap=40)
-    rag.persist_chunks(file_id=record.id, session_id=session_id, chunks=chunks, source_type="image")
+    rag.persist_chunks(file_id=record.id, session_id=session_id, chunks=chunks, source_type="image", file_name=record.name)
 
     return {
         "id": record.id,
@@ -93,7 +93,7 @@ def delete_image(image_id: str, db: Session = Depends(get_session)) -> Response:
         raise HTTPException(status_code=404, detail="Image not found")
     # Delete vectors
     rag = RagService()
-    rag._collection.delete(where={"file_id": image_id})
+    rag.delete_file(image_id)
     # Delete original file if present
     base = Path("data") / "uploads" / "images"
     for ext in SUPPORTED_EXTS:
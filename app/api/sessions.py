@@ -4,8 +4,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import delete
 from sqlmodel import Session, select
 
+from app.api.files import remove_stored_original
 from app.core.db import get_session
+from app.models.file import FileModel
 from app.models.session import SessionModel, MessageModel
+from app.services.file_catalog import get_file_catalog
 
 
 router = APIRouter()
@@ -73,8 +76,25 @@ def delete_session(session_id: str, db: Session = Depends(get_session)) -> None:
         raise HTTPException(status_code=404, detail="Session not found")
     # Ensure messages are removed
     db.exec(delete(MessageModel).where(MessageModel.session_id == session_id))
+    # Session-scoped files are private to it, so they go with the session
+    files = list(db.exec(select(FileModel).where(FileModel.session_id == session_id)).all())
+    file_ids = [rec.id for rec in files]
+    for rec in files:
+        remove_stored_original(rec.id, rec.name)
+        db.delete(rec)
     db.delete(session)
     db.commit()
+    catalog = get_file_catalog()
+    for file_id in file_ids:
+        catalog.invalidate(file_id)
+    # Their chunks and the session's memory artifacts are all scoped to the session
+    # (a single partition when VECTOR_PARTITIONS is on)
+    try:
+        from app.services.rag import RagService
+
+        RagService().drop_session(session_id)
+    except Exception:
+        pass
     return None
 
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
+from app.services.metrics import get_metrics
 from app.services.system_monitor import get_system_monitor
 
 
@@ -28,3 +29,6 @@ def update_system_settings(payload: dict) -> dict:
     return monitor.update_settings(mode=mode, debug_logging=debug_logging)
 
 
+@router.get("/system/metrics")
+def get_system_metrics() -> dict:
+    return get_metrics().snapshot()
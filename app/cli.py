@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+
+def _cmd_ann_bench(args: argparse.Namespace) -> int:
+    from app.services.ann_index import benchmark
+
+    settings = None
+    if args.nprobe or args.ef:
+        settings = [{"kind": "IVF", "nprobe": p, "nlist": args.nlist} for p in args.nprobe or []]
+        settings += [{"kind": "HNSW", "ef_search": ef} for ef in args.ef or []]
+    report = benchmark(n=args.n, dim=args.dim, queries=args.queries, k=args.k, settings=settings, seed=args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"corpus={args.n} dim={args.dim} queries={args.queries} k={args.k}")
+    print(f"{'index':<32} {'recall@k':>9} {'p50 ms':>9} {'p95 ms':>9} {'build s':>8}")
+    for row in report:
+        print(f"{row['index']:<32} {row['recall_at_k']:>9.4f} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['build_s']:>8.2f}")
+    return 0
+
+
+def _print_progress(phase: str, done: int, total: int) -> None:
+    print(f"\r{phase}: {done}/{total}", end="", file=sys.stderr, flush=True)
+    if done >= total:
+        print(file=sys.stderr)
+
+
+def _cmd_compact(args: argparse.Namespace) -> int:
+    from app.services.maintenance import compact_vectors
+
+    print(json.dumps(compact_vectors(progress=_print_progress), indent=2))
+    return 0
+
+
+def _cmd_snapshot(args: argparse.Namespace) -> int:
+    from app.services.maintenance import create_snapshot
+
+    dest = Path(args.dest) if args.dest else None
+    print(json.dumps(create_snapshot(dest, progress=_print_progress), indent=2))
+    return 0
+
+
+def _cmd_snapshots(args: argparse.Namespace) -> int:
+    from app.services.maintenance import list_snapshots
+
+    print(json.dumps(list_snapshots(), indent=2))
+    return 0
+
+
+def _cmd_restore(args: argparse.Namespace) -> int:
+    from app.core.config import get_snapshot_dir
+    from app.services.maintenance import restore_snapshot
+
+    source = Path(args.snapshot)
+    if not source.exists():
+        source = get_snapshot_dir() / args.snapshot
+    if not (source / "manifest.json").exists():
+        print(f"Snapshot not found: {args.snapshot}", file=sys.stderr)
+        return 1
+    print(json.dumps(restore_snapshot(source, progress=_print_progress), indent=2))
+    return 0
+
+
+def _cmd_llm_standin(args: argparse.Namespace) -> int:
+    import uvicorn
+
+    from app.services.llm_standin import create_standin_app
+
+    app = create_standin_app(first_token_delay_ms=args.first_token_delay_ms, token_delay_ms=args.token_delay_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Garmin backend maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("ann-bench", help="Recall@k vs latency of ANN indexes against brute force")
+    bench.add_argument("--n", type=int, default=100000, help="synthetic corpus size")
+    bench.add_argument("--dim", type=int, default=384)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--k", type=int, default=10)
+    bench.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = sqrt(n))")
+    bench.add_argument("--nprobe", type=int, nargs="*", help="IVF nprobe values to sweep")
+    bench.add_argument("--ef", type=int, nargs="*", help="HNSW ef_search values to sweep (needs hnswlib)")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--json", action="store_true", help="print the report as JSON")
+    bench.set_defaults(func=_cmd_ann_bench)
+
+    compact = sub.add_parser("compact", help="Reclaim space left by deleted vectors (Chroma: servers answer 503 meanwhile)")
+    compact.set_defaults(func=_cmd_compact)
+
+    snap = sub.add_parser("snapshot", help="Snapshot the database, vectors and uploaded originals")
+    snap.add_argument("--dest", help="target directory (default: SNAPSHOT_DIR/<timestamp>)")
+    snap.set_defaults(func=_cmd_snapshot)
+
+    sub.add_parser("snapshots", help="List snapshots").set_defaults(func=_cmd_snapshots)
+
+    restore = sub.add_parser("restore", help="Restore a snapshot (running servers answer 503 until it finishes)")
+    restore.add_argument("snapshot", help="snapshot name or path")
+    restore.set_defaults(func=_cmd_restore)
+
+    standin = sub.add_parser("llm-standin", help="Serve a fake Ollama/OpenAI-compatible streaming endpoint")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=11434)
+    standin.add_argument("--first-token-delay-ms", type=float, default=0.0)
+    standin.add_argument("--token-delay-ms", type=float, default=0.0)
+    standin.set_defaults(func=_cmd_llm_standin)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
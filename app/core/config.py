@@ -64,3 +64,412 @@ def get_default_enabled_sources() -> list[str]:
     return ["pdf", "image", "audio"]
 
 
+def get_whisper_device() -> str:
+    return os.getenv("WHISPER_DEVICE", "cpu")
+
+
+def get_whisper_compute_type() -> str:
+    # int8 keeps CPU inference fast and memory-light; GPUs default to the library choice
+    raw = os.getenv("WHISPER_COMPUTE_TYPE")
+    if raw:
+        return raw.strip()
+    return "int8" if get_whisper_device() == "cpu" else "default"
+
+
+def get_whisper_cpu_threads() -> int:
+    try:
+        return max(0, int(os.getenv("WHISPER_CPU_THREADS") or "0"))
+    except ValueError:
+        return 0
+
+
+def get_whisper_num_workers() -> int:
+    try:
+        return max(1, int(os.getenv("WHISPER_NUM_WORKERS") or "2"))
+    except ValueError:
+        return 2
+
+
+def get_whisper_parallel_min_seconds() -> float:
+    # Recordings shorter than this are transcribed in a single pass
+    try:
+        return float(os.getenv("WHISPER_PARALLEL_MIN_SECONDS") or "120")
+    except ValueError:
+        return 120.0
+
+
+def get_whisper_chunk_seconds() -> float:
+    try:
+        return max(5.0, float(os.getenv("WHISPER_CHUNK_SECONDS") or "60"))
+    except ValueError:
+        return 60.0
+
+
+def get_ocr_target_dpi() -> int:
+    try:
+        return max(72, int(os.getenv("OCR_TARGET_DPI") or "300"))
+    except ValueError:
+        return 300
+
+
+def get_ocr_tile_height() -> int:
+    # Pages taller than this (after normalization) are OCR'd as overlapping bands
+    try:
+        return max(256, int(os.getenv("OCR_TILE_HEIGHT") or "2000"))
+    except ValueError:
+        return 2000
+
+
+def get_ocr_tile_overlap() -> int:
+    try:
+        return max(0, int(os.getenv("OCR_TILE_OVERLAP") or "120"))
+    except ValueError:
+        return 120
+
+
+def get_ocr_max_workers() -> int:
+    default = min(4, os.cpu_count() or 1)
+    try:
+        return max(1, int(os.getenv("OCR_MAX_WORKERS") or default))
+    except ValueError:
+        return default
+
+
+def get_ocr_cache_dir() -> Path | None:
+    raw = os.getenv("OCR_CACHE_DIR")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "ocr")
+
+
+def get_summary_cache_dir() -> Path | None:
+    raw = os.getenv("SUMMARY_CACHE_DIR")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "summaries")
+
+
+def get_settings_version_file() -> Path | None:
+    # Touched on every settings write so other workers drop their cached settings
+    raw = os.getenv("SETTINGS_VERSION_FILE")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "settings.version")
+
+
+def get_vector_version_file() -> Path | None:
+    # Touched when chunks are deleted, restored, renamed or moved so every worker drops cached retrieval
+    raw = os.getenv("VECTOR_VERSION_FILE")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "vectors.version")
+
+
+def get_file_catalog_version_file() -> Path | None:
+    # Touched when a file is renamed, moved or deleted so every worker drops its cached file names
+    raw = os.getenv("FILE_CATALOG_VERSION_FILE")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "files.version")
+
+
+def get_pdf_ocr_enabled() -> bool:
+    return (os.getenv("PDF_OCR_FALLBACK") or "true").lower() not in {"0", "false", "no"}
+
+
+def get_pdf_ocr_workers() -> int:
+    default = min(4, os.cpu_count() or 1)
+    try:
+        return max(1, int(os.getenv("PDF_OCR_WORKERS") or default))
+    except ValueError:
+        return default
+
+
+def get_pdf_ocr_window() -> int:
+    # Max rendered pages held in memory at once (in flight to OCR workers)
+    try:
+        return max(1, int(os.getenv("PDF_OCR_WINDOW") or "4"))
+    except ValueError:
+        return 4
+
+
+def get_pdf_ocr_dpi() -> int:
+    try:
+        return max(72, int(os.getenv("PDF_OCR_DPI") or "300"))
+    except ValueError:
+        return 300
+
+
+def get_ingest_concurrency(kind: str) -> int:
+    """Max files of one media type extracted concurrently by the batch ingest pipeline."""
+    cores = os.cpu_count() or 1
+    # Whisper already parallelizes internally; keep audio lower by default
+    defaults = {"pdf": cores, "image": cores, "audio": max(1, cores // 4)}
+    default = defaults.get(kind, 1)
+    try:
+        return max(1, int(os.getenv(f"INGEST_CONCURRENCY_{kind.upper()}") or default))
+    except ValueError:
+        return default
+
+
+def get_ingest_embed_batch_size() -> int:
+    try:
+        return max(1, int(os.getenv("INGEST_EMBED_BATCH_SIZE") or "256"))
+    except ValueError:
+        return 256
+
+
+def get_embeddings_micro_batch_enabled() -> bool:
+    return (os.getenv("EMBEDDINGS_MICRO_BATCH") or "true").lower() not in {"0", "false", "no"}
+
+
+def get_embeddings_batch_max_wait_ms() -> float:
+    try:
+        return max(0.0, float(os.getenv("EMBEDDINGS_BATCH_MAX_WAIT_MS") or "5"))
+    except ValueError:
+        return 5.0
+
+
+def get_embeddings_batch_max_size() -> int:
+    try:
+        return max(1, int(os.getenv("EMBEDDINGS_BATCH_MAX_SIZE") or "64"))
+    except ValueError:
+        return 64
+
+
+def get_vector_backend() -> str:
+    """CHROMA (default) or NUMPY, the built-in in-process index."""
+    val = (os.getenv("VECTOR_BACKEND") or "CHROMA").upper()
+    return val if val in {"CHROMA", "NUMPY"} else "CHROMA"
+
+
+def get_vector_ann() -> str:
+    """ANN layer for the NUMPY backend: NONE, IVF, HNSW (needs hnswlib) or AUTO."""
+    val = (os.getenv("VECTOR_ANN") or "AUTO").upper()
+    return val if val in {"NONE", "IVF", "HNSW", "AUTO"} else "AUTO"
+
+
+def get_ann_min_rows() -> int:
+    # Below this many live vectors an exact scan is fast enough
+    try:
+        return max(1, int(os.getenv("ANN_MIN_ROWS") or "50000"))
+    except ValueError:
+        return 50000
+
+
+def get_ann_ivf_nlist() -> int:
+    # 0 = sqrt(rows)
+    try:
+        return max(0, int(os.getenv("ANN_IVF_NLIST") or "0"))
+    except ValueError:
+        return 0
+
+
+def get_ann_ivf_nprobe() -> int:
+    try:
+        return max(1, int(os.getenv("ANN_IVF_NPROBE") or "16"))
+    except ValueError:
+        return 16
+
+
+def get_ann_hnsw_m() -> int:
+    try:
+        return max(4, int(os.getenv("ANN_HNSW_M") or "16"))
+    except ValueError:
+        return 16
+
+
+def get_ann_hnsw_ef_construction() -> int:
+    try:
+        return max(16, int(os.getenv("ANN_HNSW_EF_CONSTRUCTION") or "200"))
+    except ValueError:
+        return 200
+
+
+def get_ann_hnsw_ef_search() -> int:
+    try:
+        return max(1, int(os.getenv("ANN_HNSW_EF_SEARCH") or "64"))
+    except ValueError:
+        return 64
+
+
+def get_ann_exact_filter_ratio() -> float:
+    # Filters matching less than this fraction of the corpus are scanned exactly
+    try:
+        return min(1.0, max(0.0, float(os.getenv("ANN_EXACT_FILTER_RATIO") or "0.05")))
+    except ValueError:
+        return 0.05
+
+
+def get_vector_compact_dead_ratio() -> float:
+    # Rewrite the index once this fraction of stored rows are deleted
+    try:
+        return min(1.0, max(0.0, float(os.getenv("VECTOR_COMPACT_DEAD_RATIO") or "0.25")))
+    except ValueError:
+        return 0.25
+
+
+def get_vector_keep_originals() -> bool:
+    """Keep float32 copies next to quantized vectors for rescoring (more disk, better recall)."""
+    return (os.getenv("VECTOR_KEEP_ORIGINALS") or "true").lower() in {"1", "true", "yes"}
+
+
+def get_vector_partitions_enabled() -> bool:
+    """Store each session's vectors in its own collection (plus GLOBAL)."""
+    return (os.getenv("VECTOR_PARTITIONS") or "false").lower() in {"1", "true", "yes"}
+
+
+def get_snapshot_dir() -> Path:
+    return Path(os.getenv("SNAPSHOT_DIR") or Path("data") / "snapshots")
+
+
+def get_maintenance_lock_file() -> Path | None:
+    # Workers hold it shared while serving; restores and Chroma rebuilds take it exclusively
+    raw = os.getenv("MAINTENANCE_LOCK_FILE")
+    if raw is not None and raw.strip().lower() in {"", "0", "off", "false", "none"}:
+        return None
+    return Path(raw or Path("data") / "cache" / "maintenance.lock")
+
+
+def get_maintenance_drain_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv("MAINTENANCE_DRAIN_SECONDS", "30")))
+    except Exception:
+        return 30.0
+
+
+def get_llm_backend() -> str:
+    """Chat generation backend: MOCK (default), OLLAMA or OPENAI (any OpenAI-compatible server)."""
+    val = (os.getenv("LLM_BACKEND") or "MOCK").upper()
+    return val if val in {"MOCK", "OLLAMA", "OPENAI"} else "MOCK"
+
+
+def get_llm_base_url() -> str:
+    default = "http://127.0.0.1:1234" if get_llm_backend() == "OPENAI" else os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+    return (os.getenv("LLM_BASE_URL") or default).rstrip("/")
+
+
+def get_llm_model() -> str:
+    return os.getenv("LLM_MODEL") or "gpt-oss:20b"
+
+
+def get_llm_api_key() -> str | None:
+    return os.getenv("LLM_API_KEY") or None
+
+
+def get_llm_connect_timeout_seconds() -> float:
+    try:
+        return max(0.1, float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS") or "5"))
+    except ValueError:
+        return 5.0
+
+
+def get_llm_read_timeout_seconds() -> float:
+    # Max gap between streamed chunks, not the whole reply; covers model load on first use
+    try:
+        return max(1.0, float(os.getenv("LLM_READ_TIMEOUT_SECONDS") or "120"))
+    except ValueError:
+        return 120.0
+
+
+def get_llm_max_connections() -> int:
+    try:
+        return max(1, int(os.getenv("LLM_MAX_CONNECTIONS") or "16"))
+    except ValueError:
+        return 16
+
+
+def get_llm_persist_interval_ms() -> float:
+    # How often a streaming assistant reply is flushed to the messages table
+    try:
+        return max(0.0, float(os.getenv("LLM_PERSIST_INTERVAL_MS") or "500"))
+    except ValueError:
+        return 500.0
+
+
+def get_llm_keep_alive() -> str:
+    # Ollama keeps the model (and its KV cache of the shared prompt prefix) loaded this long
+    return os.getenv("LLM_KEEP_ALIVE") or "30m"
+
+
+def get_chat_stage_deadline_seconds() -> float:
+    # Shared budget for the concurrent pre-generation stages (memory, personality, search)
+    try:
+        return max(0.1, float(os.getenv("CHAT_STAGE_DEADLINE_SECONDS") or "10"))
+    except ValueError:
+        return 10.0
+
+
+def get_summary_debounce_seconds() -> float:
+    # Background summarization waits this long so a burst of turns triggers one run
+    try:
+        return max(0.0, float(os.getenv("SUMMARY_DEBOUNCE_SECONDS") or "2"))
+    except ValueError:
+        return 2.0
+
+
+def get_summary_chunk_chars() -> int:
+    # Max characters of new history folded into the rolling summary per summarizer call
+    try:
+        return max(500, int(os.getenv("SUMMARY_CHUNK_CHARS") or "6000"))
+    except ValueError:
+        return 6000
+
+
+def get_rag_per_turn_memory_budget_tokens() -> int:
+    # ADR-007: strict per-turn token budget for injected memory (facts, summaries, tool snippets)
+    try:
+        return max(0, int(os.getenv("RAG_PER_TURN_MEMORY_BUDGET_TOKENS") or "800"))
+    except ValueError:
+        return 800
+
+
+def get_summarizer_connect_timeout_seconds() -> float:
+    try:
+        return max(0.1, float(os.getenv("SUMMARIZER_CONNECT_TIMEOUT_SECONDS") or "3"))
+    except ValueError:
+        return 3.0
+
+
+def get_summarizer_read_timeout_seconds() -> float:
+    # Max gap between streamed summary chunks
+    try:
+        return max(0.5, float(os.getenv("SUMMARIZER_READ_TIMEOUT_SECONDS") or "15"))
+    except ValueError:
+        return 15.0
+
+
+def get_summarizer_deadline_seconds() -> float:
+    # Whole-summary deadline; whatever streamed by then is kept as a partial summary
+    try:
+        return max(0.1, float(os.getenv("SUMMARIZER_DEADLINE_SECONDS") or "30"))
+    except ValueError:
+        return 30.0
+
+
+def get_summarizer_max_concurrency() -> int:
+    # Concurrent summary requests to the local LLM, so summaries never starve chat generation
+    try:
+        return max(1, int(os.getenv("SUMMARIZER_MAX_CONCURRENCY") or "1"))
+    except ValueError:
+        return 1
+
+
+def get_summarizer_breaker_failures() -> int:
+    try:
+        return max(1, int(os.getenv("SUMMARIZER_BREAKER_FAILURES") or "3"))
+    except ValueError:
+        return 3
+
+
+def get_summarizer_breaker_cooldown_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv("SUMMARIZER_BREAKER_COOLDOWN_SECONDS") or "60"))
+    except ValueError:
+        return 60.0
+
+
+def get_personality_cues_file() -> Path | None:
+    # Optional JSON of weighted personality cues, merged over the built-in ones
+    raw = (os.getenv("PERSONALITY_CUES_FILE") or "").strip()
+    return Path(raw) if raw else None
@@ -1,4 +1,5 @@
 import os
+import weakref
 from pathlib import Path
 from typing import Iterator
 
@@ -86,6 +87,74 @@ def init_db() -> None:
             # Best-effort; continue to create tables
             pass
     SQLModel.metadata.create_all(engine)
+    ensure_indexes(engine)
+
+
+_SECONDARY_INDEXES = (
+    # Trimming and restore run as range updates over (session_id, id)
+    "CREATE INDEX IF NOT EXISTS ix_messages_session_id_id ON messages (session_id, id)",
+)
+
+
+def ensure_indexes(bind=engine) -> None:  # type: ignore[no-untyped-def]
+    """Best-effort indexes the models cannot declare (composite and expression indexes)."""
+    for statement in _SECONDARY_INDEXES:
+        try:
+            with bind.begin() as conn:
+                conn.exec_driver_sql(statement)
+        except Exception:
+            pass
+    try:
+        ensure_knowledge_norm_key(bind)
+    except Exception:
+        pass
+
+
+def norm_knowledge_key(key: str) -> str:
+    """Knowledge keys match case- and whitespace-insensitively (Unicode-aware, unlike SQL lower())."""
+    return " ".join((key or "").split()).lower()
+
+
+_NORM_KEY_READY: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def ensure_knowledge_norm_key(bind=engine) -> None:  # type: ignore[no-untyped-def]
+    """Add and backfill ``knowledgeentrymodel.norm_key`` and make it unique per session.
+
+    The normalized key is computed in Python so the unique index and the
+    lookups agree for non-ASCII keys. Legacy duplicates are dropped, keeping
+    the newest entry. Runs once per engine.
+    """
+    if bind in _NORM_KEY_READY:
+        return
+    with bind.begin() as conn:
+        cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info(knowledgeentrymodel)").fetchall()]
+        if not cols:
+            return
+        if "norm_key" not in cols:
+            conn.exec_driver_sql("ALTER TABLE knowledgeentrymodel ADD COLUMN norm_key TEXT")
+        pending = conn.exec_driver_sql("SELECT 1 FROM knowledgeentrymodel WHERE norm_key IS NULL LIMIT 1").first()
+        if pending is not None:
+            rows = conn.exec_driver_sql(
+                "SELECT id, session_id, key, norm_key FROM knowledgeentrymodel ORDER BY id"
+            ).fetchall()
+            newest = {(session_id, norm_knowledge_key(key)): row_id for row_id, session_id, key, _ in rows}
+            kept = set(newest.values())
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ux_knowledge_session_key")
+            drop = [(row_id,) for row_id, _, _, _ in rows if row_id not in kept]
+            if drop:
+                conn.exec_driver_sql("DELETE FROM knowledgeentrymodel WHERE id = ?", drop)
+            fill = [
+                (norm_knowledge_key(key), row_id)
+                for row_id, _, key, norm in rows
+                if row_id in kept and norm != norm_knowledge_key(key)
+            ]
+            if fill:
+                conn.exec_driver_sql("UPDATE knowledgeentrymodel SET norm_key = ? WHERE id = ?", fill)
+        conn.exec_driver_sql(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_knowledge_session_norm_key ON knowledgeentrymodel (session_id, norm_key)"
+        )
+    _NORM_KEY_READY.add(bind)
 
 
 def get_session() -> Iterator[Session]:
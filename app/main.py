@@ -1,4 +1,8 @@
+import asyncio
+
 from fastapi import FastAPI
+from sqlmodel import Session, select
+
 from app.api.chat import router as chat_router
 from app.api.sessions import router as sessions_router
 from app.api.settings import router as settings_router
@@ -9,10 +13,16 @@ from app.api.system import router as system_router
 from app.api.context import router as context_router
 from app.api.personality import router as personality_router
 from app.api.theme import router as theme_router
-from app.core.db import init_db
+from app.api.admin import MaintenanceGateMiddleware, router as admin_router
+from app.core.db import engine, init_db
+from app.models.file import FileModel
+from app.services.rag import RagService
+from app.services.llm_backend import close_http_client
+from app.services.summary_scheduler import get_summary_scheduler
 
 
 app = FastAPI(title="Garmin Backend")
+app.add_middleware(MaintenanceGateMiddleware)
 
 
 @app.get("/health")
@@ -20,6 +30,28 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
+def _backfill_deleted_flags() -> None:
+    # One-time migration for chunks stored before is_deleted existed; kept off the chat path
+    with Session(engine) as db:
+        RagService().ensure_deleted_flags(
+            lambda: db.exec(select(FileModel.id).where(FileModel.is_soft_deleted == True)).all()  # noqa: E712
+        )
+
+
+@app.on_event("startup")
+async def _startup() -> None:
+    try:
+        await asyncio.to_thread(_backfill_deleted_flags)
+    except Exception:
+        pass
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    get_summary_scheduler().cancel_all()
+    await close_http_client()
+
+
 init_db()
 app.include_router(chat_router, prefix="/api")
 app.include_router(sessions_router, prefix="/api")
@@ -31,4 +63,5 @@ app.include_router(system_router, prefix="/api")
 app.include_router(context_router, prefix="/api")
 app.include_router(personality_router, prefix="/api")
 app.include_router(theme_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
 
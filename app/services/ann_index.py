@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.quantization import QuantizedMatrix, as_float32_matrix, top_k_indices
+
+try:  # Optional; IVF is used when hnswlib is not installed
+    import hnswlib  # type: ignore
+except Exception:  # pragma: no cover - fallback for envs without hnswlib
+    hnswlib = None  # type: ignore
+
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+_EMPTY_SCORES = np.empty(0, dtype=np.float32)
+
+
+class IvfIndex:
+    """Inverted-file index over rows of a QuantizedMatrix.
+
+    A spherical k-means coarse quantizer splits rows into ``nlist`` lists; a
+    query scans only the ``nprobe`` closest lists and scores candidates
+    against the matrix (so int8/float16 storage doubles as the compressed
+    code). Deletes are tombstones until the owner rebuilds the index, and
+    the owner retrains once the rows have outgrown the centroids.
+    """
+
+    def __init__(self, dim: int, nlist: int = 0, nprobe: int = 8, train_iters: int = 10, seed: int = 0) -> None:
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = max(1, nprobe)
+        self._train_iters = train_iters
+        self._rng = np.random.default_rng(seed)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._arrays: List[Optional[np.ndarray]] = []
+        self._dead: set[int] = set()
+        self._trained_rows = 0
+
+    def __len__(self) -> int:
+        return sum(len(lst) for lst in self._lists) - len(self._dead)
+
+    def needs_rebuild(self, live_rows: int) -> bool:
+        # Centroids fit to the rows seen at build time; lists grow unbalanced past that
+        return live_rows >= 2 * max(1, self._trained_rows)
+
+    def build(self, matrix: QuantizedMatrix, rows: np.ndarray) -> None:
+        nlist = self.nlist or max(1, int(np.sqrt(max(1, len(rows)))))
+        nlist = min(nlist, max(1, len(rows)))
+        sample = rows
+        if len(rows) > nlist * 64:
+            sample = self._rng.choice(rows, size=nlist * 64, replace=False)
+        vecs = matrix.rows(np.sort(sample))
+        centroids = vecs[self._rng.choice(len(vecs), size=nlist, replace=False)].copy()
+        for _ in range(self._train_iters):
+            assign = np.argmax(vecs @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vecs[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self._centroids = centroids.astype(np.float32)
+        self._trained_rows = len(rows)
+        self._lists = [[] for _ in range(nlist)]
+        self._arrays = [None] * nlist
+        self._dead = set()
+        for start in range(0, len(rows), 65536):
+            block = rows[start : start + 65536]
+            self.add(block, matrix.rows(block))
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if self._centroids is None or len(rows) == 0:
+            return
+        assign = np.argmax(as_float32_matrix(vectors) @ self._centroids.T, axis=1)
+        for row, c in zip(rows.tolist(), assign.tolist()):
+            self._lists[c].append(row)
+            self._arrays[c] = None
+            self._dead.discard(row)
+
+    def remove(self, rows: List[int]) -> None:
+        self._dead.update(rows)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self._dead)
+
+    def search(
+        self, matrix: QuantizedMatrix, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self._centroids is None or k <= 0:
+            return _EMPTY_ROWS, _EMPTY_SCORES
+        q = as_float32_matrix(query)[0]
+        probes = top_k_indices(self._centroids @ q, min(self.nprobe, len(self._lists)))
+        parts = [self._list_array(int(c)) for c in probes]
+        cand = np.concatenate(parts) if parts else _EMPTY_ROWS
+        if mask is not None and cand.size:
+            cand = cand[mask[cand]]
+        if self._dead and cand.size:
+            cand = cand[~np.isin(cand, np.fromiter(self._dead, dtype=np.int64, count=len(self._dead)))]
+        if cand.size == 0:
+            return _EMPTY_ROWS, _EMPTY_SCORES
+        scores = matrix.scores(q, cand)
+        top = top_k_indices(scores, k)
+        return cand[top], scores[top]
+
+    def _list_array(self, c: int) -> np.ndarray:
+        arr = self._arrays[c]
+        if arr is None:
+            arr = np.asarray(self._lists[c], dtype=np.int64)
+            self._arrays[c] = arr
+        return arr
+
+
+class HnswIndex:
+    """HNSW graph (hnswlib, inner-product space) keyed by matrix row.
+
+    Deletes use hnswlib's ``mark_deleted`` tombstones. Filtered queries pass
+    the row bitmap as hnswlib's ``filter`` callback when supported, otherwise
+    over-fetch and post-filter. When hnswlib cannot return ``k`` labels (too
+    few rows pass the filter for the graph walk) the query falls back to the
+    exact scan over the matrix.
+    """
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 200, ef_search: int = 64) -> None:
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed")
+        self.dim = dim
+        self._m = m
+        self._ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index: Any = None
+        self._count = 0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return self._count - self._dead
+
+    @property
+    def tombstones(self) -> int:
+        return self._dead
+
+    def needs_rebuild(self, live_rows: int) -> bool:
+        # The graph takes inserts without degrading; only compaction rebuilds it
+        return False
+
+    def build(self, matrix: QuantizedMatrix, rows: np.ndarray) -> None:
+        self._index = hnswlib.Index(space="ip", dim=self.dim)
+        self._index.init_index(max_elements=max(1024, len(rows)), ef_construction=self._ef_construction, M=self._m)
+        self._count = 0
+        self._dead = 0
+        for start in range(0, len(rows), 65536):
+            block = rows[start : start + 65536]
+            self.add(block, matrix.rows(block))
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if self._index is None or len(rows) == 0:
+            return
+        need = self._count + len(rows)
+        if need > self._index.get_max_elements():
+            self._index.resize_index(max(need, self._index.get_max_elements() * 2))
+        self._index.add_items(as_float32_matrix(vectors), rows)
+        self._count += len(rows)
+
+    def remove(self, rows: List[int]) -> None:
+        for row in rows:
+            try:
+                self._index.mark_deleted(int(row))
+                self._dead += 1
+            except Exception:
+                # Row never indexed or already deleted
+                continue
+
+    def search(
+        self, matrix: QuantizedMatrix, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        live = len(self)
+        if self._index is None or k <= 0 or live == 0:
+            return _EMPTY_ROWS, _EMPTY_SCORES
+        q = as_float32_matrix(query)
+        k = min(k, live)
+        self._index.set_ef(max(self.ef_search, k))
+        try:
+            if mask is None:
+                labels, dists = self._index.knn_query(q, k=k)
+            else:
+                try:
+                    labels, dists = self._index.knn_query(q, k=k, filter=lambda label: bool(mask[label]))
+                except TypeError:
+                    # hnswlib < 0.7 has no filter support
+                    fetch = min(live, k * 8)
+                    labels, dists = self._index.knn_query(q, k=fetch)
+                    keep = mask[labels[0]]
+                    labels, dists = labels[:, keep][:, :k], dists[:, keep][:, :k]
+        except RuntimeError:
+            # "Cannot return the results in a contiguous 2D array": fewer than k labels reachable
+            return matrix.search(q[0], k, mask=mask)
+        rows = labels[0].astype(np.int64)
+        return rows, (1.0 - dists[0]).astype(np.float32)
+
+
+def make_ann_index(dim: int, kind: Optional[str] = None) -> Optional[Any]:
+    """Build the configured ANN index (VECTOR_ANN); None means exact search only."""
+    from app.core import config
+
+    kind = (kind or config.get_vector_ann()).upper()
+    if kind == "AUTO":
+        kind = "HNSW" if hnswlib is not None else "IVF"
+    if kind == "HNSW" and hnswlib is not None:
+        return HnswIndex(
+            dim,
+            m=config.get_ann_hnsw_m(),
+            ef_construction=config.get_ann_hnsw_ef_construction(),
+            ef_search=config.get_ann_hnsw_ef_search(),
+        )
+    if kind in ("IVF", "HNSW"):
+        return IvfIndex(dim, nlist=config.get_ann_ivf_nlist(), nprobe=config.get_ann_ivf_nprobe())
+    return None
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors; uniform random data is unrealistically hard for ANN."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vecs = centers[rng.integers(0, clusters, size=n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def benchmark(
+    n: int = 100000,
+    dim: int = 384,
+    queries: int = 200,
+    k: int = 10,
+    settings: Optional[List[Dict[str, Any]]] = None,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Recall@k and latency of ANN settings against brute force on a synthetic corpus."""
+    vecs = synthetic_corpus(n + queries, dim, seed=seed)
+    corpus, qs = vecs[:n], vecs[n:]
+    matrix = QuantizedMatrix(dim, "float32", capacity=n)
+    matrix.append(corpus)
+    rows = np.arange(n)
+
+    def _run(label: str, search: Any, build_seconds: float) -> Dict[str, Any]:
+        latencies: List[float] = []
+        hits = 0
+        for i, q in enumerate(qs):
+            t = time.perf_counter()
+            found = search(q)
+            latencies.append((time.perf_counter() - t) * 1000)
+            hits += len(set(found.tolist()) & truth[i])
+        lat = np.array(latencies)
+        return {
+            "index": label,
+            "recall_at_k": round(hits / float(k * len(qs)), 4),
+            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            "build_s": round(build_seconds, 2),
+        }
+
+    truth = [set(matrix.search(q, k)[0].tolist()) for q in qs]
+    report = [_run("exact", lambda q: matrix.search(q, k)[0], 0.0)]
+    if settings is None:
+        settings = [{"kind": "IVF", "nprobe": p} for p in (1, 4, 8, 16, 32)]
+        if hnswlib is not None:
+            settings += [{"kind": "HNSW", "ef_search": ef} for ef in (16, 32, 64, 128)]
+    built: Dict[str, Tuple[Any, float]] = {}
+    for s in settings:
+        kind = s["kind"].upper()
+        if kind not in built:
+            t = time.perf_counter()
+            index = HnswIndex(dim, m=s.get("m", 16)) if kind == "HNSW" else IvfIndex(dim, nlist=s.get("nlist", 0), seed=seed)
+            index.build(matrix, rows)
+            built[kind] = (index, time.perf_counter() - t)
+        index, build_seconds = built[kind]
+        if kind == "HNSW":
+            index.ef_search = s.get("ef_search", 64)
+            label = f"hnsw ef={index.ef_search}"
+        else:
+            index.nprobe = s.get("nprobe", 8)
+            label = f"ivf nlist={len(index._lists)} nprobe={index.nprobe}"
+        report.append(_run(label, lambda q, ix=index: ix.search(matrix, q, k)[0], build_seconds))
+    return report
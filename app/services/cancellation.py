@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Optional, Protocol, TypeVar
+
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away while a request stage was running."""
+
+    def __init__(self, stage: str = "") -> None:
+        super().__init__(stage or "client disconnected")
+        self.stage = stage
+
+
+class _Request(Protocol):
+    async def is_disconnected(self) -> bool: ...
+
+
+class DisconnectWatcher:
+    """Polls a request for client disconnect and cancels whatever stage is awaiting.
+
+    Starlette only notices a dropped SSE client on the next write, so a turn
+    stuck in summarization, search or waiting for the first model token would
+    otherwise run to completion. Stages are awaited through ``guard`` (or
+    ``iterate`` for streams); on disconnect the in-flight awaitable is
+    cancelled and ``ClientDisconnected`` is raised in the caller.
+    """
+
+    def __init__(self, request: _Request, poll_interval: float = 0.25) -> None:
+        self._request = request
+        self._poll_interval = poll_interval
+        self._gone = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def disconnected(self) -> bool:
+        return self._gone.is_set()
+
+    def start(self) -> "DisconnectWatcher":
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+        return self
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll(self) -> None:
+        while not self._gone.is_set():
+            try:
+                if await self._request.is_disconnected():
+                    self._gone.set()
+                    return
+            except Exception:
+                return
+            await asyncio.sleep(self._poll_interval)
+
+    async def guard(self, aw: Awaitable[T], stage: str = "") -> T:
+        if self._gone.is_set():
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise ClientDisconnected(stage)
+        work = asyncio.ensure_future(aw)
+        gone = asyncio.ensure_future(self._gone.wait())
+        try:
+            await asyncio.wait({work, gone}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        finally:
+            gone.cancel()
+        if work.done():
+            return work.result()
+        work.cancel()
+        try:
+            await work
+        except BaseException:
+            pass
+        raise ClientDisconnected(stage)
+
+    async def iterate(self, stream: AsyncIterator[T], stage: str = "") -> AsyncIterator[T]:
+        """Yield from ``stream``, cancelling the pending ``__anext__`` on disconnect."""
+        it: Any = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    item = await self.guard(it.__anext__(), stage)
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            aclose = getattr(it, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
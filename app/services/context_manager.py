@@ -1,14 +1,22 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from sqlalchemy import literal_column, text, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 import asyncio
 
+from app.core.config import get_summary_chunk_chars
+from app.core.db import ensure_knowledge_norm_key, norm_knowledge_key
 from app.models.session import SessionModel, MessageModel
 from app.models.settings import KnowledgeEntryModel
-from app.services.summarization import SummarizationService
+from app.services.memory_artifacts import MemoryArtifactService, MemoryBundle, MemoryItem
+from app.services.rag import RagService
+from app.services.summarization import SummarizationService, get_summarization_service
+from app.services.summary_cache import SummaryCache
+from app.services.token_count import TokenCounter
 
 
 class ContextManager:
@@ -21,8 +29,12 @@ class ContextManager:
     - Mark older messages as trimmed and allow restoring a subset.
     """
 
-    def __init__(self, db: Session) -> None:
+    SEGMENT_FANOUT = 4
+
+    def __init__(self, db: Session, rag: Optional[RagService] = None) -> None:
         self._db = db
+        self._rag = rag
+        self._memory_service: Optional[MemoryArtifactService] = None
 
     def should_trim(self, message_count: int) -> bool:
         return message_count > 40
@@ -53,70 +65,345 @@ class ContextManager:
                     out.append((key, value, mid))
         return out
 
-    def upsert_knowledge(self, session_id: str, facts: List[Tuple[str, str, Optional[int]]]) -> None:
+    @staticmethod
+    def _norm_key(key: str) -> str:
+        return norm_knowledge_key(key)
+
+    def upsert_knowledge(
+        self, session_id: str, facts: List[Tuple[str, str, Optional[int]]], index: bool = True
+    ) -> List[Tuple[str, str]]:
+        """Keep one entry per normalized key, updating its value when a fact changes.
+
+        Later facts for the same key win. A unique index on
+        ``(session_id, norm_key)`` backs this up; if a concurrent writer
+        inserted the key first, the batch is re-applied as updates. Changed
+        facts are embedded into the ``memory`` collection as ``facts``
+        artifacts unless ``index`` is False (async callers embed them off the
+        event loop). Returns the (key, value) pairs that were written.
+        """
+        latest: Dict[str, Tuple[str, str, Optional[int]]] = {}
         for key, value, mid in facts:
-            row = KnowledgeEntryModel(
-                session_id=session_id,
-                key=key,
-                value=value,
-                source_message_id=mid,
-                created_at=datetime.utcnow(),
+            key = " ".join((key or "").split())
+            value = (value or "").strip()
+            if key and value:
+                latest[self._norm_key(key)] = (key, value, mid)
+        if not latest:
+            return []
+        ensure_knowledge_norm_key(self._db.get_bind())
+        for attempt in range(2):
+            try:
+                changed = self._apply_knowledge(session_id, latest)
+                self._db.commit()
+                break
+            except IntegrityError:
+                self._db.rollback()
+                if attempt:
+                    raise
+        if index:
+            self._index_facts(session_id, changed)
+        return changed
+
+    def _apply_knowledge(
+        self, session_id: str, latest: Dict[str, Tuple[str, str, Optional[int]]]
+    ) -> List[Tuple[str, str]]:
+        rows = self._db.exec(
+            select(KnowledgeEntryModel).where(
+                KnowledgeEntryModel.session_id == session_id,
+                literal_column("norm_key").in_(list(latest)),
             )
+        ).all()
+        existing = {self._norm_key(r.key): r for r in rows}
+        created: List[Tuple[KnowledgeEntryModel, str]] = []
+        changed: List[Tuple[str, str]] = []
+        for norm, (key, value, mid) in latest.items():
+            row = existing.get(norm)
+            if row is None:
+                row = KnowledgeEntryModel(
+                    session_id=session_id,
+                    key=key,
+                    value=value,
+                    source_message_id=mid,
+                    created_at=datetime.utcnow(),
+                )
+                created.append((row, norm))
+            elif row.value == value:
+                continue
+            else:
+                row.value = value
+                row.source_message_id = mid
+                row.created_at = datetime.utcnow()
             self._db.add(row)
-        if facts:
-            self._db.commit()
+            changed.append((row.key, value))
+        if created:
+            # norm_key is added by migration, not mapped on the model: fill it right after the insert
+            self._db.flush()
+            self._db.connection().execute(
+                text(f"UPDATE {KnowledgeEntryModel.__tablename__} SET norm_key = :norm WHERE id = :id"),
+                [{"norm": norm, "id": row.id} for row, norm in created],
+            )
+        return changed
+
+    def _index_facts(self, session_id: str, facts: List[Tuple[str, str]]) -> None:
+        try:
+            self._memory().put_facts(session_id, facts)
+        except Exception:
+            # The SQL row is the source of truth; recall falls back to the newest entries
+            pass
+
+    def relevant_knowledge(self, session_id: str, question: str, budget_tokens: int, top_k: int = 8) -> List[str]:
+        """Facts most related to ``question``, best first, packed into ``budget_tokens``."""
+        lines: List[str] = []
+        try:
+            bundle = self._memory().retrieve(
+                session_id, question, budget_tokens, types=("facts",), caps=None, top_k=top_k
+            )
+            lines = bundle.texts("facts")
+        except Exception:
+            lines = []
+        if lines:
+            return lines
+        out: List[str] = []
+        used = 0
+        for e in self.list_knowledge(session_id, limit=top_k):
+            line = f"{e.key}: {e.value}"
+            cost = TokenCounter.estimate_tokens(line)
+            if used + cost > budget_tokens:
+                continue
+            out.append(line)
+            used += cost
+        return out
 
-    async def summarize_and_trim_async(self, session_id: str, keep_last_n: int = 10, max_tokens: int = 400) -> str:
-        """Create a brief summary of older messages and mark them as trimmed.
+    def recall_memory(self, session_id: str, question: str, budget_tokens: int) -> MemoryBundle:
+        """Memory for one turn: the newest summary segment plus the artifacts most relevant to ``question``.
 
-        Returns the summary text stored with the session.
+        Older summary segments, facts and tool snippets come back from a single
+        scoped query; everything together stays within ``budget_tokens``.
         """
-        msgs = self._iter_messages(session_id)
-        if len(msgs) <= keep_last_n:
+        session = self._db.get(SessionModel, session_id)
+        meta = (session.metadata_json or {}) if session else {}
+        segments = list(meta.get("summary_segments") or [])
+        # The newest segment (or a provisional heuristic summary) always leads
+        newest = str(segments[-1].get("text") or "") if segments else str(meta.get("last_summary") or "")
+        pinned = [MemoryItem("summary", newest)] if newest.strip() else []
+        try:
+            return self._memory().retrieve(session_id, question, budget_tokens, pinned=pinned)
+        except Exception:
+            # Vector store unavailable: summary plus the newest facts
+            bundle = self._memory().retrieve(session_id, "", budget_tokens, pinned=pinned)
+            for line in self.relevant_knowledge(session_id, "", max(0, budget_tokens - bundle.tokens)):
+                bundle.items.append(MemoryItem("facts", line))
+            return bundle
+
+    def _memory(self) -> MemoryArtifactService:
+        if self._memory_service is None:
+            self._memory_service = MemoryArtifactService(self._rag)
+        return self._memory_service
+
+    async def summarize_and_trim_async(
+        self, session_id: str, keep_last_n: int = 10, max_tokens: int = 400, use_llm: bool = True
+    ) -> str:
+        """Fold new older messages into the rolling summary and mark them as trimmed.
+
+        The session metadata keeps ``summary_segments`` plus a
+        ``summary_watermark`` (last message id already summarized). Each LLM run
+        summarizes only the next chunk past the watermark (at most
+        ``SUMMARY_CHUNK_CHARS``) with the current summary as context, so the
+        cost of a run does not grow with session length. Once
+        ``SEGMENT_FANOUT`` segments pile up on one level they are merged into a
+        single segment one level up, keeping the stored summary logarithmic in
+        history length. Finished LLM summaries are cached by a fingerprint of
+        the summarized range, so re-running an unchanged range is free.
+
+        Trimming is a single range ``UPDATE`` from ``trimmed_watermark``, so it
+        costs the same however long the session is. LLM runs trim only up to
+        the summary watermark: older messages the summary has not reached yet
+        stay in the prompt until a later run folds them in.
+
+        With ``use_llm=False`` a provisional heuristic summary of the fresh
+        messages is stored without advancing the summary watermark, and
+        trimming goes up to the cutoff; the next LLM run replaces it. Returns
+        the summary text stored with the session.
+        """
+        cutoff = self._cutoff_id(session_id, keep_last_n)
+        if cutoff is None:
             return ""
-        older = msgs[:-keep_last_n]
-        # Extract facts for knowledge capture
-        facts = self.extract_facts([(m.id or 0, m.content) for m in older])
-        self.upsert_knowledge(session_id, facts)
-
-        # Prepare text to summarize using local LLM if configured
-        older_text = "\n".join(m.content for m in older)
-        summarizer = SummarizationService()
-        summary_text = await summarizer.summarize(older_text, max_tokens=max_tokens)
-        if not summary_text:
-            # Fallback to crude summary based on facts
-            summary_lines: List[str] = []
-            seen_keys: set[str] = set()
-            for k, v, _mid in facts:
-                lk = k.lower()
-                if lk in seen_keys:
-                    continue
-                seen_keys.add(lk)
-                summary_lines.append(f"{k}: {v}")
-                if len(summary_lines) >= 5:
-                    break
-            if not summary_lines:
-                for m in older[:5]:
-                    summary_lines.append(m.content[:200])
-            summary_text = "\n".join(summary_lines).strip()
+        session = self._db.get(SessionModel, session_id)
+        meta = dict(session.metadata_json or {}) if session else {}
+
+        # Knowledge capture only looks at messages it has not scanned yet
+        fresh = self._older_since(session_id, int(meta.get("knowledge_watermark") or 0), cutoff)
+        facts = self.extract_facts([(m.id or 0, m.content) for m in fresh])
+        changed = self.upsert_knowledge(session_id, facts, index=False)
+        if changed:
+            # Embedding is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(self._index_facts, session_id, changed)
+        if fresh:
+            meta["knowledge_watermark"] = fresh[-1].id
+
+        if use_llm:
+            summary_text = await self._fold_next_chunk(session_id, meta, cutoff, max_tokens)
+        else:
+            summary_text = self._provisional_summary(meta, facts, fresh)
+
+        # Mark everything between the trimmed watermark and the cutoff trimmed in one statement.
+        # Messages below the watermark were handled by an earlier run; a restore lowers it.
+        trim_to = cutoff
+        if use_llm:
+            # Never hide messages the summary does not cover yet
+            trim_to = min(cutoff, int(meta.get("summary_watermark") or 0) + 1)
+        trimmed_watermark = int(meta.get("trimmed_watermark") or 0)
+        self._trim_range(session_id, trimmed_watermark, trim_to)
+        meta["trimmed_watermark"] = max(trimmed_watermark, trim_to - 1)
 
         # Persist summary in the session metadata
-        session = self._db.get(SessionModel, session_id)
         if session:
-            meta = dict(session.metadata_json or {})
             meta["last_summary"] = summary_text
             session.metadata_json = meta
             self._db.add(session)
-            self._db.commit()
-
-        # Mark trimmed messages
-        for m in older:
-            if not m.is_trimmed:
-                m.is_trimmed = True
-                self._db.add(m)
         self._db.commit()
         return summary_text
 
+    def has_summary_backlog(self, session_id: str, keep_last_n: int = 10) -> bool:
+        """True when older messages past the summary watermark are still waiting for a run."""
+        cutoff = self._cutoff_id(session_id, keep_last_n)
+        if cutoff is None:
+            return False
+        session = self._db.get(SessionModel, session_id)
+        watermark = int(((session.metadata_json or {}) if session else {}).get("summary_watermark") or 0)
+        return bool(self._older_since(session_id, watermark, cutoff, char_budget=1))
+
+    def _cutoff_id(self, session_id: str, keep_last_n: int) -> Optional[int]:
+        """Id of the oldest message kept verbatim; everything below it is older history."""
+        return self._db.exec(
+            select(MessageModel.id)
+            .where(MessageModel.session_id == session_id)
+            .order_by(MessageModel.id.desc())
+            .offset(max(1, keep_last_n) - 1)
+            .limit(1)
+        ).first()
+
+    def _older_since(
+        self, session_id: str, after_id: int, cutoff_id: int, char_budget: Optional[int] = None
+    ) -> List[MessageModel]:
+        """Messages with ``after_id < id < cutoff_id`` in order, stopping once ``char_budget`` is used."""
+        stmt = (
+            select(MessageModel)
+            .where(
+                MessageModel.session_id == session_id,
+                MessageModel.id > after_id,
+                MessageModel.id < cutoff_id,
+            )
+            .order_by(MessageModel.id)
+        )
+        if char_budget is None:
+            return list(self._db.exec(stmt).all())
+        out: List[MessageModel] = []
+        used = 0
+        page = 64
+        while used < char_budget:
+            rows = self._db.exec(stmt.offset(len(out)).limit(page)).all()
+            for m in rows:
+                if out and used + len(m.content or "") > char_budget:
+                    return out
+                out.append(m)
+                used += len(m.content or "")
+            if len(rows) < page:
+                break
+        return out
+
+    async def _fold_next_chunk(self, session_id: str, meta: dict, cutoff: int, max_tokens: int) -> str:
+        segments: List[dict] = list(meta.get("summary_segments") or [])
+        watermark = int(meta.get("summary_watermark") or 0)
+        chunk = self._older_since(session_id, watermark, cutoff, char_budget=get_summary_chunk_chars())
+        if not chunk:
+            return self._compose(segments) or str(meta.get("last_summary") or "")
+        prior = self._compose(segments)
+        chunk_text = "\n".join(m.content for m in chunk)[: get_summary_chunk_chars()]
+        summarizer = get_summarization_service()
+        digest = await self._summarize_cached(
+            summarizer,
+            "chunk",
+            [(m.id or 0, m.content) for m in chunk],
+            chunk_text,
+            max_tokens,
+            context=prior[-max_tokens * 4 :],
+        )
+        segments.append({"level": 0, "first_id": chunk[0].id, "last_id": chunk[-1].id, "text": digest})
+        segments = await self._collapse(segments, summarizer, max_tokens)
+        meta["summary_segments"] = segments
+        meta["summary_watermark"] = chunk[-1].id
+        try:
+            await asyncio.to_thread(self._memory().put_summaries, session_id, segments)
+        except Exception:
+            # Recall still has the newest segment from the session metadata
+            pass
+        return self._compose(segments)
+
+    async def _collapse(self, segments: List[dict], summarizer: SummarizationService, max_tokens: int) -> List[dict]:
+        # Segments stay ordered oldest first, so the coarser (older) levels come first
+        while True:
+            for level in sorted({int(s["level"]) for s in segments}):
+                group = [s for s in segments if int(s["level"]) == level]
+                if len(group) >= self.SEGMENT_FANOUT:
+                    break
+            else:
+                return segments
+            group = group[: self.SEGMENT_FANOUT]
+            text = await self._summarize_cached(
+                summarizer,
+                f"merge{level}",
+                [(s["first_id"], s["text"]) for s in group],
+                "\n\n".join(s["text"] for s in group),
+                max_tokens,
+            )
+            merged = {"level": level + 1, "first_id": group[0]["first_id"], "last_id": group[-1]["last_id"], "text": text}
+            idx = segments.index(group[0])
+            segments = segments[:idx] + [merged] + [s for s in segments[idx:] if s not in group]
+
+    @staticmethod
+    async def _summarize_cached(
+        summarizer: SummarizationService,
+        kind: str,
+        parts: List[Tuple[int, str]],
+        text: str,
+        max_tokens: int,
+        context: str = "",
+    ) -> str:
+        # Keyed on the summarized range only: the prior-summary context steers wording, not content
+        cache = SummaryCache()
+        key = cache.fingerprint(kind, parts, summarizer.model_id, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        summary, complete = await summarizer.summarize_with_status(text, max_tokens=max_tokens, context=context)
+        if complete:
+            cache.put(key, summary)
+        return summary
+
+    @staticmethod
+    def _compose(segments: List[dict]) -> str:
+        return "\n".join(str(s.get("text") or "").strip() for s in segments if s.get("text")).strip()
+
+    def _provisional_summary(
+        self, meta: dict, facts: List[Tuple[str, str, Optional[int]]], fresh: List[MessageModel]
+    ) -> str:
+        # Crude summary based on facts, on top of whatever the LLM already summarized
+        summary_lines: List[str] = []
+        seen_keys: set[str] = set()
+        for k, v, _mid in facts:
+            lk = k.lower()
+            if lk in seen_keys:
+                continue
+            seen_keys.add(lk)
+            summary_lines.append(f"{k}: {v}")
+            if len(summary_lines) >= 5:
+                break
+        if not summary_lines:
+            for m in fresh[:5]:
+                summary_lines.append(m.content[:200])
+        prior = self._compose(list(meta.get("summary_segments") or []))
+        return "\n".join([prior] + summary_lines if prior else summary_lines).strip()
+
     def summarize_and_trim(self, session_id: str, keep_last_n: int = 10, max_tokens: int = 400) -> str:
         """Sync wrapper for contexts that aren't async-aware.
 
@@ -140,28 +427,77 @@ class ContextManager:
         rows = self._db.exec(
             select(KnowledgeEntryModel)
             .where(KnowledgeEntryModel.session_id == session_id)
-            .order_by(KnowledgeEntryModel.id.desc())
+            # Upserts refresh created_at, so recently confirmed facts come first
+            .order_by(KnowledgeEntryModel.created_at.desc(), KnowledgeEntryModel.id.desc())
             .limit(limit)
         ).all()
         return rows
 
+    def _trim_range(self, session_id: str, after_id: int, cutoff_id: int) -> int:
+        result = self._db.exec(
+            update(MessageModel)
+            .where(
+                MessageModel.session_id == session_id,
+                MessageModel.id > after_id,
+                MessageModel.id < cutoff_id,
+                MessageModel.is_trimmed == False,  # noqa: E712
+            )
+            .values(is_trimmed=True)
+            .execution_options(synchronize_session=False)
+        )
+        return int(result.rowcount or 0)
+
     def restore_trimmed(self, session_id: str, count: int) -> int:
+        """Restore the ``count`` most recent trimmed messages with a single range update."""
         if count <= 0:
             return 0
-        trimmed = self._db.exec(
-            select(MessageModel)
+        lowest = self._db.exec(
+            select(MessageModel.id)
             .where(MessageModel.session_id == session_id, MessageModel.is_trimmed == True)  # noqa: E712
-            .order_by(MessageModel.created_at.desc())
-            .limit(count)
-        ).all()
-        restored = 0
-        for m in trimmed:
-            if m.is_trimmed:
-                m.is_trimmed = False
-                self._db.add(m)
-                restored += 1
+            .order_by(MessageModel.id.desc())
+            .offset(count - 1)
+            .limit(1)
+        ).first()
+        if lowest is None:
+            # Fewer than ``count`` trimmed messages: restore all of them
+            lowest = 0
+        return self.restore_range(session_id, lowest)
+
+    def _rewind_summary(self, meta: dict, from_id: int) -> None:
+        # Drop segments reaching into the restored range; re-folding the same
+        # messages later produces the same fingerprints, so it is served from the cache
+        segments: List[dict] = list(meta.get("summary_segments") or [])
+        kept = [s for s in segments if int(s["last_id"]) < from_id]
+        watermark = int(meta.get("summary_watermark") or 0)
+        if len(kept) < len(segments):
+            watermark = min(watermark, min(int(s["first_id"]) for s in segments if s not in kept) - 1)
+            meta["summary_segments"] = kept
+            meta["last_summary"] = self._compose(kept)
+        meta["summary_watermark"] = min(watermark, max(0, from_id - 1))
+
+    def restore_range(self, session_id: str, from_id: int, to_id: Optional[int] = None) -> int:
+        """Un-trim messages with ``from_id <= id <= to_id`` (open-ended when ``to_id`` is None)."""
+        conds = [
+            MessageModel.session_id == session_id,
+            MessageModel.id >= from_id,
+            MessageModel.is_trimmed == True,  # noqa: E712
+        ]
+        if to_id is not None:
+            conds.append(MessageModel.id <= to_id)
+        result = self._db.exec(
+            update(MessageModel).where(*conds).values(is_trimmed=False).execution_options(synchronize_session=False)
+        )
+        restored = int(result.rowcount or 0)
         if restored:
+            session = self._db.get(SessionModel, session_id)
+            if session:
+                # The next run trims the restored messages again once they age out
+                meta = dict(session.metadata_json or {})
+                meta["trimmed_watermark"] = min(int(meta.get("trimmed_watermark") or 0), max(0, from_id - 1))
+                self._rewind_summary(meta, from_id)
+                session.metadata_json = meta
+                self._db.add(session)
             self._db.commit()
+            # Rows loaded earlier in this session still carry the old flag
+            self._db.expire_all()
         return restored
-
-
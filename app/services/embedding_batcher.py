@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, List
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatchingEmbedder:
+    """Coalesces concurrent embed calls into one batched forward pass.
+
+    Requests arriving within ``max_wait_ms`` of the first queued one (up to
+    ``max_batch`` texts) are embedded together by a single worker thread and the
+    vectors are scattered back to each caller. Duplicate texts within a batch
+    (e.g. the session and global query of one chat turn) are embedded once.
+    Calls with more than ``max_batch`` texts (ingest) gain nothing from
+    coalescing and run on the caller's thread, so chat queries never queue
+    behind them.
+    """
+
+    def __init__(self, inner: Any, max_wait_ms: float = 5.0, max_batch: int = 64) -> None:
+        self._inner = inner
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    @property
+    def inner(self) -> Any:
+        return self._inner
+
+    def embed(self, texts: list[str]) -> Any:
+        if not texts:
+            return []
+        if len(texts) > self._max_batch:
+            return self._inner.embed(list(texts))
+        return self._submit(texts).result()
+
+    def _submit(self, texts: list[str]) -> Future:
+        req = _Request(texts=list(texts))
+        self._ensure_worker()
+        self._queue.put(req)
+        return req.future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            count = len(batch[0].texts)
+            deadline = time.monotonic() + self._max_wait
+            while count < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(req)
+                count += len(req.texts)
+            self._process(batch)
+
+    def _process(self, batch: list[_Request]) -> None:
+        unique: dict[str, int] = {}
+        for req in batch:
+            for t in req.texts:
+                unique.setdefault(t, len(unique))
+        try:
+            vectors = self._inner.embed(list(unique.keys()))
+        except Exception as exc:
+            for req in batch:
+                if not req.future.cancelled():
+                    req.future.set_exception(exc)
+            return
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(unique)
+        for req in batch:
+            if req.future.cancelled():
+                continue
+            rows = [vectors[unique[t]] for t in req.texts]
+            req.future.set_result(_stack_like(vectors, rows))
+
+
+def _stack_like(vectors: Any, rows: list) -> Any:
+    """Return rows in the same container type the inner embedder produced."""
+    if isinstance(vectors, list):
+        return rows
+    try:
+        import numpy as np  # type: ignore
+
+        return np.stack(rows) if rows else vectors[:0]
+    except Exception:
+        return rows
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from sqlmodel import Session, select
+
+from app.core.config import get_file_catalog_version_file
+from app.models.file import FileModel
+from app.services.version_file import bump_version_file, file_version
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    id: str
+    name: str
+    session_id: Optional[str]
+    is_soft_deleted: bool
+
+
+class FileCatalog:
+    """Per-process cache of file display metadata keyed by file id.
+
+    Chat citations read names from chunk metadata; this cache only backs
+    chunks ingested before names were stored there. File mutations call
+    ``invalidate``, which also replaces the version file; other workers
+    notice the new file (one ``stat`` per lookup) and drop their entries, so
+    a stale name is never served after a rename or delete.
+    """
+
+    def __init__(self, version_file: Optional[Path] = None) -> None:
+        self._version_file = version_file
+        self._entries: Dict[str, FileEntry] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._seen = file_version(version_file)
+
+    def lookup(self, file_ids: Iterable[str], db: Session) -> Dict[str, FileEntry]:
+        wanted = {f for f in file_ids if f}
+        with self._lock:
+            self._check_version()
+            found = {f: self._entries[f] for f in wanted if f in self._entries}
+            generation = self._generation
+        missing = wanted - set(found)
+        if missing:
+            rows = db.exec(select(FileModel).where(FileModel.id.in_(list(missing)))).all()
+            loaded = {row.id: self._entry(row) for row in rows}
+            with self._lock:
+                # A mutation that raced with the load may have made it stale; don't keep it then
+                if generation == self._generation:
+                    self._entries.update(loaded)
+            found.update(loaded)
+        return found
+
+    def put(self, record: FileModel) -> None:
+        with self._lock:
+            self._entries[record.id] = self._entry(record)
+
+    def invalidate(self, file_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if file_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_id, None)
+            bump_version_file(self._version_file)
+            self._seen = file_version(self._version_file)
+
+    def _check_version(self) -> None:
+        current = file_version(self._version_file)
+        if current != self._seen:
+            self._generation += 1
+            self._entries.clear()
+            self._seen = current
+
+    @staticmethod
+    def _entry(record: FileModel) -> FileEntry:
+        return FileEntry(
+            id=record.id,
+            name=record.name,
+            session_id=record.session_id,
+            is_soft_deleted=bool(getattr(record, "is_soft_deleted", False)),
+        )
+
+
+_FILE_CATALOG_INSTANCE: FileCatalog | None = None
+
+
+def get_file_catalog() -> FileCatalog:
+    """The process-wide catalog; rebuilt when FILE_CATALOG_VERSION_FILE changes."""
+    global _FILE_CATALOG_INSTANCE
+    version_file = get_file_catalog_version_file()
+    if _FILE_CATALOG_INSTANCE is None or _FILE_CATALOG_INSTANCE._version_file != version_file:
+        _FILE_CATALOG_INSTANCE = FileCatalog(version_file)
+    return _FILE_CATALOG_INSTANCE
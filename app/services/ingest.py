@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import Session
+
+from app.core.config import (
+    get_supported_image_suffixes,
+    get_supported_audio_suffixes,
+    get_images_max_file_size_bytes,
+    get_audio_max_file_size_bytes,
+    get_ingest_concurrency,
+    get_ingest_embed_batch_size,
+)
+from app.models.file import FileModel
+from app.services.rag import RagService
+
+
+CHUNK_SIZE = 320
+CHUNK_OVERLAP = 40
+
+
+@dataclass
+class _Item:
+    index: int
+    name: str
+    data: bytes
+    suffix: str
+    kind: Optional[str]
+    chunks: List[str] = field(default_factory=list)
+    extra: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    result: Optional[dict] = None
+
+
+class BatchIngestPipeline:
+    """Ingests many uploaded files concurrently.
+
+    Extraction (PDF parse, OCR, transcription) runs in worker threads, bounded
+    per media type so one slow kind cannot starve the others. Chunks from all
+    files are embedded together in large batches instead of one model call per
+    file. Every input gets a result entry; failures carry ``status="error"``.
+    """
+
+    def __init__(self, db: Session, session_id: Optional[str] = None, rag: Optional[RagService] = None) -> None:
+        self._db = db
+        self._session_id = session_id
+        self._rag = rag or RagService()
+        self._limits = {kind: asyncio.Semaphore(get_ingest_concurrency(kind)) for kind in ("pdf", "image", "audio")}
+        self._embed_batch_size = get_ingest_embed_batch_size()
+        self.last_stats: Dict[str, Any] = {}
+
+    def _kind(self, suffix: str) -> Optional[str]:
+        if suffix == ".pdf":
+            return "pdf"
+        if suffix in get_supported_image_suffixes():
+            return "image"
+        if suffix in get_supported_audio_suffixes():
+            return "audio"
+        return None
+
+    async def run(self, uploads: List[Any]) -> List[dict]:
+        t0 = time.perf_counter()
+        items: List[_Item] = []
+        for i, uf in enumerate(uploads):
+            name = uf.filename or f"upload-{i}"
+            suffix = Path(name).suffix.lower()
+            items.append(_Item(index=i, name=name, data=await uf.read(), suffix=suffix, kind=self._kind(suffix)))
+
+        await asyncio.gather(*(self._extract(item) for item in items))
+
+        # DB writes stay on the event loop thread; the Session is not thread-safe
+        pending_docs: List[str] = []
+        pending_metas: List[dict] = []
+        for item in items:
+            if item.error is not None:
+                continue
+            record = self._create_record(item)
+            source_type = None if item.kind == "pdf" else item.kind
+            metas = self._rag.chunk_metadatas(
+                record.id, self._session_id, len(item.chunks), source_type=source_type, extra=item.extra, file_name=record.name
+            )
+            pending_docs.extend(item.chunks)
+            pending_metas.extend(metas)
+            item.result = {
+                "id": record.id,
+                "name": record.name,
+                "session_id": record.session_id,
+                "size_bytes": record.size_bytes,
+                "created_at": record.created_at.isoformat(),
+                "chunk_count": len(item.chunks),
+                "status": "ok",
+            }
+
+        # One embedding pass per large batch across all files
+        for start in range(0, len(pending_docs), self._embed_batch_size):
+            end = start + self._embed_batch_size
+            await asyncio.to_thread(self._rag.persist_documents, pending_docs[start:end], pending_metas[start:end])
+
+        elapsed = time.perf_counter() - t0
+        ok = sum(1 for it in items if it.error is None)
+        self.last_stats = {
+            "files": len(items),
+            "succeeded": ok,
+            "failed": len(items) - ok,
+            "chunks": len(pending_docs),
+            "seconds": round(elapsed, 3),
+            "files_per_minute": (round(len(items) * 60.0 / elapsed, 1) if elapsed > 0 else None),
+        }
+        return [
+            item.result if item.result is not None else {"name": item.name, "status": "error", "detail": item.error}
+            for item in items
+        ]
+
+    async def _extract(self, item: _Item) -> None:
+        if item.kind is None:
+            item.error = "Unsupported file type"
+            return
+        if item.kind == "image" and len(item.data) > get_images_max_file_size_bytes():
+            item.error = "Image too large"
+            return
+        if item.kind == "audio" and len(item.data) > get_audio_max_file_size_bytes():
+            item.error = "Audio file too large"
+            return
+        async with self._limits[item.kind]:
+            try:
+                await asyncio.to_thread(getattr(self, f"_extract_{item.kind}"), item)
+            except Exception:
+                item.error = {
+                    "pdf": "Invalid or corrupted PDF uploaded",
+                    "image": "Invalid or unreadable image uploaded",
+                    "audio": "Invalid or unreadable audio uploaded",
+                }[item.kind]
+
+    def _extract_pdf(self, item: _Item) -> None:
+        text = self._rag.parse_pdf(item.data)
+        item.chunks = self._rag.chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+
+    def _extract_image(self, item: _Item) -> None:
+        from app.services.ocr import OcrService
+
+        text = OcrService().extract_text(item.data)
+        item.chunks = self._rag.chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+
+    def _extract_audio(self, item: _Item) -> None:
+        from app.services.transcription import AudioTranscriptionService
+
+        transcriber = AudioTranscriptionService()
+        segments = transcriber.transcribe(item.data, suffix=item.suffix)
+        full_text = " ".join(s.get("text", "") for s in segments).strip()
+        item.chunks = self._rag.chunk_text(full_text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+        item.extra = {
+            "start_time": float(segments[0]["start"]) if segments else 0.0,
+            "end_time": float(segments[-1]["end"]) if segments else 0.0,
+        }
+        language = transcriber.last_stats.get("language")
+        if language:
+            item.extra["transcription_language"] = language
+
+    def _create_record(self, item: _Item) -> FileModel:
+        record = FileModel(name=item.name, session_id=self._session_id, size_bytes=len(item.data))
+        self._db.add(record)
+        self._db.commit()
+        self._db.refresh(record)
+        # Save originals where the single-file endpoints keep them
+        if item.kind == "pdf":
+            dest = Path("data") / "uploads" / "pdfs" / f"{record.id}.pdf"
+        elif item.kind == "image":
+            dest = Path("data") / "uploads" / "images" / f"{record.id}{item.suffix}"
+        else:
+            dest = Path("data") / "uploads" / "audio" / f"{record.id}{item.suffix}"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(item.data)
+        return record
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import (
+    get_llm_api_key,
+    get_llm_backend,
+    get_llm_base_url,
+    get_llm_connect_timeout_seconds,
+    get_llm_keep_alive,
+    get_llm_max_connections,
+    get_llm_model,
+    get_llm_read_timeout_seconds,
+)
+
+
+MOCK_TOKENS = ["Hello", "from", "mock", "AI!"]
+
+
+class LlmError(RuntimeError):
+    """The generation backend failed or answered with an error payload."""
+
+
+class LlmBackend:
+    """Streams a chat completion as text pieces.
+
+    ``separator`` joins the pieces back into the stored reply: real backends
+    stream raw deltas (``""``), the mock streams whole words (``" "``).
+    """
+
+    name = "base"
+    separator = ""
+
+    def __init__(self, model: str = "") -> None:
+        self.model = model
+
+    def stream(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def join(self, pieces: List[str]) -> str:
+        return self.separator.join(pieces)
+
+
+class MockBackend(LlmBackend):
+    name = "mock"
+    separator = " "
+
+    async def stream(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> AsyncIterator[str]:
+        for token in MOCK_TOKENS:
+            yield token
+
+
+class _HttpBackend(LlmBackend):
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        timeout: Optional[httpx.Timeout] = None,
+    ) -> None:
+        super().__init__(model)
+        self.base_url = base_url.rstrip("/")
+        self._api_key = api_key
+        self._client = client
+        # Per-request override of the pooled client's timeouts
+        self._timeout = timeout
+
+    def _url(self) -> str:
+        raise NotImplementedError
+
+    def _payload(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> dict:
+        raise NotImplementedError
+
+    def _parse(self, response: httpx.Response) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def stream(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> AsyncIterator[str]:
+        client = self._client or get_http_client()
+        headers = {"Authorization": f"Bearer {self._api_key}"} if self._api_key else None
+        extra = {"timeout": self._timeout} if self._timeout is not None else {}
+        async with client.stream(
+            "POST", self._url(), json=self._payload(messages, settings), headers=headers, **extra
+        ) as resp:
+            if resp.status_code >= 400:
+                body = await resp.aread()
+                raise LlmError(f"{self.name} returned HTTP {resp.status_code}: {body[:200].decode(errors='replace')}")
+            async for piece in self._parse(resp):
+                if piece:
+                    yield piece
+
+
+class OllamaBackend(_HttpBackend):
+    """Ollama ``/api/chat`` streaming newline-delimited JSON."""
+
+    name = "ollama"
+
+    def _url(self) -> str:
+        return f"{self.base_url}/api/chat"
+
+    def _payload(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> dict:
+        options = {
+            "temperature": settings.get("temperature"),
+            "top_p": settings.get("top_p"),
+            "num_predict": settings.get("max_tokens"),
+            "presence_penalty": settings.get("presence_penalty"),
+            "frequency_penalty": settings.get("frequency_penalty"),
+        }
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            # Keeps the model resident so the next turn reuses the KV cache of the shared prefix
+            "keep_alive": get_llm_keep_alive(),
+            "options": {k: v for k, v in options.items() if v is not None},
+        }
+
+    async def _parse(self, response: httpx.Response) -> AsyncIterator[str]:
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise LlmError(str(data["error"]))
+            yield (data.get("message") or {}).get("content") or ""
+            if data.get("done"):
+                break
+
+
+class OpenAICompatBackend(_HttpBackend):
+    """OpenAI-compatible ``/v1/chat/completions`` streaming server-sent events."""
+
+    name = "openai"
+
+    def _url(self) -> str:
+        if self.base_url.endswith("/v1"):
+            return f"{self.base_url}/chat/completions"
+        return f"{self.base_url}/v1/chat/completions"
+
+    def _payload(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> dict:
+        payload: Dict[str, Any] = {"model": self.model, "messages": messages, "stream": True}
+        for key in ("temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty"):
+            if settings.get(key) is not None:
+                payload[key] = settings[key]
+        return payload
+
+    async def _parse(self, response: httpx.Response) -> AsyncIterator[str]:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            obj = json.loads(data)
+            if obj.get("error"):
+                raise LlmError(str(obj["error"]))
+            choices = obj.get("choices") or []
+            if choices:
+                yield (choices[0].get("delta") or {}).get("content") or ""
+
+
+@dataclass
+class StreamStats:
+    backend: str
+    model: str
+    started: float
+    first_token_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    tokens: int = 0
+
+    def mark(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.perf_counter()
+        return {
+            "backend": self.backend,
+            "model": self.model,
+            "ttft_ms": (round((self.first_token_at - self.started) * 1000, 1) if self.first_token_at else None),
+            "total_ms": round((end - self.started) * 1000, 1),
+            "tokens": self.tokens,
+        }
+
+
+_HTTP_CLIENT: httpx.AsyncClient | None = None
+_HTTP_CLIENT_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Long-lived pooled client so chat turns reuse keep-alive connections.
+
+    httpx clients are bound to the event loop they first ran on; a new loop
+    (tests, reloads) gets a fresh client.
+    """
+    global _HTTP_CLIENT, _HTTP_CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed or _HTTP_CLIENT_LOOP is not loop:
+        limit = get_llm_max_connections()
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(get_llm_read_timeout_seconds(), connect=get_llm_connect_timeout_seconds()),
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit, keepalive_expiry=120.0),
+        )
+        _HTTP_CLIENT_LOOP = loop
+    return _HTTP_CLIENT
+
+
+async def close_http_client() -> None:
+    global _HTTP_CLIENT, _HTTP_CLIENT_LOOP
+    client, _HTTP_CLIENT, _HTTP_CLIENT_LOOP = _HTTP_CLIENT, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def get_llm_backend_instance(client: Optional[httpx.AsyncClient] = None) -> LlmBackend:
+    kind = get_llm_backend()
+    if kind == "OLLAMA":
+        return OllamaBackend(get_llm_base_url(), get_llm_model(), get_llm_api_key(), client=client)
+    if kind == "OPENAI":
+        return OpenAICompatBackend(get_llm_base_url(), get_llm_model(), get_llm_api_key(), client=client)
+    return MockBackend("mock")
+
+
+def sse_data(piece: str) -> bytes:
+    """Frame a text piece as one SSE event; embedded newlines become extra ``data:`` lines."""
+    return ("".join(f"data: {line}\n" for line in piece.split("\n")) + "\n").encode()
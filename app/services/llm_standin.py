@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+
+def create_standin_app(
+    tokens: Optional[List[str]] = None,
+    first_token_delay_ms: float = 0.0,
+    token_delay_ms: float = 0.0,
+) -> FastAPI:
+    """A tiny local server speaking the Ollama and OpenAI-compatible streaming APIs.
+
+    Used by tests (through ``httpx.ASGITransport``) and for local TTFT checks
+    without a model: ``python -m app.cli llm-standin``. Every request is kept
+    in ``app.state.requests`` so callers can assert on the payload sent.
+    """
+    pieces = tokens if tokens is not None else ["Hello", " from", " the", " stand-in", "!"]
+    app = FastAPI(title="LLM stand-in")
+    app.state.requests = []
+
+    async def _paced() -> AsyncGenerator[str, None]:
+        await asyncio.sleep(first_token_delay_ms / 1000.0)
+        for i, piece in enumerate(pieces):
+            if i and token_delay_ms:
+                await asyncio.sleep(token_delay_ms / 1000.0)
+            yield piece
+
+    @app.post("/api/chat")
+    async def ollama_chat(payload: dict) -> StreamingResponse:
+        app.state.requests.append(("ollama", payload))
+        model = payload.get("model", "")
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            async for piece in _paced():
+                msg = {"model": model, "message": {"role": "assistant", "content": piece}, "done": False}
+                yield (json.dumps(msg) + "\n").encode()
+            yield (json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n").encode()
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(payload: dict) -> StreamingResponse:
+        app.state.requests.append(("openai", payload))
+        created = int(time.time())
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            async for piece in _paced():
+                chunk = {
+                    "id": "standin",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": payload.get("model", ""),
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    return app
@@ -0,0 +1,596 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.quantization import as_float32_matrix
+from app.services.rag import RagService, bump_vector_epoch
+from app.services.vector_index import NumpyVectorCollection
+from app.services.vector_partitions import PartitionedCollection
+
+try:  # POSIX advisory locks gate requests across worker processes
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+SNAPSHOT_FORMAT = 1
+
+# Records per get()/add() call while exporting or bulk-loading vectors
+_BATCH = 5000
+
+ProgressFn = Callable[[str, int, int], None]
+
+
+def _noop_progress(phase: str, done: int, total: int) -> None:
+    return None
+
+
+class RequestGate:
+    """Admits API requests unless maintenance mode is on, in every worker process.
+
+    A worker holds a shared ``flock`` on MAINTENANCE_LOCK_FILE while it has
+    requests in flight. ``exclusive`` writes its reason into the file, which
+    makes every worker answer new requests with 503, then takes the exclusive
+    lock: that waits until requests already running anywhere have finished,
+    so the maintenance body never races with API writes.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path if fcntl is not None else None
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._local_reason: Optional[str] = None
+        self._fh: Any = None
+
+    def _file(self) -> Any:
+        if self._fh is None and self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "a+", encoding="utf-8")
+        return self._fh
+
+    def reason(self) -> Optional[str]:
+        """Why requests are refused right now, or None when serving normally."""
+        if self._local_reason is not None:
+            return self._local_reason
+        fh = self._file()
+        if fh is None or os.fstat(fh.fileno()).st_size == 0:
+            return None
+        fh.seek(0)
+        return fh.read().strip() or "maintenance"
+
+    def enter(self) -> Optional[str]:
+        """Admit a request (returns None) or return the reason it is refused."""
+        with self._cond:
+            reason = self.reason()
+            if reason is not None:
+                return reason
+            fh = self._file()
+            if self._in_flight == 0 and fh is not None:
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return "maintenance"
+            self._in_flight += 1
+        return None
+
+    def leave(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                if self._fh is not None:
+                    fcntl.flock(self._fh, fcntl.LOCK_UN)
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self, reason: str, timeout: float) -> Iterator[None]:
+        with self._cond:
+            if self._local_reason is not None:
+                raise RuntimeError(f"Maintenance already in progress: {self._local_reason}")
+            self._local_reason = reason
+        own = None
+        try:
+            deadline = time.monotonic() + timeout
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # A separate open file description, so it conflicts with this worker's shared lock
+                own = open(self.path, "a+", encoding="utf-8")
+                own.truncate(0)
+                own.write(reason)
+                own.flush()
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._in_flight == 0, timeout=timeout):
+                    raise RuntimeError("Requests are still running; try again later")
+            while own is not None:
+                try:
+                    fcntl.flock(own, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise RuntimeError("Requests are still running in another worker; try again later")
+                    time.sleep(0.05)
+            yield
+        finally:
+            if own is not None:
+                own.truncate(0)
+                own.flush()
+                fcntl.flock(own, fcntl.LOCK_UN)
+                own.close()
+            with self._cond:
+                self._local_reason = None
+
+
+_GATE_INSTANCE: Optional[RequestGate] = None
+_GATE_LOCK = threading.Lock()
+
+
+def get_request_gate() -> RequestGate:
+    """The process-wide gate; rebuilt when MAINTENANCE_LOCK_FILE changes."""
+    from app.core.config import get_maintenance_lock_file
+
+    global _GATE_INSTANCE
+    path = get_maintenance_lock_file()
+    with _GATE_LOCK:
+        if _GATE_INSTANCE is None or _GATE_INSTANCE.path != (path if fcntl is not None else None):
+            _GATE_INSTANCE = RequestGate(path)
+        return _GATE_INSTANCE
+
+
+def maintenance_mode(reason: str) -> Any:
+    """Context manager that refuses API requests in every worker while its body runs."""
+    from app.core.config import get_maintenance_drain_seconds
+
+    return get_request_gate().exclusive(reason, get_maintenance_drain_seconds())
+
+
+def _sqlite_path(db_url: Optional[str] = None) -> Path:
+    if db_url is None:
+        from app.core.db import DATABASE_URL
+
+        db_url = DATABASE_URL
+    if not db_url.startswith("sqlite:///") or ":memory:" in db_url:
+        raise ValueError("Snapshots require a file-backed SQLite database")
+    return Path(db_url.replace("sqlite:///", ""))
+
+
+def _backup_sqlite(src: Path, dest: Path) -> None:
+    """Online, page-by-page copy through SQLite's backup API."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(str(src)) as s, sqlite3.connect(str(dest)) as d:
+        s.backup(d, pages=1024)
+
+
+def _file_ids(db_file: Path) -> set[str]:
+    with sqlite3.connect(str(db_file)) as conn:
+        try:
+            return {row[0] for row in conn.execute("SELECT id FROM files")}
+        except sqlite3.OperationalError:
+            return set()
+
+
+def _flat(value: Any) -> list:
+    # Chroma get() returns flat lists; some versions nest them once
+    if isinstance(value, list) and value and isinstance(value[0], list):
+        return value[0]
+    return list(value) if value is not None else []
+
+
+def _vector_collections(rag: RagService) -> Dict[str, Any]:
+    coll = rag._collection
+    if isinstance(coll, PartitionedCollection):
+        return coll.partitions()
+    return {"documents": coll}
+
+
+def _all_collections(rag: RagService) -> List[Tuple[str, str, Any]]:
+    """``(kind, key, collection)`` for document chunks and conversation memory."""
+    out = [("documents", key, coll) for key, coll in _vector_collections(rag).items()]
+    out.append(("memory", "memory", rag.memory_collection()))
+    return out
+
+
+def compact_vectors(rag: Optional[RagService] = None, progress: ProgressFn = _noop_progress) -> Dict[str, Any]:
+    """Reclaim space left by deleted vectors.
+
+    The NumPy index rewrites live rows into a new file generation while the
+    server keeps serving. Chroma has no compaction call, so each collection
+    is copied (with its stored embeddings) into a fresh one that replaces it,
+    then its SQLite file is vacuumed; that runs in maintenance mode, because
+    writes during the copy would be lost and the collection is briefly gone.
+    """
+    rag = rag or RagService()
+    if rag._client is not None:
+        with maintenance_mode("compacting vectors"):
+            return _compact(rag, progress)
+    return _compact(rag, progress)
+
+
+def _compact(rag: RagService, progress: ProgressFn) -> Dict[str, Any]:
+    collections = _all_collections(rag)
+    out: Dict[str, Any] = {"collections": {}}
+    for i, (kind, key, coll) in enumerate(collections):
+        progress("compact", i, len(collections))
+        if isinstance(coll, NumpyVectorCollection):
+            result = coll.compact()
+        elif rag._client is not None:
+            result = _rebuild_chroma_collection(rag._client, coll)
+        else:
+            continue
+        if kind == "memory":
+            out["memory"] = result
+        else:
+            out["collections"][key] = result
+    progress("compact", len(collections), len(collections))
+    if rag._client is not None:
+        # The rebuilt collections replaced the handles held here
+        if not isinstance(rag._collection, PartitionedCollection):
+            rag._collection = rag._client.get_or_create_collection(name=rag._collection.name)
+        rag._memory = None
+        chroma_db = rag._base / "chroma.sqlite3"
+        if chroma_db.exists():
+            with sqlite3.connect(str(chroma_db)) as conn:
+                conn.execute("VACUUM")
+    return out
+
+
+def _rebuild_chroma_collection(client: Any, coll: Any) -> Dict[str, int]:
+    name = coll.name
+    tmp = client.get_or_create_collection(name=f"{name}-compact")
+    total = coll.count()
+    for offset in range(0, total, _BATCH):
+        got = coll.get(limit=_BATCH, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if got.get("ids"):
+            tmp.add(ids=got["ids"], documents=got["documents"], metadatas=got["metadatas"], embeddings=got["embeddings"])
+    client.delete_collection(name=name)
+    tmp.modify(name=name)
+    return {"rows_before": total, "rows_after": tmp.count()}
+
+
+def create_snapshot(
+    dest: Optional[Path] = None,
+    *,
+    rag: Optional[RagService] = None,
+    db_url: Optional[str] = None,
+    uploads_dir: Optional[Path] = None,
+    progress: ProgressFn = _noop_progress,
+) -> Dict[str, Any]:
+    """Write a point-in-time snapshot of the app DB, vectors and uploaded originals.
+
+    NumPy collections are frozen together (writers wait on their locks) while
+    the DB is backed up and each collection's log and current vector files
+    are copied aside; the export then reads those copies. Chroma cannot be
+    frozen, so Chroma snapshots run in maintenance mode. Vectors are kept only
+    when their file exists in the copied DB, so a restore never resurrects
+    chunks of deleted files.
+    """
+    rag = rag or RagService()
+    if rag._client is not None:
+        with maintenance_mode("creating a snapshot"):
+            return _create_snapshot(dest, rag, db_url, uploads_dir, progress)
+    return _create_snapshot(dest, rag, db_url, uploads_dir, progress)
+
+
+def _create_snapshot(
+    dest: Optional[Path],
+    rag: RagService,
+    db_url: Optional[str],
+    uploads_dir: Optional[Path],
+    progress: ProgressFn,
+) -> Dict[str, Any]:
+    from app.core.config import get_snapshot_dir
+
+    uploads_dir = uploads_dir or Path("data") / "uploads"
+    name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+    dest = dest or get_snapshot_dir() / name
+    work = dest.with_name(dest.name + ".partial")
+    work.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+
+    progress("database", 0, 1)
+    collections = _all_collections(rag)
+    frozen_dir = work / "frozen"
+    with ExitStack() as stack:
+        numpy_colls = [(i, coll) for i, (_, _, coll) in enumerate(collections) if isinstance(coll, NumpyVectorCollection)]
+        for _, coll in numpy_colls:
+            stack.enter_context(coll.frozen())
+        _backup_sqlite(_sqlite_path(db_url), work / "app.db")
+        for i, coll in numpy_colls:
+            coll.copy_to(frozen_dir / str(i))
+    for i, coll in numpy_colls:
+        kind, key, _ = collections[i]
+        collections[i] = (kind, key, NumpyVectorCollection(frozen_dir / str(i)))
+    file_ids = _file_ids(work / "app.db")
+    progress("database", 1, 1)
+
+    total = sum(coll.count() for _, _, coll in collections)
+    dim = 0
+    exported = 0
+    memory = 0
+    seen = 0
+    with open(work / "records.jsonl", "w", encoding="utf-8") as records, open(work / "vectors.f32", "wb") as vectors:
+        for kind, _, coll in collections:
+            # A fixed id list, so concurrent inserts cannot shift the pages
+            all_ids = _flat(coll.get(include=[]).get("ids"))
+            for start in range(0, len(all_ids), _BATCH):
+                got = coll.get(ids=all_ids[start : start + _BATCH], include=["documents", "metadatas", "embeddings"])
+                ids = _flat(got.get("ids"))
+                if not ids:
+                    continue
+                docs = _flat(got.get("documents"))
+                metas = _flat(got.get("metadatas"))
+                keep = [i for i, m in enumerate(metas) if not (m or {}).get("file_id") or m["file_id"] in file_ids]
+                for i in keep:
+                    records.write(json.dumps({"id": ids[i], "document": docs[i], "metadata": metas[i], "collection": kind}) + "\n")
+                if keep:
+                    embs = as_float32_matrix(got.get("embeddings"))
+                    dim = embs.shape[1]
+                    embs[keep].tofile(vectors)
+                exported += len(keep)
+                if kind == "memory":
+                    memory += len(keep)
+                seen += len(ids)
+                progress("vectors", min(total, seen), total)
+    shutil.rmtree(frozen_dir, ignore_errors=True)
+
+    originals = 0
+    if uploads_dir.exists():
+        for path in uploads_dir.rglob("*"):
+            if path.is_file() and path.stem in file_ids:
+                target = work / "uploads" / path.relative_to(uploads_dir)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(path, target)  # originals are immutable; a hard link is free
+                except OSError:
+                    shutil.copy2(path, target)
+                originals += 1
+    progress("originals", originals, originals)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "name": dest.name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": len(file_ids),
+        "vectors": exported,
+        "memory": memory,
+        "dim": dim,
+        "originals": originals,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    (work / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    # Only complete snapshots get their final name
+    os.replace(work, dest)
+    return manifest
+
+
+def list_snapshots(root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    from app.core.config import get_snapshot_dir
+
+    root = root or get_snapshot_dir()
+    out: List[Dict[str, Any]] = []
+    if not root.exists():
+        return out
+    for path in sorted(root.iterdir(), reverse=True):
+        manifest = path / "manifest.json"
+        if path.is_dir() and manifest.exists():
+            out.append(json.loads(manifest.read_text(encoding="utf-8")))
+    return out
+
+
+def restore_snapshot(
+    source: Path,
+    *,
+    rag: Optional[RagService] = None,
+    db_url: Optional[str] = None,
+    uploads_dir: Optional[Path] = None,
+    progress: ProgressFn = _noop_progress,
+) -> Dict[str, Any]:
+    """Replace DB, vectors and originals with a snapshot.
+
+    Vectors are bulk-loaded from the stored embeddings; nothing is re-embedded.
+    Runs in maintenance mode, so it is safe against a live server: every
+    worker answers 503 until the restore is done and then drops its caches.
+    """
+    manifest = json.loads((source / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    with maintenance_mode(f"restoring snapshot {manifest.get('name')}"):
+        return _restore_snapshot(source, manifest, rag or RagService(), db_url, uploads_dir, progress)
+
+
+def _restore_snapshot(
+    source: Path,
+    manifest: Dict[str, Any],
+    rag: RagService,
+    db_url: Optional[str],
+    uploads_dir: Optional[Path],
+    progress: ProgressFn,
+) -> Dict[str, Any]:
+    from app.services.settings_service import invalidate_all_settings
+
+    uploads_dir = uploads_dir or Path("data") / "uploads"
+    t0 = time.perf_counter()
+
+    progress("database", 0, 1)
+    _backup_sqlite(source / "app.db", _sqlite_path(db_url))
+    try:
+        from app.core.db import engine
+
+        # Pooled connections may cache pages of the replaced database
+        engine.dispose()
+    except Exception:
+        pass
+    try:
+        from app.services.file_catalog import get_file_catalog
+
+        get_file_catalog().invalidate()
+    except Exception:
+        pass
+    # Settings rows came back with the DB; every worker reloads them
+    invalidate_all_settings()
+    progress("database", 1, 1)
+
+    _clear_vectors(rag)
+    total = int(manifest.get("vectors", 0))
+    dim = int(manifest.get("dim", 0))
+    if total and dim:
+        vectors = np.memmap(source / "vectors.f32", dtype=np.float32, mode="r", shape=(total, dim))
+        with open(source / "records.jsonl", encoding="utf-8") as fh:
+            batch: List[dict] = []
+            start = 0
+            for line in fh:
+                batch.append(json.loads(line))
+                if len(batch) == _BATCH:
+                    _load_batch(rag, batch, vectors[start : start + len(batch)])
+                    start += len(batch)
+                    batch = []
+                    progress("vectors", start, total)
+            if batch:
+                _load_batch(rag, batch, vectors[start : start + len(batch)])
+                start += len(batch)
+        progress("vectors", total, total)
+
+    restored = 0
+    snap_uploads = source / "uploads"
+    keep = set()
+    if snap_uploads.exists():
+        for path in snap_uploads.rglob("*"):
+            if path.is_file():
+                target = uploads_dir / path.relative_to(snap_uploads)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Snapshot originals may be hard links to the live files
+                if not (target.exists() and os.path.samefile(path, target)):
+                    shutil.copy2(path, target)
+                keep.add(target.resolve())
+                restored += 1
+    if uploads_dir.exists():
+        # Originals of files that do not exist in the restored DB are orphans now
+        for path in uploads_dir.rglob("*"):
+            if path.is_file() and path.resolve() not in keep:
+                path.unlink()
+    progress("originals", restored, restored)
+    bump_vector_epoch()
+    return {"snapshot": manifest.get("name"), "vectors": total, "originals": restored, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _clear_vectors(rag: RagService) -> None:
+    coll = rag._collection
+    if isinstance(coll, PartitionedCollection):
+        coll.drop_all()
+    elif isinstance(coll, NumpyVectorCollection):
+        coll.clear()
+    elif rag._client is not None:
+        rag._client.delete_collection(name=coll.name)
+        rag._collection = rag._client.get_or_create_collection(name=coll.name)
+    memory = rag.memory_collection()
+    if isinstance(memory, NumpyVectorCollection):
+        memory.clear()
+    elif rag._client is not None:
+        rag._client.delete_collection(name=memory.name)
+        rag._memory = None
+
+
+def _load_batch(rag: RagService, batch: List[dict], vectors: np.ndarray) -> None:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    # Snapshots written before memory was included carry no collection field
+    for kind in ("documents", "memory"):
+        idx = [i for i, r in enumerate(batch) if r.get("collection", "documents") == kind]
+        if not idx:
+            continue
+        load = rag.add_memory_records if kind == "memory" else rag.add_records
+        load(
+            ids=[batch[i]["id"] for i in idx],
+            documents=[batch[i]["document"] for i in idx],
+            metadatas=[batch[i]["metadata"] for i in idx],
+            embeddings=vectors[idx],
+        )
+
+
+@dataclass
+class MaintenanceJob:
+    id: str
+    kind: str
+    status: str = "queued"
+    phase: Optional[str] = None
+    done: int = 0
+    total: int = 0
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    _thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"phase": self.phase, "done": self.done, "total": self.total},
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class MaintenanceJobs:
+    """Runs one maintenance job at a time on a background thread and tracks progress."""
+
+    def __init__(self, max_history: int = 50) -> None:
+        self._jobs: Dict[str, MaintenanceJob] = {}
+        self._lock = threading.Lock()
+        self._max_history = max_history
+
+    def submit(self, kind: str, fn: Callable[[ProgressFn], Dict[str, Any]]) -> MaintenanceJob:
+        with self._lock:
+            if any(j.status in ("queued", "running") for j in self._jobs.values()):
+                raise RuntimeError("Another maintenance job is running")
+            job = MaintenanceJob(id=uuid.uuid4().hex, kind=kind)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._max_history:
+                self._jobs.pop(next(iter(self._jobs)))
+
+        def _progress(phase: str, done: int, total: int) -> None:
+            job.phase, job.done, job.total = phase, done, total
+
+        def _run() -> None:
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc).isoformat()
+            try:
+                job.result = fn(_progress)
+                job.status = "done"
+            except Exception as exc:
+                job.error = str(exc)
+                job.status = "error"
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+
+        job._thread = threading.Thread(target=_run, name=f"maintenance-{kind}", daemon=True)
+        job._thread.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[MaintenanceJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[MaintenanceJob]:
+        return list(reversed(list(self._jobs.values())))
+
+
+_JOBS_INSTANCE: Optional[MaintenanceJobs] = None
+
+
+def get_maintenance_jobs() -> MaintenanceJobs:
+    global _JOBS_INSTANCE
+    if _JOBS_INSTANCE is None:
+        _JOBS_INSTANCE = MaintenanceJobs()
+    return _JOBS_INSTANCE
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.rag import RagService
+from app.services.token_count import TokenCounter
+
+
+MEMORY_TYPES = ("summary", "facts", "tools")
+
+# ADR-007: inject only the top 2-3 concise items of each kind per turn
+DEFAULT_CAPS: Dict[str, int] = {"summary": 2, "facts": 3, "tools": 2}
+
+
+@dataclass
+class MemoryItem:
+    memory_type: str
+    text: str
+    score: Optional[float] = None
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return TokenCounter.estimate_tokens(self.text)
+
+
+@dataclass
+class MemoryBundle:
+    items: List[MemoryItem]
+    budget_tokens: int
+
+    @property
+    def tokens(self) -> int:
+        return sum(item.tokens for item in self.items)
+
+    def texts(self, memory_type: str) -> List[str]:
+        return [item.text for item in self.items if item.memory_type == memory_type]
+
+    def to_debug(self) -> dict:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.memory_type] = counts.get(item.memory_type, 0) + 1
+        return {"tokens": self.tokens, "budget": self.budget_tokens, "counts": counts}
+
+
+class MemoryArtifactService:
+    """Per-session conversation memory (ADR-007) stored in the vector ``memory`` collection.
+
+    Three artifact kinds share the collection, told apart by ``memory_type``:
+    ``summary`` (rolling summary segments), ``facts`` (captured key/value
+    facts) and ``tools`` (web search snippets). ``retrieve`` fetches all
+    kinds for a turn with one session-scoped query and packs the best items
+    under the per-turn memory token budget.
+    """
+
+    def __init__(self, rag: Optional[RagService] = None) -> None:
+        self._rag = rag
+
+    def _get_rag(self) -> RagService:
+        if self._rag is None:
+            self._rag = RagService()
+        return self._rag
+
+    def put_facts(self, session_id: str, facts: Sequence[Tuple[str, str]]) -> None:
+        if not facts:
+            return
+        self._get_rag().upsert_memory(
+            ids=[f"facts:{session_id}:{_norm(k)}" for k, _ in facts],
+            documents=[f"{k}: {v}" for k, v in facts],
+            metadatas=[{"session_id": session_id, "memory_type": "facts", "key": k} for k, _ in facts],
+        )
+
+    def put_summaries(self, session_id: str, segments: Sequence[dict]) -> None:
+        """Replace the session's summary artifacts with the current summary segments."""
+        rag = self._get_rag()
+        rag.memory_collection().delete(where={"$and": [{"session_id": session_id}, {"memory_type": "summary"}]})
+        segments = [s for s in segments if str(s.get("text") or "").strip()]
+        if not segments:
+            return
+        rag.upsert_memory(
+            ids=[f"summary:{session_id}:{int(s['level'])}:{int(s['first_id'])}" for s in segments],
+            documents=[str(s["text"]).strip() for s in segments],
+            metadatas=[
+                {
+                    "session_id": session_id,
+                    "memory_type": "summary",
+                    "level": int(s["level"]),
+                    "first_id": int(s["first_id"]),
+                    "last_id": int(s["last_id"]),
+                }
+                for s in segments
+            ],
+        )
+
+    def put_tools(self, session_id: str, query: str, results: Sequence[dict]) -> None:
+        """Keep web search snippets so later turns can recall them without searching again."""
+        rows = []
+        for r in results:
+            snippet = str(r.get("snippet") or "").strip()
+            if not snippet:
+                continue
+            title = str(r.get("title") or "").strip()
+            url = str(r.get("url") or "")
+            digest = hashlib.sha1((url or snippet).encode("utf-8")).hexdigest()[:16]
+            rows.append((f"tools:{session_id}:{digest}", f"{title}: {snippet}" if title else snippet, url))
+        if not rows:
+            return
+        now = int(time.time())
+        self._get_rag().upsert_memory(
+            ids=[r[0] for r in rows],
+            documents=[r[1] for r in rows],
+            metadatas=[
+                {"session_id": session_id, "memory_type": "tools", "url": url, "query": query, "ts": now}
+                for _, _, url in rows
+            ],
+        )
+
+    def retrieve(
+        self,
+        session_id: str,
+        question: str,
+        budget_tokens: int,
+        types: Sequence[str] = MEMORY_TYPES,
+        caps: Optional[Dict[str, int]] = DEFAULT_CAPS,
+        pinned: Sequence[MemoryItem] = (),
+        top_k: int = 12,
+    ) -> MemoryBundle:
+        """Pack ``pinned`` items, then the best-scoring artifacts, into ``budget_tokens``.
+
+        Pinned items (the newest summary) go first and are cut to fit; the
+        rest are skipped when they would exceed the budget or their kind's cap.
+        """
+        bundle = MemoryBundle(items=[], budget_tokens=budget_tokens)
+        used = 0
+        for item in pinned:
+            text = _fit(item.text, budget_tokens - used)
+            if text:
+                bundle.items.append(MemoryItem(item.memory_type, text, item.score, item.metadata))
+                used += TokenCounter.estimate_tokens(text)
+        if not (question or "").strip() or used >= budget_tokens:
+            return bundle
+        type_filter: dict = {"memory_type": types[0]} if len(types) == 1 else {"memory_type": {"$in": list(types)}}
+        hits = self._get_rag().query_memory(
+            question, top_k=top_k, where={"$and": [{"session_id": session_id}, type_filter]}
+        )
+        seen = {item.text for item in bundle.items}
+        taken: Dict[str, int] = {}
+        for hit in hits:
+            meta = hit.get("metadata") or {}
+            kind = str(meta.get("memory_type") or "")
+            text = str(hit.get("text") or "").strip()
+            if not text or text in seen:
+                continue
+            if caps is not None and taken.get(kind, 0) >= caps.get(kind, 0):
+                continue
+            cost = TokenCounter.estimate_tokens(text)
+            if used + cost > budget_tokens:
+                continue
+            bundle.items.append(MemoryItem(kind, text, hit.get("score"), meta))
+            seen.add(text)
+            taken[kind] = taken.get(kind, 0) + 1
+            used += cost
+        return bundle
+
+
+def _norm(key: str) -> str:
+    return " ".join((key or "").split()).lower()
+
+
+def _fit(text: str, budget_tokens: int) -> str:
+    """Cut ``text`` to roughly ``budget_tokens`` using the same words-per-token heuristic."""
+    text = (text or "").strip()
+    if budget_tokens <= 0 or not text:
+        return ""
+    if TokenCounter.estimate_tokens(text) <= budget_tokens:
+        return text
+    return " ".join(text.split()[: int(budget_tokens * 1.2)])
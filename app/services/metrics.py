@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+class Metrics:
+    """In-process counters and timing summaries exposed at ``/system/metrics``.
+
+    Timings keep the most recent ``window`` samples per name, which is enough
+    for p50/p95 on a single-user desktop backend without a metrics stack.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, Deque[float]] = {}
+        self._window = window
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self._window)
+            samples.append(float(value))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: sorted(samples) for name, samples in self._timings.items()}
+        summary = {}
+        for name, values in timings.items():
+            if not values:
+                continue
+            summary[name] = {
+                "count": len(values),
+                "avg": round(sum(values) / len(values), 3),
+                "p50": round(values[len(values) // 2], 3),
+                "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                "max": round(values[-1], 3),
+            }
+        return {"counters": counters, "timings": summary}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+_METRICS_INSTANCE: Metrics | None = None
+
+
+def get_metrics() -> Metrics:
+    global _METRICS_INSTANCE
+    if _METRICS_INSTANCE is None:
+        _METRICS_INSTANCE = Metrics()
+    return _METRICS_INSTANCE
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import json
+import re
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
+from app.core.config import get_personality_cues_file
 from app.models.settings import PersonalityProfileModel, SessionPersonalityOverrideModel
 from app.models.session import MessageModel
+from app.services.settings_service import get_settings_cache, invalidate_settings
 
 
 ALLOWED_FORMALITY = {"formal", "neutral", "casual"}
@@ -67,6 +74,156 @@ PREDEFINED_PROFILES = {
 }
 
 
+# Cue -> weight per trait value. A value is picked once its cues score CUE_THRESHOLD
+# across the detection window; on a tie the value listed first wins.
+DEFAULT_CUES: Dict[str, Dict[Any, Dict[str, float]]] = {
+	"formality": {
+		"formal": {"dear": 1.0, "regards": 1.0, "sincerely": 1.0, "please advise": 1.0},
+		"casual": {"hey": 1.0, "yo": 1.0, "what's up": 1.0, "sup": 1.0, "thx": 1.0, "pls": 1.0},
+	},
+	# Three exclamation marks count as one humor cue
+	"humor": {"frequent": {"lol": 1.0, "haha": 1.0, "😀": 1.0, ":)": 1.0, "!": 1 / 3}},
+	"swearing": {True: {"fuck": 1.0, "shit": 1.0, "damn": 1.0}},
+	"length": {
+		"concise": {"tl;dr": 1.0, "short pls": 1.0, "brief": 1.0, "concise": 1.0},
+		"elaborate": {"explain in detail": 1.0, "step by step": 1.0, "elaborate": 1.0},
+	},
+	"detail": {"high": {"details": 1.0, "in-depth": 1.0, "why": 1.0}},
+	"proactivity": {True: {"suggest": 1.0, "recommend": 1.0, "what else": 1.0, "next steps": 1.0}},
+	"style": {
+		"technical": {"api": 1.0, "stacktrace": 1.0, "compile": 1.0, "sql": 1.0, "runtime": 1.0},
+		"creative": {"story": 1.0, "metaphor": 1.0, "imagine": 1.0, "poem": 1.0},
+	},
+}
+
+CUE_THRESHOLD = 1.0
+
+_BOOL_TRAITS = {"swearing", "proactivity"}
+
+
+class CueMatcher:
+	"""All personality cues compiled into one regex, scored in a single pass.
+
+	Word-like cue edges get word boundaries (so "yo" does not fire on "you")
+	and the pattern sits in a lookahead, so cues that overlap or nest at
+	different offsets ("short pls" / "pls") are all counted.
+	"""
+
+	def __init__(self, cues: Dict[str, Dict[Any, Dict[str, float]]]) -> None:
+		self._targets: Dict[str, List[Tuple[str, Any, float]]] = {}
+		self._order: Dict[str, List[Any]] = {}
+		for trait, values in cues.items():
+			for value, weights in values.items():
+				self._order.setdefault(trait, []).append(value)
+				for cue, weight in weights.items():
+					key = " ".join(cue.lower().split())
+					if key and weight:
+						self._targets.setdefault(key, []).append((trait, value, float(weight)))
+		alternatives = [_cue_pattern(c) for c in sorted(self._targets, key=len, reverse=True)]
+		self._pattern = re.compile(f"(?=({'|'.join(alternatives)}))") if alternatives else None
+
+	def score(self, text: str) -> Dict[Tuple[str, Any], float]:
+		"""Summed cue weights per (trait, value) found in ``text``."""
+		scores: Dict[Tuple[str, Any], float] = {}
+		if self._pattern is None or not text:
+			return scores
+		for match in self._pattern.finditer(text.lower()):
+			for trait, value, weight in self._targets.get(" ".join(match.group(1).split()), ()):
+				scores[(trait, value)] = scores.get((trait, value), 0.0) + weight
+		return scores
+
+	def decide(self, totals: Dict[Tuple[str, Any], float]) -> Dict[str, Any]:
+		"""Per trait, the best-scoring value that reaches ``CUE_THRESHOLD``."""
+		updates: Dict[str, Any] = {}
+		for trait, values in self._order.items():
+			best, best_score = None, CUE_THRESHOLD - 1e-9
+			for value in values:
+				score = totals.get((trait, value), 0.0)
+				if score > best_score:
+					best, best_score = value, score
+			if best is not None:
+				updates[trait] = best
+		return updates
+
+
+def _cue_pattern(cue: str) -> str:
+	body = r"\s+".join(re.escape(part) for part in cue.split(" "))
+	head = r"(?<!\w)" if re.match(r"\w", cue) else ""
+	tail = r"(?!\w)" if re.search(r"\w$", cue) else ""
+	return head + body + tail
+
+
+def load_cues(path: Optional[Path] = None) -> Dict[str, Dict[Any, Dict[str, float]]]:
+	"""Built-in cues with the weights from ``PERSONALITY_CUES_FILE`` merged over them."""
+	cues = {trait: {value: dict(w) for value, w in values.items()} for trait, values in DEFAULT_CUES.items()}
+	path = path if path is not None else get_personality_cues_file()
+	if path is None:
+		return cues
+	try:
+		extra = json.loads(path.read_text(encoding="utf-8"))
+	except Exception:
+		# A broken cue file should not break chat; keep the built-in cues
+		return cues
+	for trait, values in (extra or {}).items():
+		if not isinstance(values, dict):
+			continue
+		for value, weights in values.items():
+			if trait in _BOOL_TRAITS:
+				value = str(value).lower() == "true"
+			if not isinstance(weights, dict):
+				continue
+			target = cues.setdefault(trait, {}).setdefault(value, {})
+			for cue, weight in weights.items():
+				try:
+					target[cue] = float(weight)
+				except (TypeError, ValueError):
+					continue
+	return cues
+
+
+class _CueWindow:
+	"""Cue scores of a session's last N messages, kept as a running total."""
+
+	def __init__(self, size: int, matcher: CueMatcher) -> None:
+		self.size = size
+		self.matcher = matcher
+		self.last_id = 0
+		self.scores: Deque[Dict[Tuple[str, Any], float]] = deque()
+		self.totals: Dict[Tuple[str, Any], float] = {}
+		self.lock = threading.Lock()
+
+	def push(self, scores: Dict[Tuple[str, Any], float]) -> None:
+		self.scores.append(scores)
+		self._add(scores, 1.0)
+		if len(self.scores) > self.size:
+			self._add(self.scores.popleft(), -1.0)
+
+	def _add(self, scores: Dict[Tuple[str, Any], float], sign: float) -> None:
+		for key, value in scores.items():
+			total = self.totals.get(key, 0.0) + sign * value
+			if total > 1e-9:
+				self.totals[key] = total
+			else:
+				self.totals.pop(key, None)
+
+
+_CUE_MATCHER: CueMatcher | None = None
+_CUE_MATCHER_KEY: Optional[Path] = None
+_WINDOWS: "OrderedDict[str, _CueWindow]" = OrderedDict()
+_WINDOWS_MAX = 256
+_WINDOWS_LOCK = threading.Lock()
+
+
+def get_cue_matcher() -> CueMatcher:
+	"""Shared matcher; recompiled only when PERSONALITY_CUES_FILE changes."""
+	global _CUE_MATCHER, _CUE_MATCHER_KEY
+	path = get_personality_cues_file()
+	if _CUE_MATCHER is None or _CUE_MATCHER_KEY != path:
+		_CUE_MATCHER = CueMatcher(load_cues(path))
+		_CUE_MATCHER_KEY = path
+	return _CUE_MATCHER
+
+
 class PersonalityService:
 	def __init__(self, db: Session) -> None:
 		self.db = db
@@ -81,6 +238,9 @@ class PersonalityService:
 		return row
 
 	def get_current(self) -> Dict[str, Any]:
+		return get_settings_cache(self.db).get("personality", 1, self._load_current)
+
+	def _load_current(self) -> Dict[str, Any]:
 		row = self._get_or_create()
 		return {
 			"formality": row.formality,
@@ -94,10 +254,7 @@ class PersonalityService:
 		}
 
 	def get_effective_for_session(self, session_id: str) -> Dict[str, Any]:
-		base = self.get_current()
-		ov = self.db.get(SessionPersonalityOverrideModel, session_id)
-		overrides = dict(ov.overrides_json) if ov and ov.overrides_json else {}
-		return {**base, **overrides}
+		return {**self.get_current(), **self.get_session_overrides(session_id)}
 
 	def update_partial(self, payload: Dict[str, Any]) -> Dict[str, Any]:
 		row = self._get_or_create()
@@ -121,6 +278,7 @@ class PersonalityService:
 		row.last_updated = datetime.utcnow()
 		self.db.add(row)
 		self.db.commit()
+		invalidate_settings(self.db)
 		self.db.refresh(row)
 		return self.get_current()
 
@@ -131,8 +289,11 @@ class PersonalityService:
 		return self.update_partial(preset)
 
 	def get_session_overrides(self, session_id: str) -> Dict[str, Any]:
-		row = self.db.get(SessionPersonalityOverrideModel, session_id)
-		return dict(row.overrides_json) if row and row.overrides_json else {}
+		def load() -> Dict[str, Any]:
+			row = self.db.get(SessionPersonalityOverrideModel, session_id)
+			return dict(row.overrides_json) if row and row.overrides_json else {}
+
+		return get_settings_cache(self.db).get("personality_override", session_id, load)
 
 	def update_session_overrides(self, session_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
 		allowed_keys = {
@@ -151,52 +312,37 @@ class PersonalityService:
 		row.overrides_json = {**(row.overrides_json or {}), **updates}
 		self.db.add(row)
 		self.db.commit()
+		invalidate_settings(self.db)
 		self.db.refresh(row)
 		return dict(row.overrides_json)
 
 	def detect_from_messages(self, session_id: str, max_messages: int = 20) -> Dict[str, Any]:
 		"""Heuristic detection of user style from recent messages.
 
-		Looks at the last N user messages in the session and infers adjustments.
-		This is intentionally lightweight to keep overhead minimal.
+		Looks at the last N messages of the session and infers adjustments
+		from the user's. Cue scores are kept per session as a running total,
+		so each call only scans messages added since the previous one.
 		"""
-		rows: List[MessageModel] = self.db.exec(
-			select(MessageModel)
-			.where(MessageModel.session_id == session_id)
-			.order_by(MessageModel.id.desc())
-			.limit(max_messages)
-		).all()
-		user_texts = [r.content for r in rows if r.role == "user" and isinstance(r.content, str)]
-		joined = "\n".join(user_texts).lower()
-		updates: Dict[str, Any] = {}
-		# Formality cues
-		if any(w in joined for w in ("dear ", "regards", "sincerely", "please advise")):
-			updates["formality"] = "formal"
-		elif any(w in joined for w in ("hey", "yo", "what's up", "sup", "thx", "pls")):
-			updates["formality"] = "casual"
-		# Humor detection
-		if any(w in joined for w in ("lol", "haha", "😀", ":)")) or joined.count("!") >= 3:
-			updates["humor"] = "frequent"
-		# Swearing detection (very basic)
-		if any(w in joined for w in ("fuck", "shit", "damn")):
-			updates["swearing"] = True
-		# Length preference
-		if any(w in joined for w in ("tl;dr", "short pls", "brief", "concise")):
-			updates["length"] = "concise"
-		elif any(w in joined for w in ("explain in detail", "step by step", "elaborate")):
-			updates["length"] = "elaborate"
-		# Detail preference
-		if any(w in joined for w in ("details", "in-depth", "why")):
-			updates["detail"] = "high"
-		# Proactivity cues
-		if any(w in joined for w in ("suggest", "recommend", "what else", "next steps")):
-			updates["proactivity"] = True
-		# Style cues
-		if any(w in joined for w in ("api", "stacktrace", "compile", "sql", "runtime")):
-			updates["style"] = "technical"
-		elif any(w in joined for w in ("story", "metaphor", "imagine", "poem")):
-			updates["style"] = "creative"
-		return updates
+		matcher = get_cue_matcher()
+		with _WINDOWS_LOCK:
+			window = _WINDOWS.get(session_id)
+			if window is None or window.size != max_messages or window.matcher is not matcher:
+				window = _CueWindow(max_messages, matcher)
+			_WINDOWS[session_id] = window
+			_WINDOWS.move_to_end(session_id)
+			while len(_WINDOWS) > _WINDOWS_MAX:
+				_WINDOWS.popitem(last=False)
+		with window.lock:
+			rows = self.db.exec(
+				select(MessageModel.id, MessageModel.role, MessageModel.content)
+				.where(MessageModel.session_id == session_id, MessageModel.id > window.last_id)
+				.order_by(MessageModel.id.desc())
+				.limit(max_messages)
+			).all()
+			for mid, role, content in reversed(rows):
+				window.push(matcher.score(content) if role == "user" and isinstance(content, str) else {})
+				window.last_id = mid
+			return matcher.decide(window.totals)
 
 	def adapt_global_profile(self, session_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
 		"""Detect from recent messages and persist any changes to the global profile.
@@ -224,7 +370,8 @@ class PersonalityService:
 			cleaned["proactivity"] = bool(merged["proactivity"])
 		if merged.get("style") in ALLOWED_STYLE:
 			cleaned["style"] = merged["style"]
-		if not cleaned:
+		# Nothing new detected: skip the write (and the settings cache invalidation)
+		if not cleaned or all(before.get(k) == v for k, v in cleaned.items()):
 			return before, before
 		after = self.update_partial(cleaned)
 		return before, after
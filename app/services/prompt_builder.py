@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.services.token_count import TokenCounter
+
+
+BASE_SYSTEM_PROMPT = "You are Garmin, a local personal assistant."
+_SEPARATOR = "\n\x1e"  # between serialized messages; never produced by normal text
+
+
+@dataclass
+class AssembledPrompt:
+    messages: List[Dict[str, str]]
+    prefix_tokens: int
+    prompt_tokens: int
+    reused_prefix_tokens: int
+    prefix_hash: str
+    sections: List[str] = field(default_factory=list)
+
+    def debug(self) -> dict:
+        return {
+            "prefix_hash": self.prefix_hash,
+            "prefix_tokens": self.prefix_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "reused_prefix_tokens": self.reused_prefix_tokens,
+            "sections": self.sections,
+        }
+
+
+def _clean(text: Optional[str]) -> str:
+    # Canonical whitespace so equal content serializes to identical bytes
+    lines = (text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _serialize(messages: Iterable[Dict[str, str]]) -> str:
+    return _SEPARATOR.join(f"{m['role']}\n{m['content']}" for m in messages)
+
+
+class PromptBuilder:
+    """Assemble chat prompts so consecutive turns share the longest possible prefix.
+
+    Order, most to least stable:
+
+    1. system: base prompt + personality + rolling summary (changes only when
+       the profile adapts or older turns are trimmed)
+    2. the untrimmed history, which only grows at the end
+    3. per-turn context (knowledge entries, recalled memory, retrieved chunks) as a system
+       message placed just before the latest user message
+    4. the latest user message
+
+    Backends that keep the KV cache warm (Ollama with ``keep_alive``) can then
+    skip re-evaluating everything up to the previous turn's context block.
+    The builder remembers the last prompt per session to report how many
+    prefix tokens were reusable.
+    """
+
+    def __init__(self, max_sessions: int = 256) -> None:
+        self._last: "OrderedDict[str, str]" = OrderedDict()
+        self._max_sessions = max_sessions
+        self._lock = threading.Lock()
+
+    def build(
+        self,
+        session_id: str,
+        history: Sequence[Dict[str, str]],
+        personality: str = "",
+        summary: str = "",
+        knowledge: Sequence[str] = (),
+        context: Sequence[str] = (),
+        recalled: Sequence[str] = (),
+    ) -> AssembledPrompt:
+        sections = ["system"]
+        system = [BASE_SYSTEM_PROMPT]
+        if _clean(personality):
+            system.append("Personality: " + _clean(personality))
+            sections.append("personality")
+        if _clean(summary):
+            system.append("Summary of earlier conversation:\n" + _clean(summary))
+            sections.append("summary")
+        prefix = [{"role": "system", "content": "\n\n".join(system)}]
+
+        turns = [{"role": m["role"], "content": _clean(m["content"])} for m in history]
+        if turns:
+            sections.append("history")
+        tail = turns[-1:] if turns and turns[-1]["role"] == "user" else []
+        body = turns[: len(turns) - len(tail)]
+
+        volatile = []
+        facts = sorted({_clean(k) for k in knowledge if _clean(k)})
+        if facts:
+            volatile.append("Known facts about the user:\n" + "\n".join(f"- {k}" for k in facts))
+            sections.append("knowledge")
+        memories = [_clean(r) for r in recalled if _clean(r)]
+        if memories:
+            volatile.append("Recalled from earlier in this conversation:\n" + "\n".join(f"- {r}" for r in memories))
+            sections.append("recalled")
+        chunks = [_clean(c) for c in context if _clean(c)]
+        if chunks:
+            volatile.append("Relevant excerpts from the user's files:\n" + "\n---\n".join(chunks))
+            sections.append("context")
+        context_msgs = [{"role": "system", "content": "\n\n".join(volatile)}] if volatile else []
+
+        messages = prefix + body + context_msgs + tail
+        prefix_text = _serialize(prefix)
+        full_text = _serialize(messages)
+        reused = self._remember(session_id, full_text)
+        return AssembledPrompt(
+            messages=messages,
+            prefix_tokens=TokenCounter.estimate_tokens(prefix_text),
+            prompt_tokens=TokenCounter.estimate_tokens(full_text),
+            reused_prefix_tokens=TokenCounter.estimate_tokens(reused),
+            prefix_hash=hashlib.sha1(prefix_text.encode("utf-8")).hexdigest()[:12],
+            sections=sections,
+        )
+
+    def _remember(self, session_id: str, text: str) -> str:
+        """Store this turn's prompt and return the part shared with the previous one."""
+        with self._lock:
+            previous = self._last.pop(session_id, "")
+            self._last[session_id] = text
+            while len(self._last) > self._max_sessions:
+                self._last.popitem(last=False)
+        n = 0
+        limit = min(len(previous), len(text))
+        while n < limit and previous[n] == text[n]:
+            n += 1
+        return text[:n]
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._last.pop(session_id, None)
+
+
+_PROMPT_BUILDER_INSTANCE: PromptBuilder | None = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    global _PROMPT_BUILDER_INSTANCE
+    if _PROMPT_BUILDER_INSTANCE is None:
+        _PROMPT_BUILDER_INSTANCE = PromptBuilder()
+    return _PROMPT_BUILDER_INSTANCE
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+STORAGE_DTYPES = {"float32", "float16", "int8"}
+
+# Rows scored per block during a scan; bounds the float32 temporary to ~block * dim * 4 bytes
+_SCAN_BLOCK_ROWS = 16384
+
+# Quantized searches rescore this many candidates per requested result
+RESCORE_MULTIPLIER = 4
+
+
+def as_float32_matrix(vectors: object) -> np.ndarray:
+    """Coerce embedder output (ndarray or nested lists) to a contiguous float32 2D array."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    return np.ascontiguousarray(arr)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode float32 rows for storage.
+
+    int8 uses symmetric per-row scalar quantization: ``codes * scale ~= vector``.
+    Returns (codes, scales); scales is None for float dtypes.
+    """
+    vectors = as_float32_matrix(vectors)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        max_abs = np.abs(vectors).max(axis=1)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unsupported storage dtype: {dtype}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+class QuantizedMatrix:
+    """Growable row store of embeddings kept in float32, float16 or int8.
+
+    Scans compute scores blockwise in float32 so quantized rows never get
+    materialized as a full-precision copy. ``search`` optionally rescores the
+    top ``k * rescore_multiplier`` candidates with full-precision vectors.
+    """
+
+    def __init__(self, dim: int, dtype: str = "float32", capacity: int = 1024) -> None:
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported storage dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self._n = 0
+        self._codes = np.zeros((max(1, capacity), dim), dtype=np.dtype(dtype))
+        self._scales = np.ones(max(1, capacity), dtype=np.float32) if dtype == "int8" else None
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        n = self._codes[: self._n].nbytes
+        if self._scales is not None:
+            n += self._scales[: self._n].nbytes
+        return n
+
+    def _reserve(self, rows: int) -> None:
+        cap = self._codes.shape[0]
+        if rows <= cap:
+            return
+        new_cap = max(rows, cap * 2)
+        codes = np.zeros((new_cap, self.dim), dtype=self._codes.dtype)
+        codes[: self._n] = self._codes[: self._n]
+        self._codes = codes
+        if self._scales is not None:
+            scales = np.ones(new_cap, dtype=np.float32)
+            scales[: self._n] = self._scales[: self._n]
+            self._scales = scales
+
+    def append(self, vectors: object) -> np.ndarray:
+        """Append rows and return their row indexes."""
+        codes, scales = quantize(as_float32_matrix(vectors), self.dtype)
+        start = self._n
+        self._reserve(start + len(codes))
+        self._codes[start : start + len(codes)] = codes
+        if self._scales is not None and scales is not None:
+            self._scales[start : start + len(codes)] = scales
+        self._n += len(codes)
+        return np.arange(start, self._n)
+
+    def set_rows(self, rows: np.ndarray, vectors: object) -> None:
+        codes, scales = quantize(as_float32_matrix(vectors), self.dtype)
+        self._codes[rows] = codes
+        if self._scales is not None and scales is not None:
+            self._scales[rows] = scales
+
+    def rows(self, rows: np.ndarray) -> np.ndarray:
+        """Reconstructed float32 vectors for the given rows."""
+        return dequantize(self._codes[rows], self._scales[rows] if self._scales is not None else None)
+
+    def take(self, keep: np.ndarray) -> "QuantizedMatrix":
+        """New matrix holding only ``keep`` rows (in order); used for compaction."""
+        out = QuantizedMatrix(self.dim, self.dtype, capacity=max(1, len(keep)))
+        out._codes[: len(keep)] = self._codes[keep]
+        if out._scales is not None and self._scales is not None:
+            out._scales[: len(keep)] = self._scales[keep]
+        out._n = len(keep)
+        return out
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot-product scores (cosine for normalized vectors) for all or selected rows."""
+        q = as_float32_matrix(query)[0]
+        if rows is not None:
+            out = self._codes[rows].astype(np.float32) @ q
+            if self._scales is not None:
+                out *= self._scales[rows]
+            return out
+        out = np.empty(self._n, dtype=np.float32)
+        for start in range(0, self._n, _SCAN_BLOCK_ROWS):
+            end = min(self._n, start + _SCAN_BLOCK_ROWS)
+            block = self._codes[start:end]
+            out[start:end] = (block if block.dtype == np.float32 else block.astype(np.float32)) @ q
+            if self._scales is not None:
+                out[start:end] *= self._scales[start:end]
+        return out
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        rescore_multiplier: int = RESCORE_MULTIPLIER,
+        originals: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows by score, best first; ``mask`` is a boolean pre-filter over rows."""
+        if self._n == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if mask is not None:
+            candidates = np.flatnonzero(mask[: self._n])
+            if candidates.size == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            scores = self.scores(query, candidates)
+        else:
+            candidates = None
+            scores = self.scores(query)
+        rescore = originals is not None and self.dtype != "float32"
+        n_cand = min(len(scores), k * max(1, rescore_multiplier) if rescore else k)
+        top = top_k_indices(scores, n_cand)
+        rows = candidates[top] if candidates is not None else top
+        top_scores = scores[top]
+        if rescore:
+            return rescore_rows(query, rows, k, originals)
+        return rows[:k], top_scores[:k]
+
+
+def rescore_rows(
+    query: np.ndarray, rows: np.ndarray, k: int, originals: Callable[[np.ndarray], np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Re-rank candidate ``rows`` by exact float32 scores and keep the best ``k``."""
+    if rows.size == 0:
+        return rows, np.empty(0, dtype=np.float32)
+    exact = as_float32_matrix(originals(rows)) @ as_float32_matrix(query)[0]
+    order = np.argsort(-exact, kind="stable")[:k]
+    return rows[order], exact[order]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k largest scores, sorted descending, via argpartition."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
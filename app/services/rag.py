@@ -1,16 +1,31 @@
 from __future__ import annotations
 
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 
-import chromadb
-from chromadb.api.models.Collection import Collection
-from chromadb.config import Settings
+import numpy as np
 from pypdf import PdfReader
 
+try:  # Optional when VECTOR_BACKEND=NUMPY
+    import chromadb
+    from chromadb.api.models.Collection import Collection
+    from chromadb.config import Settings
+except Exception:  # pragma: no cover - environments without chromadb
+    chromadb = None  # type: ignore[assignment]
+    Collection = object  # type: ignore[assignment,misc]
+    Settings = None  # type: ignore[assignment]
+
+from app.core.config import get_vector_version_file
+from app.services.quantization import as_float32_matrix
+from app.services.vector_index import NumpyVectorCollection, drop_numpy_collection, get_numpy_collection
+from app.services.vector_partitions import GLOBAL_PARTITION, PartitionedCollection
+from app.services.version_file import bump_version_file, file_version
+
 
 class SentenceTransformerEmbeddingModel:
     def __init__(self, model_name: str = "sentence-transformers/multi-qa-MiniLM-L12-v2", device: str = "cpu") -> None:
@@ -18,7 +33,7 @@ class SentenceTransformerEmbeddingModel:
 
         self._model = SentenceTransformer(model_name, device=device)
 
-    def embed(self, texts: list[str]) -> list[list[float]]:
+    def embed(self, texts: list[str]) -> np.ndarray:
         vectors = self._model.encode(
             texts,
             convert_to_numpy=True,
@@ -26,57 +41,137 @@ class SentenceTransformerEmbeddingModel:
             batch_size=32,
             show_progress_bar=False,
         )
-        return [v.astype(float).tolist() for v in vectors]
+        # Keep one contiguous float32 block; never box into Python floats
+        return as_float32_matrix(vectors)
 
 
 @dataclass
 class FakeEmbeddingModel:
     embed_dim: int = 8
 
-    def embed(self, texts: list[str]) -> list[list[float]]:
+    def embed(self, texts: list[str]) -> np.ndarray:
         # Deterministic pseudo-embeddings based on text hash
-        vecs: list[list[float]] = []
-        for t in texts:
+        vecs = np.empty((len(texts), self.embed_dim), dtype=np.float32)
+        for row, t in enumerate(texts):
             seed = abs(hash(t))
-            vals = [((seed >> i) & 255) / 255.0 for i in range(self.embed_dim)]
-            vecs.append(vals)
+            vecs[row] = [((seed >> i) & 255) / 255.0 for i in range(self.embed_dim)]
         return vecs
 
 
+# Process-wide embedders keyed by (backend, model, device); loading a model per request is expensive
+_EMBEDDERS: dict[tuple[str, str, str], object] = {}
+_EMBEDDERS_LOCK = threading.Lock()
+
+
+def get_shared_embedder() -> object:
+    backend = (os.getenv("EMBEDDINGS_BACKEND") or "SENTENCE_TRANSFORMERS").upper()
+    model_name = os.getenv("EMBEDDINGS_MODEL_NAME") or "sentence-transformers/multi-qa-MiniLM-L12-v2"
+    device = os.getenv("EMBEDDINGS_DEVICE") or "cpu"
+    if backend == "FAKE":
+        return FakeEmbeddingModel(embed_dim=8)
+    key = (backend, model_name, device)
+    with _EMBEDDERS_LOCK:
+        cached = _EMBEDDERS.get(key)
+        if cached is not None:
+            return cached
+        # Attempt to import sentence-transformers; fallback to FAKE if unavailable
+        try:
+            embedder: object = SentenceTransformerEmbeddingModel(model_name=model_name, device=device)
+        except Exception:
+            # Safety on dev machines without the heavy dependency; cached so the import is not retried
+            embedder = FakeEmbeddingModel(embed_dim=8)
+            _EMBEDDERS[key] = embedder
+            return embedder
+        from app.core.config import (
+            get_embeddings_micro_batch_enabled,
+            get_embeddings_batch_max_wait_ms,
+            get_embeddings_batch_max_size,
+        )
+        if get_embeddings_micro_batch_enabled():
+            from app.services.embedding_batcher import MicroBatchingEmbedder
+
+            embedder = MicroBatchingEmbedder(
+                embedder,
+                max_wait_ms=get_embeddings_batch_max_wait_ms(),
+                max_batch=get_embeddings_batch_max_size(),
+            )
+        _EMBEDDERS[key] = embedder
+        return embedder
+
+
 class RagService:
     def __init__(self, chroma_path: Path | str | None = None, embedder: Optional[object] = None) -> None:
         base = Path(os.getenv("CHROMA_PATH") or chroma_path or Path("data") / "chroma")
         base.mkdir(parents=True, exist_ok=True)
-        # Best-effort Chroma initialization; fallback to an in-memory stub when unavailable
-        try:
-            self._client = chromadb.PersistentClient(path=str(base), settings=Settings(allow_reset=False))
-            self._collection: Collection = self._client.get_or_create_collection(name="documents")
-        except Exception:
-            self._client = None  # type: ignore[assignment]
-            self._collection = _FakeChromaCollection()
+        self._base = base
+        from app.core.config import get_vector_backend, get_vector_partitions_enabled
+
+        self._client = None
+        self._collection: Collection | NumpyVectorCollection | PartitionedCollection
+        partitioned = get_vector_partitions_enabled()
+        if get_vector_backend() == "CHROMA" and chromadb is not None:
+            # Best-effort Chroma initialization; fall back to the built-in index when unavailable
+            try:
+                self._client = chromadb.PersistentClient(path=str(base), settings=Settings(allow_reset=False))
+                if partitioned:
+                    self._collection = _chroma_partitions(self._client)
+                else:
+                    self._collection = self._client.get_or_create_collection(name="documents")
+            except Exception:
+                self._client = None
+        if self._client is None:
+            self._collection = _numpy_partitions(base / "partitions") if partitioned else get_numpy_collection(base / "numpy")
         if embedder is not None:
             self._embedder = embedder
         else:
-            backend = (os.getenv("EMBEDDINGS_BACKEND") or "SENTENCE_TRANSFORMERS").upper()
-            if backend == "FAKE":
-                self._embedder = FakeEmbeddingModel(embed_dim=8)
-            else:
-                # Attempt to import sentence-transformers; fallback to FAKE if unavailable
-                try:
-                    model_name = os.getenv("EMBEDDINGS_MODEL_NAME") or "sentence-transformers/multi-qa-MiniLM-L12-v2"
-                    device = os.getenv("EMBEDDINGS_DEVICE") or "cpu"
-                    self._embedder = SentenceTransformerEmbeddingModel(model_name=model_name, device=device)
-                except Exception:
-                    # Safety on dev machines without the heavy dependency
-                    self._embedder = FakeEmbeddingModel(embed_dim=8)
-
-    def parse_pdf(self, pdf_bytes: bytes) -> str:
+            self._embedder = get_shared_embedder()
+        self._memory: Collection | NumpyVectorCollection | None = None
+
+    def parse_pdf(self, pdf_bytes: bytes, ocr_fallback: Optional[bool] = None) -> str:
         reader = PdfReader(BytesIO(pdf_bytes))
         texts: list[str] = []
         for page in reader.pages:
             texts.append(page.extract_text() or "")
+        if ocr_fallback is None:
+            from app.core.config import get_pdf_ocr_enabled
+            ocr_fallback = get_pdf_ocr_enabled()
+        # Scanned pages carry no text layer; OCR them and merge back in page order
+        missing = [i for i, t in enumerate(texts) if not t.strip()]
+        if missing and ocr_fallback:
+            for i, txt in self._ocr_pages(pdf_bytes, reader, missing).items():
+                texts[i] = txt
         return "\n".join(texts).strip()
 
+    def _ocr_pages(self, pdf_bytes: bytes, reader: PdfReader, page_indexes: list[int]) -> dict[int, str]:
+        """OCR the given pages on a worker pool, rendering a sliding window of pages.
+
+        Rendering stays on the calling thread (PDF renderers are not thread-safe);
+        at most ``PDF_OCR_WINDOW`` rendered pages are alive at any time.
+        """
+        from app.core.config import get_pdf_ocr_workers, get_pdf_ocr_window, get_pdf_ocr_dpi
+        from app.services.ocr import OcrService
+
+        ocr = OcrService()
+        window = get_pdf_ocr_window()
+        out: dict[int, str] = {}
+        in_flight: dict[Future, int] = {}
+        with ThreadPoolExecutor(max_workers=get_pdf_ocr_workers(), thread_name_prefix="pdf-ocr") as ex:
+            pages = _render_pdf_pages(pdf_bytes, reader, page_indexes, dpi=get_pdf_ocr_dpi())
+            while True:
+                # Free a slot before rendering the next page
+                while len(in_flight) >= window:
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        out[in_flight.pop(fut)] = _ocr_result(fut)
+                nxt = next(pages, None)
+                if nxt is None:
+                    break
+                idx, images = nxt
+                in_flight[ex.submit(_ocr_page_images, ocr, images)] = idx
+            for fut in list(in_flight):
+                out[in_flight.pop(fut)] = _ocr_result(fut)
+        return out
+
     def chunk_text(self, text: str, chunk_size: int, overlap: int) -> list[str]:
         tokens = text.split()
         if chunk_size <= 0:
@@ -95,18 +190,42 @@ class RagService:
                 break
         return chunks
 
-    def persist_chunks(self, file_id: str, session_id: Optional[str], chunks: list[str], source_type: str | None = None) -> None:
-        if not chunks:
-            return
-        ids = [f"{file_id}:{i}" for i in range(len(chunks))]
+    @staticmethod
+    def chunk_metadatas(
+        file_id: str,
+        session_id: Optional[str],
+        count: int,
+        source_type: str | None = None,
+        extra: Optional[dict] = None,
+        file_name: str | None = None,
+    ) -> list[dict]:
         metadatas = []
-        for i in range(len(chunks)):
+        for i in range(count):
             meta = {"file_id": file_id, "session_id": (session_id if session_id is not None else "GLOBAL"), "chunk_index": i}
+            # Display name travels with the chunk so citations need no DB lookup
+            if file_name:
+                meta["file_name"] = file_name
             if source_type:
                 meta["source_type"] = source_type
+            if extra:
+                meta.update(extra)
             metadatas.append(meta)
+        return metadatas
+
+    def persist_chunks(
+        self,
+        file_id: str,
+        session_id: Optional[str],
+        chunks: list[str],
+        source_type: str | None = None,
+        file_name: str | None = None,
+    ) -> None:
+        if not chunks:
+            return
+        ids = [f"{file_id}:{i}" for i in range(len(chunks))]
+        metadatas = self.chunk_metadatas(file_id, session_id, len(chunks), source_type=source_type, file_name=file_name)
         embeddings = self._embedder.embed(chunks)
-        self._collection.add(ids=ids, documents=chunks, metadatas=metadatas, embeddings=embeddings)
+        self.add_records(ids=ids, documents=chunks, metadatas=metadatas, embeddings=embeddings)
 
     def persist_documents(self, documents: list[str], metadatas: list[dict]) -> None:
         # Generic persistence that allows custom per-document metadata (e.g., timings)
@@ -124,13 +243,153 @@ class RagService:
                 ids.append(f"{file_id}:{chunk_index}")
             else:
                 ids.append(f"doc:{i}")
-        self._collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        self.add_records(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def add_records(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings: object = None) -> None:
+        """Add pre-embedded records, converting vectors only at the store boundary."""
+        # Every chunk carries is_deleted so soft deletes can be filtered inside the store
+        metadatas = [m if "is_deleted" in m else {**m, "is_deleted": False} for m in metadatas]
+        if embeddings is None:
+            self._collection.add(ids=ids, documents=documents, metadatas=metadatas)
+            return
+        _chroma_call(
+            self._collection.add,
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=_to_store_embeddings(self._collection, embeddings),
+        )
+
+    def reassign_file(self, file_id: str, session_id: Optional[str]) -> None:
+        """Point a file's chunks at another session, keeping their stored embeddings."""
+        if isinstance(self._collection, PartitionedCollection):
+            self._collection.move(session_id, where={"file_id": file_id})
+        else:
+            self._update_file_metadata(file_id, session_id=(session_id if session_id is not None else GLOBAL_PARTITION))
+        bump_vector_epoch()
+
+    def rename_file(self, file_id: str, name: str) -> int:
+        """Rewrite the ``file_name`` stored on a file's chunks."""
+        count = self._update_file_metadata(file_id, file_name=name)
+        bump_vector_epoch()
+        return count
+
+    def delete_file(self, file_id: str) -> None:
+        """Remove every chunk of a file."""
+        self._collection.delete(where={"file_id": file_id})
+        bump_vector_epoch()
+
+    def _update_file_metadata(self, file_id: str, **fields: object) -> int:
+        """Merge ``fields`` into the metadata of every chunk of a file, keeping embeddings."""
+        got = self._collection.get(where={"file_id": file_id}, include=["metadatas"])
+        ids = got.get("ids", [])
+        metadatas = got.get("metadatas", [])
+        if ids and isinstance(ids[0], list):
+            ids, metadatas = ids[0], metadatas[0]
+        if ids:
+            self._collection.update(ids=ids, metadatas=[dict(m or {}, **fields) for m in metadatas])
+        return len(ids)
+
+    def drop_session(self, session_id: str) -> None:
+        """Remove every vector scoped to a session (a whole partition when partitioned).
+
+        That covers the chunks of files uploaded into the session as well as
+        its memory artifacts.
+        """
+        if isinstance(self._collection, PartitionedCollection):
+            self._collection.drop(session_id)
+        else:
+            self._collection.delete(where={"session_id": session_id})
+        self.memory_collection().delete(where={"session_id": session_id})
+        bump_vector_epoch()
+
+    def memory_collection(self) -> Collection | NumpyVectorCollection:
+        """Conversation memory artifacts (ADR-007), kept apart from document chunks.
+
+        A separate collection keeps document queries and their soft-delete
+        pre-filter untouched; records carry ``session_id`` and ``memory_type``.
+        """
+        if self._memory is None:
+            if self._client is not None:
+                self._memory = self._client.get_or_create_collection(name="memory")  # type: ignore[attr-defined]
+            else:
+                self._memory = get_numpy_collection(self._base / "memory")
+        return self._memory
+
+    def upsert_memory(self, ids: list[str], documents: list[str], metadatas: list[dict]) -> None:
+        """Embed and store memory artifacts; re-using an id replaces the previous version."""
+        if not ids:
+            return
+        coll = self.memory_collection()
+        _chroma_call(
+            coll.upsert,
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=_to_store_embeddings(coll, self._embedder.embed(documents)),
+        )
+
+    def add_memory_records(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings: object) -> None:
+        """Store pre-embedded memory artifacts (snapshot restore)."""
+        coll = self.memory_collection()
+        _chroma_call(
+            coll.upsert,
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=_to_store_embeddings(coll, embeddings),
+        )
+
+    def query_memory(self, text: str, top_k: int = 5, where: Optional[dict] = None) -> list[dict]:
+        return self._query_collection(self.memory_collection(), text, top_k, where)
+
+    def set_file_deleted(self, file_id: str, deleted: bool) -> int:
+        """Flip ``is_deleted`` on a file's chunks with a metadata-only update."""
+        count = self._update_file_metadata(file_id, is_deleted=deleted)
+        bump_vector_epoch()
+        return count
 
-    def query(self, text: str, top_k: int = 5, where: Optional[dict] = None) -> list[dict]:
-        query_vec = self._embedder.embed([text])
+    def ensure_deleted_flags(self, deleted_file_ids: Callable[[], Iterable[str]]) -> int:
+        """One-time backfill of ``is_deleted`` on chunks stored before the flag existed.
+
+        Chroma filters never match records that lack the key, so old chunks
+        would otherwise vanish from filtered queries. The app runs it once at
+        startup; a marker file next to the store records that it ran.
+        """
+        marker = self._base / ".is_deleted_backfilled"
+        key = str(marker.resolve())
+        if key in _BACKFILLED or marker.exists():
+            _BACKFILLED.add(key)
+            return 0
+        deleted = set(deleted_file_ids())
+        coll = self._collection
+        parts = coll.partitions() if isinstance(coll, PartitionedCollection) else {"documents": coll}
+        updated = 0
+        for part in parts.values():
+            for offset in range(0, part.count(), 5000):
+                got = part.get(limit=5000, offset=offset, include=["metadatas"])
+                pending = [(i, m) for i, m in zip(got.get("ids", []), got.get("metadatas", [])) if "is_deleted" not in (m or {})]
+                if pending:
+                    part.update(
+                        ids=[i for i, _ in pending],
+                        metadatas=[dict(m or {}, is_deleted=(m or {}).get("file_id") in deleted) for _, m in pending],
+                    )
+                    updated += len(pending)
+        marker.write_text("1", encoding="utf-8")
+        _BACKFILLED.add(key)
+        return updated
+
+    def query(self, text: str, top_k: int = 5, where: Optional[dict] = None, include_deleted: bool = False) -> list[dict]:
+        if not include_deleted:
+            where = _exclude_deleted(where)
+        return self._query_collection(self._collection, text, top_k, where)
+
+    def _query_collection(self, collection: object, text: str, top_k: int, where: Optional[dict]) -> list[dict]:
+        query_vec = _to_store_embeddings(collection, self._embedder.embed([text]))
         # Ask Chroma to include distances for scoring if available
         try:
-            result = self._collection.query(
+            result = _chroma_call(
+                collection.query,  # type: ignore[attr-defined]
                 query_embeddings=query_vec,
                 n_results=top_k,
                 where=where,
@@ -138,7 +397,7 @@ class RagService:
             )
         except TypeError:
             # Older versions may not support include; fallback
-            result = self._collection.query(query_embeddings=query_vec, n_results=top_k, where=where)
+            result = _chroma_call(collection.query, query_embeddings=query_vec, n_results=top_k, where=where)  # type: ignore[attr-defined]
         out: list[dict] = []
         ids0 = result.get("ids", [[]])[0]
         docs0 = result.get("documents", [[]])[0]
@@ -163,74 +422,172 @@ class RagService:
         return out
 
 
-# Minimal in-memory fake collection used when Chroma cannot initialize
-class _FakeChromaCollection:
-    def __init__(self) -> None:
-        self._store: dict[str, dict] = {}
-
-    def add(self, ids: list[str], documents: list[str], metadatas: list[dict], embeddings: list[list[float]] | None = None) -> None:
-        for i, _id in enumerate(ids):
-            self._store[_id] = {"id": _id, "document": documents[i], "metadata": metadatas[i], "embedding": (embeddings[i] if embeddings else None)}
-
-    def get(self, where: Optional[dict] = None, include: Optional[list[str]] = None) -> dict:
-        ids = []
-        docs = []
-        metas = []
-        for _id, rec in self._store.items():
-            if where:
-                ok = True
-                for k, v in where.items():
-                    if rec["metadata"].get(k) != v:
-                        ok = False
-                        break
-                if not ok:
-                    continue
-            ids.append(_id)
-            docs.append(rec["document"])
-            metas.append(rec["metadata"])
-        out: dict[str, list] = {"ids": [ids]}
-        if include and "documents" in include:
-            out["documents"] = [docs]
-        if include and "metadatas" in include:
-            out["metadatas"] = [metas]
-        return out
+def _render_pdf_pages(pdf_bytes: bytes, reader: PdfReader, page_indexes: list[int], dpi: int = 300) -> Iterator[tuple[int, list[bytes]]]:
+    """Yield (page_index, [encoded image bytes]) lazily, one page at a time.
+
+    Uses pypdfium2 for true rendering when installed; otherwise falls back to the
+    images embedded in the page, which is what scanners produce.
+    """
+    try:
+        import pypdfium2 as pdfium  # type: ignore
+    except Exception:
+        pdfium = None  # type: ignore
+    if pdfium is not None:
+        doc = pdfium.PdfDocument(pdf_bytes)
+        try:
+            for idx in page_indexes:
+                page = doc[idx]
+                try:
+                    pil = page.render(scale=dpi / 72.0).to_pil()
+                    buf = BytesIO()
+                    pil.save(buf, format="PNG", dpi=(dpi, dpi))
+                    yield idx, [buf.getvalue()]
+                finally:
+                    page.close()
+        finally:
+            doc.close()
+        return
+    for idx in page_indexes:
+        try:
+            images = [img.data for img in reader.pages[idx].images]
+        except Exception:
+            images = []
+        yield idx, images
+
+
+def _ocr_page_images(ocr: object, images: list[bytes]) -> str:
+    texts = []
+    for data in images:
+        try:
+            texts.append(ocr.extract_text(data))  # type: ignore[attr-defined]
+        except Exception:
+            # One unreadable image should not lose the rest of the page
+            continue
+    return "\n".join(t for t in texts if t)
+
+
+def _ocr_result(fut: Future) -> str:
+    try:
+        return fut.result()
+    except Exception:
+        return ""
+
+
+# Bumped on delete/restore/rename/move so retrieval caches can key on it. The local
+# counter covers this worker; VECTOR_VERSION_FILE carries the change to the others.
+_VECTOR_EPOCH = 0
+_BACKFILLED: set[str] = set()
+
+
+def vector_epoch() -> tuple:
+    return (_VECTOR_EPOCH, file_version(get_vector_version_file()))
+
+
+def bump_vector_epoch() -> None:
+    global _VECTOR_EPOCH
+    _VECTOR_EPOCH += 1
+    bump_version_file(get_vector_version_file())
+
+
+def _exclude_deleted(where: Optional[dict]) -> dict:
+    """AND a soft-delete pre-filter into a Chroma-style where clause."""
+    live = {"is_deleted": {"$ne": True}}
+    if not where:
+        return live
+    if set(where) == {"$and"}:
+        return {"$and": [*where["$and"], live]}
+    # Chroma wants multiple top-level conditions spelled as $and
+    return {"$and": [{k: v} for k, v in where.items()] + [live]}
+
+
+def _numpy_partitions(root: Path) -> PartitionedCollection:
+    root.mkdir(parents=True, exist_ok=True)
+
+    def _open(key: str, create: bool) -> Optional[NumpyVectorCollection]:
+        path = root / key
+        if not create and not (path / "records.jsonl").exists():
+            return None
+        return get_numpy_collection(path)
+
+    def _list() -> list[str]:
+        return sorted(p.name for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    return PartitionedCollection(_open, _list, lambda key: drop_numpy_collection(root / key))
+
+
+_CHROMA_PARTITION_PREFIX = "part-"
+
+
+def _chroma_partitions(client: object) -> PartitionedCollection:
+    def _open(key: str, create: bool) -> Optional[object]:
+        name = _CHROMA_PARTITION_PREFIX + key
+        if create:
+            return client.get_or_create_collection(name=name)  # type: ignore[attr-defined]
+        try:
+            return client.get_collection(name=name)  # type: ignore[attr-defined]
+        except Exception:
+            return None
+
+    def _list() -> list[str]:
+        # Chroma < 0.6 returns Collection objects, newer versions return names
+        names = [getattr(c, "name", c) for c in client.list_collections()]  # type: ignore[attr-defined]
+        return sorted(n[len(_CHROMA_PARTITION_PREFIX):] for n in names if n.startswith(_CHROMA_PARTITION_PREFIX))
+
+    def _drop(key: str) -> None:
+        try:
+            client.delete_collection(name=_CHROMA_PARTITION_PREFIX + key)  # type: ignore[attr-defined]
+        except Exception:
+            pass
+
+    return PartitionedCollection(_open, _list, _drop)
+
+
+def _probe_chroma_arrays() -> bool:
+    """Whether the installed Chroma takes ndarray embeddings (0.6 normalizes them itself)."""
+    if chromadb is None:
+        return False
+    try:
+        version = tuple(int(part) for part in str(chromadb.__version__).split(".")[:2])
+    except (AttributeError, ValueError):
+        return False
+    return version >= (0, 6)
+
+
+# Probed once at import; a confirmed rejection at runtime also turns it off
+_CHROMA_ACCEPTS_ARRAYS = _probe_chroma_arrays()
+
+
+def _to_store_embeddings(collection: object, embeddings: object) -> object:
+    """Hand vectors to the store: arrays for in-process stores, lists only for old Chroma."""
+    arr = as_float32_matrix(embeddings)
+    if isinstance(collection, NumpyVectorCollection) or _CHROMA_ACCEPTS_ARRAYS:
+        return arr
+    return arr.tolist()
+
+
+def _rejects_arrays(exc: ValueError) -> bool:
+    # Chroma's validators: "Expected [each embedding in the] embeddings to be a list, got ..."
+    return "to be a list" in str(exc)
 
-    def delete(self, ids: Optional[list[str]] = None, where: Optional[dict] = None) -> None:
-        if ids:
-            for _id in ids:
-                self._store.pop(_id, None)
-            return
-        if where:
-            for _id, rec in list(self._store.items()):
-                ok = True
-                for k, v in where.items():
-                    if rec["metadata"].get(k) != v:
-                        ok = False
-                        break
-                if ok:
-                    self._store.pop(_id, None)
-
-    def query(self, query_embeddings: list[list[float]], n_results: int = 5, where: Optional[dict] = None, include: Optional[list[str]] = None) -> dict:
-        # Trivial similarity by intersection length of tokens (only for development fallback)
-        ids = []
-        docs = []
-        metas = []
-        for _id, rec in self._store.items():
-            if where:
-                ok = True
-                for k, v in where.items():
-                    if rec["metadata"].get(k) != v:
-                        ok = False
-                        break
-                if not ok:
-                    continue
-            ids.append(_id)
-            docs.append(rec["document"])
-            metas.append(rec["metadata"])
-        # Return first n_results deterministically
-        ids = ids[:n_results]
-        docs = docs[:n_results]
-        metas = metas[:n_results]
-        out: dict[str, list] = {"ids": [ids], "documents": [docs], "metadatas": [metas], "distances": [[0.0 for _ in ids]]}
-        return out
 
+def _chroma_call(fn, **kwargs):  # type: ignore[no-untyped-def]
+    """Invoke a Chroma method, retrying with plain lists only if ndarrays are rejected."""
+    global _CHROMA_ACCEPTS_ARRAYS
+    try:
+        return fn(**kwargs)
+    except ValueError as exc:
+        key = "embeddings" if "embeddings" in kwargs else "query_embeddings"
+        vecs = kwargs.get(key)
+        if not isinstance(vecs, np.ndarray) or not _rejects_arrays(exc):
+            raise
+        _CHROMA_ACCEPTS_ARRAYS = False
+        kwargs[key] = vecs.tolist()
+        return fn(**kwargs)
+    except (TypeError, ValueError):
+        key = "embeddings" if "embeddings" in kwargs else "query_embeddings"
+        vecs = kwargs.get(key)
+        if not isinstance(vecs, np.ndarray):
+            raise
+        _CHROMA_ACCEPTS_ARRAYS = False
+        kwargs[key] = vecs.tolist()
+        return fn(**kwargs)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app.core.config import get_settings_version_file
+from app.models.settings import GlobalSettingsModel, SearchSettingsModel, SessionSettingsModel
+from app.services.version_file import bump_version_file, file_version
+
+
+GENERATION_KEYS = ("temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty")
+
+
+class SettingsCache:
+    """Read-through cache of settings rows as plain dicts, one per database engine.
+
+    Entries are ``(kind, key)`` -> dict snapshots (global, search, personality
+    and theme singletons plus per-session overrides), so a chat turn reads its
+    configuration without SQL. Every write calls ``invalidate``, which drops
+    all entries and replaces the version file; other workers notice the new
+    file (one ``stat`` per read) and drop theirs too.
+    """
+
+    def __init__(self, version_file: Optional[Path] = None) -> None:
+        self._version_file = version_file
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._seen = self._file_version()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, key: Any, load: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        entry_key = (kind, str(key))
+        with self._lock:
+            self._check_version()
+            value = self._entries.get(entry_key)
+            generation = self._generation
+            if value is not None:
+                self.hits += 1
+                return dict(value)
+            self.misses += 1
+        value = dict(load())
+        with self._lock:
+            # A write that raced with the load may have made it stale; don't keep it then
+            if generation == self._generation:
+                self._entries[entry_key] = value
+        return dict(value)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bump_version()
+            self._seen = self._file_version()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _check_version(self) -> None:
+        current = self._file_version()
+        if current != self._seen:
+            self._generation += 1
+            self._entries.clear()
+            self._seen = current
+
+    def _file_version(self) -> Optional[Tuple[int, int, int]]:
+        return file_version(self._version_file)
+
+    def _bump_version(self) -> None:
+        bump_version_file(self._version_file)
+
+
+_SETTINGS_CACHES: "weakref.WeakKeyDictionary[Any, SettingsCache]" = weakref.WeakKeyDictionary()
+_SETTINGS_CACHES_LOCK = threading.Lock()
+
+
+def get_settings_cache(db: Session) -> SettingsCache:
+    """The cache for the engine behind ``db``; rebuilt when SETTINGS_VERSION_FILE changes."""
+    bind = db.get_bind()
+    version_file = get_settings_version_file()
+    with _SETTINGS_CACHES_LOCK:
+        cache = _SETTINGS_CACHES.get(bind)
+        if cache is None or cache._version_file != version_file:
+            cache = _SETTINGS_CACHES[bind] = SettingsCache(version_file)
+        return cache
+
+
+def get_or_create_global(db: Session) -> GlobalSettingsModel:
+    row = db.get(GlobalSettingsModel, 1)
+    if not row:
+        row = GlobalSettingsModel(id=1)
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            row = db.get(GlobalSettingsModel, 1)  # fetch if created concurrently
+        if row is None:
+            row = GlobalSettingsModel(id=1)
+            db.add(row)
+            db.commit()
+        db.refresh(row)
+    return row
+
+
+def get_or_create_search(db: Session) -> SearchSettingsModel:
+    row = db.get(SearchSettingsModel, 1)
+    if not row:
+        row = SearchSettingsModel(id=1)
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            row = db.get(SearchSettingsModel, 1)
+        if row is None:
+            row = SearchSettingsModel(id=1)
+            db.add(row)
+            db.commit()
+        db.refresh(row)
+    return row
+
+
+def get_global_values(db: Session) -> Dict[str, Any]:
+    def load() -> Dict[str, Any]:
+        row = get_or_create_global(db)
+        return {key: getattr(row, key) for key in GENERATION_KEYS}
+
+    return get_settings_cache(db).get("global", 1, load)
+
+
+def get_search_values(db: Session) -> Dict[str, Any]:
+    def load() -> Dict[str, Any]:
+        row = get_or_create_search(db)
+        return {
+            "allow_internet_search": bool(row.allow_internet_search),
+            "debug_logging": bool(row.debug_logging),
+            "bing_api_key": row.bing_api_key,
+        }
+
+    return get_settings_cache(db).get("search", 1, load)
+
+
+def get_session_overrides(db: Session, session_id: str) -> Dict[str, Any]:
+    def load() -> Dict[str, Any]:
+        ov = db.get(SessionSettingsModel, session_id)
+        return dict(ov.overrides_json) if ov and ov.overrides_json else {}
+
+    return get_settings_cache(db).get("session_settings", session_id, load)
+
+
+def resolve_session_settings(db: Session, session_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return ``(effective, overrides)`` generation settings for a session; overrides win over global."""
+    global_values = get_global_values(db)
+    overrides = get_session_overrides(db, session_id)
+    effective = {key: overrides.get(key, global_values[key]) for key in GENERATION_KEYS}
+    return effective, overrides
+
+
+def get_effective_settings(db: Session, session_id: str) -> Dict[str, Any]:
+    return resolve_session_settings(db, session_id)[0]
+
+
+def invalidate_settings(db: Session) -> None:
+    """Call after committing any settings, personality or theme change."""
+    get_settings_cache(db).invalidate()
+
+
+def invalidate_all_settings() -> None:
+    """Drop every engine's cached settings, e.g. after the database file was replaced."""
+    with _SETTINGS_CACHES_LOCK:
+        caches = list(_SETTINGS_CACHES.values())
+    for cache in caches:
+        cache.invalidate()
+    if not caches:
+        bump_version_file(get_settings_version_file())
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+
+@dataclass
+class StageResult:
+    name: str
+    value: Any = None
+    error: Optional[str] = None
+    timed_out: bool = False
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out
+
+    def to_dict(self) -> dict:
+        status = "ok" if self.ok else ("timeout" if self.timed_out else "error")
+        out: Dict[str, Any] = {"status": status, "ms": round(self.elapsed_ms, 1)}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class StageScheduler:
+    """Run independent per-turn stages concurrently under one shared deadline.
+
+    Stages are started together in an ``asyncio.TaskGroup`` owned by a runner
+    task, so ``cancel`` tears all of them down at once. A stage failing or
+    missing the deadline never affects the others; its ``StageResult`` just
+    records why. Results are handed out in completion order so callers can
+    stream each stage's output as soon as it exists and continue once the
+    stages they depend on are done.
+    """
+
+    def __init__(self, deadline_seconds: float) -> None:
+        self._deadline_seconds = deadline_seconds
+        self._stages: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._queue: "asyncio.Queue[StageResult]" = asyncio.Queue()
+        self._results: Dict[str, StageResult] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def add(self, name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        self._stages[name] = fn
+
+    def start(self) -> "StageScheduler":
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run_all())
+        return self
+
+    async def _run_all(self) -> None:
+        deadline = asyncio.get_running_loop().time() + self._deadline_seconds
+        async with asyncio.TaskGroup() as tg:
+            for name, fn in self._stages.items():
+                tg.create_task(self._run_one(name, fn, deadline))
+
+    async def _run_one(self, name: str, fn: Callable[[], Awaitable[Any]], deadline: float) -> None:
+        t0 = time.perf_counter()
+        result = StageResult(name=name)
+        try:
+            async with asyncio.timeout_at(deadline):
+                result.value = await fn()
+        except TimeoutError:
+            result.timed_out = True
+        except Exception as exc:  # a broken side stage must not sink the turn
+            result.error = str(exc) or exc.__class__.__name__
+        result.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        self._queue.put_nowait(result)
+
+    @property
+    def results(self) -> Dict[str, StageResult]:
+        return dict(self._results)
+
+    def pending(self) -> Set[str]:
+        return set(self._stages) - set(self._results)
+
+    async def until(self, names: Optional[Iterable[str]] = None) -> AsyncIterator[StageResult]:
+        """Yield results as stages finish until every stage in ``names`` (default: all) is done."""
+        wanted = set(self._stages if names is None else names) & set(self._stages)
+        while not wanted <= set(self._results):
+            result = await self._queue.get()
+            self._results[result.name] = result
+            yield result
+
+    def ready(self) -> List[StageResult]:
+        """Results that finished since the last call, without waiting."""
+        out = []
+        while not self._queue.empty():
+            result = self._queue.get_nowait()
+            self._results[result.name] = result
+            out.append(result)
+        return out
+
+    def cancel(self) -> None:
+        if self._runner is not None and not self._runner.done():
+            self._runner.cancel()
@@ -1,7 +1,69 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Optional
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import (
+    get_summarizer_breaker_cooldown_seconds,
+    get_summarizer_breaker_failures,
+    get_summarizer_connect_timeout_seconds,
+    get_summarizer_deadline_seconds,
+    get_summarizer_max_concurrency,
+    get_summarizer_read_timeout_seconds,
+)
+from app.services.llm_backend import LlmBackend, LlmError, OllamaBackend, OpenAICompatBackend
+from app.services.metrics import get_metrics
+
+
+class CircuitBreaker:
+    """Stops calling a slow or failing dependency for ``cooldown`` seconds.
+
+    Opens after ``threshold`` consecutive failures; once the cooldown passes a
+    single trial call is let through (half-open) and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._clock() - self._opened_at >= self._cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial or self._failures >= self._threshold:
+            self._opened_at = self._clock()
+        self._trial = False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial whose call ended without an outcome (cancelled)."""
+        self._trial = False
 
 
 class SummarizationService:
@@ -9,56 +71,101 @@ class SummarizationService:
 
     Providers (opt-in via env):
     - OLLAMA: set LLM_SUMMARIZER_PROVIDER=OLLAMA and LLM_SUMMARIZER_MODEL (e.g., 'mistral')
-      Calls http://127.0.0.1:11434/api/generate
+      Streams from OLLAMA_URL (default http://127.0.0.1:11434) /api/chat
     - LMSTUDIO: set LLM_SUMMARIZER_PROVIDER=LMSTUDIO and LLM_SUMMARIZER_URL, LLM_SUMMARIZER_MODEL
-      Calls OpenAI-compatible endpoint at URL
+      Streams from the OpenAI-compatible endpoint at URL
+
+    Requests go through the pooled chat HTTP client with SUMMARIZER_* timeouts
+    and at most SUMMARIZER_MAX_CONCURRENCY at a time. Output is streamed, so
+    when SUMMARIZER_DEADLINE_SECONDS passes the text received so far is used;
+    the deadline starts once a concurrency slot is free, so time spent queued
+    behind other summaries never counts against the model. Repeated failures
+    open a circuit breaker and the heuristic is used until the cooldown ends.
 
     Default: fast heuristic fallback (first N sentences/lines).
     """
 
-    def __init__(self, provider: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        backend: Optional[LlmBackend] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        deadline_seconds: Optional[float] = None,
+    ) -> None:
         self._provider = (provider or os.getenv("LLM_SUMMARIZER_PROVIDER") or "").upper()
         self._model = os.getenv("LLM_SUMMARIZER_MODEL") or ""
         self._url = os.getenv("LLM_SUMMARIZER_URL") or ""
+        self._backend = backend if backend is not None else self._make_backend()
+        self._breaker = breaker or _breaker_for(self._provider)
+        self._deadline = deadline_seconds
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    @property
+    def model_id(self) -> str:
+        """Which model produces the summaries; part of the summary cache key."""
+        if self._backend is None:
+            return "heuristic"
+        return f"{self._provider.lower() or 'custom'}:{self._backend.model}"
+
+    def _make_backend(self) -> Optional[LlmBackend]:
+        timeout = httpx.Timeout(get_summarizer_read_timeout_seconds(), connect=get_summarizer_connect_timeout_seconds())
+        if self._provider == "OLLAMA":
+            base = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
+            return OllamaBackend(base, self._model or "mistral", timeout=timeout)
+        if self._provider == "LMSTUDIO":
+            url = self._url or "http://127.0.0.1:1234/v1/chat/completions"
+            if url.rstrip("/").endswith("/chat/completions"):
+                url = url.rstrip("/")[: -len("/chat/completions")]
+            return OpenAICompatBackend(url, self._model or "gpt-3.5-turbo", timeout=timeout)
+        return None
+
+    async def summarize(self, text: str, max_tokens: int = 400, context: str = "") -> str:
+        """Summarize ``text``; ``context`` (an earlier summary) is shown to the model but not re-summarized."""
+        summary, _complete = await self.summarize_with_status(text, max_tokens=max_tokens, context=context)
+        return summary
+
+    async def summarize_with_status(self, text: str, max_tokens: int = 400, context: str = "") -> Tuple[str, bool]:
+        """Like ``summarize`` but also tells whether the model finished the summary.
 
-    async def summarize(self, text: str, max_tokens: int = 400) -> str:
+        ``False`` means the heuristic fallback or a cut-off stream was used,
+        which callers should not cache.
+        """
         text = (text or "").strip()
         if not text:
-            return ""
+            return "", False
+        if self._backend is None:
+            return self._fallback(text, max_tokens=max_tokens), False
+        metrics = get_metrics()
+        if not self._breaker.allow():
+            metrics.incr("summarizer_breaker_skipped")
+            return self._fallback(text, max_tokens=max_tokens), False
+        recorded = False
         try:
-            if self._provider == "OLLAMA":
-                return await self._summarize_ollama(text, max_tokens)
-            if self._provider == "LMSTUDIO":
-                return await self._summarize_lmstudio(text, max_tokens)
-        except Exception:
-            # Fall back silently
-            pass
+            summary, ok = await self._stream(self._with_context(text, context), max_tokens)
+            if ok and summary.strip():
+                self._breaker.record_success()
+                recorded = True
+                return summary.strip(), True
+            self._breaker.record_failure()
+            recorded = True
+        finally:
+            if not recorded:
+                # Cancelled mid-call: don't keep a half-open trial slot forever
+                self._breaker.release_trial()
+        metrics.incr("summarizer_failures")
+        if summary.strip():
+            # Deadline hit mid-stream: keep the complete lines received so far
+            metrics.incr("summarizer_partial")
+            return _complete_lines(summary), False
         # Fallback: naive summarization (first sentences/lines trimmed to ~max_tokens words)
-        return self._fallback(text, max_tokens=max_tokens)
+        return self._fallback(text, max_tokens=max_tokens), False
 
-    async def _summarize_ollama(self, text: str, max_tokens: int) -> str:
-        import httpx
-
-        model = self._model or "mistral"
-        url = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434") + "/api/generate"
-        prompt = (
-            "Summarize the following conversation context into concise bullet points, "
-            "focusing on durable facts and key points, within "
-            f"{max_tokens} tokens.\n\n" + text
-        )
-        payload = {"model": model, "prompt": prompt, "stream": False}
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            out = data.get("response") or ""
-            return out.strip()
-
-    async def _summarize_lmstudio(self, text: str, max_tokens: int) -> str:
-        import httpx
-
-        model = self._model or "gpt-3.5-turbo"
-        url = self._url or "http://127.0.0.1:1234/v1/chat/completions"
+    async def _stream(self, prompt: str, max_tokens: int) -> Tuple[str, bool]:
+        backend = self._backend
+        assert backend is not None
         messages = [
             {"role": "system", "content": "You are a helpful assistant summarizing chat history."},
             {
@@ -66,22 +173,31 @@ class SummarizationService:
                 "content": (
                     "Summarize the following conversation context into concise bullet points, "
                     "focusing on durable facts and key points, within "
-                    f"{max_tokens} tokens.\n\n{text}"
+                    f"{max_tokens} tokens.\n\n{prompt}"
                 ),
             },
         ]
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(
-                url,
-                json={"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": 0.2},
-            )
-            r.raise_for_status()
-            data = r.json()
-            choices = data.get("choices") or []
-            if choices:
-                msg = choices[0].get("message") or {}
-                return (msg.get("content") or "").strip()
-            return ""
+        pieces: List[str] = []
+        deadline = self._deadline if self._deadline is not None else get_summarizer_deadline_seconds()
+        try:
+            async with _semaphore():
+                # Only the model call is timed; waiting for a slot is not a model failure
+                async with asyncio.timeout(deadline):
+                    async for piece in backend.stream(messages, {"temperature": 0.2, "max_tokens": max_tokens}):
+                        pieces.append(piece)
+        except (TimeoutError, LlmError, httpx.HTTPError, ValueError):
+            return backend.join(pieces), False
+        return backend.join(pieces), True
+
+    @staticmethod
+    def _with_context(text: str, context: str) -> str:
+        context = (context or "").strip()
+        if not context:
+            return text
+        return (
+            "Summary of the conversation so far (for reference only, do not repeat it):\n"
+            f"{context}\n\nNew messages to summarize:\n{text}"
+        )
 
     def _fallback(self, text: str, max_tokens: int) -> str:
         words = text.split()
@@ -89,3 +205,55 @@ class SummarizationService:
         return " ".join(words[:limit])
 
 
+def _complete_lines(text: str) -> str:
+    """Drop a trailing half-written line (or sentence) from a cut-off stream."""
+    if "\n" in text:
+        return text[: text.rfind("\n")].strip()
+    cut = text.rfind(". ")
+    return text[: cut + 1].strip() if cut > 0 else text.strip()
+
+
+# One breaker per provider, shared by every service instance
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def _breaker_for(provider: str) -> CircuitBreaker:
+    breaker = _BREAKERS.get(provider)
+    if breaker is None:
+        breaker = _BREAKERS[provider] = CircuitBreaker(
+            get_summarizer_breaker_failures(), get_summarizer_breaker_cooldown_seconds()
+        )
+    return breaker
+
+
+_SEMAPHORE: asyncio.Semaphore | None = None
+_SEMAPHORE_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # Bound to the running loop like the pooled HTTP client
+    global _SEMAPHORE, _SEMAPHORE_LOOP
+    loop = asyncio.get_running_loop()
+    if _SEMAPHORE is None or _SEMAPHORE_LOOP is not loop:
+        _SEMAPHORE = asyncio.Semaphore(get_summarizer_max_concurrency())
+        _SEMAPHORE_LOOP = loop
+    return _SEMAPHORE
+
+
+_SUMMARIZATION_SERVICE_INSTANCE: SummarizationService | None = None
+_SUMMARIZATION_SERVICE_KEY: tuple | None = None
+
+
+def get_summarization_service() -> SummarizationService:
+    """Shared service; rebuilt only when the provider settings change."""
+    global _SUMMARIZATION_SERVICE_INSTANCE, _SUMMARIZATION_SERVICE_KEY
+    key = (
+        (os.getenv("LLM_SUMMARIZER_PROVIDER") or "").upper(),
+        os.getenv("LLM_SUMMARIZER_MODEL") or "",
+        os.getenv("LLM_SUMMARIZER_URL") or "",
+        os.getenv("OLLAMA_URL") or "",
+    )
+    if _SUMMARIZATION_SERVICE_INSTANCE is None or _SUMMARIZATION_SERVICE_KEY != key:
+        _SUMMARIZATION_SERVICE_INSTANCE = SummarizationService()
+        _SUMMARIZATION_SERVICE_KEY = key
+    return _SUMMARIZATION_SERVICE_INSTANCE
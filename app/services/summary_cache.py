@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core import config
+from app.services.metrics import get_metrics
+
+
+# Bump when the summary prompt changes so stale cached summaries are not reused
+PROMPT_VERSION = "1"
+
+_MEMORY_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_MEMORY_CACHE_MAX = 512
+_CACHE_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0}
+
+
+class SummaryCache:
+    """Finished summaries keyed by a fingerprint of exactly what was summarized.
+
+    The fingerprint covers the message ids, a hash of each message's content,
+    the summarizer model and ``max_tokens``, so a range that comes back
+    unchanged (a rebuilt summary, a restore followed by another trim) reuses
+    the earlier LLM output. Entries live in a small in-process LRU in front of
+    one file per key under SUMMARY_CACHE_DIR, like the OCR cache.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None) -> None:
+        self._cache_dir = cache_dir if cache_dir is not None else config.get_summary_cache_dir()
+
+    @staticmethod
+    def fingerprint(kind: str, parts: Iterable[Tuple[int, str]], model: str, max_tokens: int) -> str:
+        """Key for summarizing ``parts`` (``(id, text)`` pairs in order) as ``kind``."""
+        h = hashlib.sha256(f"{kind}|{model}|{max_tokens}|{PROMPT_VERSION}".encode())
+        for ident, text in parts:
+            h.update(f"|{int(ident)}:".encode())
+            h.update(hashlib.sha256((text or "").encode("utf-8")).digest())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        text = self._lookup(key)
+        with _CACHE_LOCK:
+            _STATS["hits" if text is not None else "misses"] += 1
+        get_metrics().incr("summary_cache_hits" if text is not None else "summary_cache_misses")
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        self._remember(f"{self._cache_dir}:{key}", text)
+        with _CACHE_LOCK:
+            _STATS["stores"] += 1
+        if self._cache_dir is None:
+            return
+        try:
+            path = self._cache_dir / key[:2] / f"{key}.txt"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(path)
+        except Exception:
+            # Caching should never break summarization
+            pass
+
+    @staticmethod
+    def stats() -> dict:
+        with _CACHE_LOCK:
+            return {**_STATS, "memory_entries": len(_MEMORY_CACHE)}
+
+    def _lookup(self, key: str) -> Optional[str]:
+        mem_key = f"{self._cache_dir}:{key}"
+        with _CACHE_LOCK:
+            if mem_key in _MEMORY_CACHE:
+                _MEMORY_CACHE.move_to_end(mem_key)
+                return _MEMORY_CACHE[mem_key]
+        if self._cache_dir is None:
+            return None
+        path = self._cache_dir / key[:2] / f"{key}.txt"
+        try:
+            text = path.read_text(encoding="utf-8")
+        except Exception:
+            return None
+        self._remember(mem_key, text)
+        return text
+
+    @staticmethod
+    def _remember(mem_key: str, text: str) -> None:
+        with _CACHE_LOCK:
+            _MEMORY_CACHE[mem_key] = text
+            _MEMORY_CACHE.move_to_end(mem_key)
+            while len(_MEMORY_CACHE) > _MEMORY_CACHE_MAX:
+                _MEMORY_CACHE.popitem(last=False)
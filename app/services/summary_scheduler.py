@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Set
+
+from sqlmodel import Session
+
+from app.core.config import get_summary_debounce_seconds
+from app.services.context_manager import ContextManager
+from app.services.metrics import get_metrics
+
+
+class SummaryScheduler:
+    """Background, per-session summarization off the chat request path.
+
+    ``schedule`` is cheap and safe to call on every turn: at most one job runs
+    per session, a request arriving while one is pending or running only marks
+    the session dirty so the job loops once more, and each run starts after a
+    debounce so a burst of turns costs a single LLM call. Chat turns read the
+    latest completed summary from the session metadata and never wait here.
+    """
+
+    def __init__(self, debounce_seconds: Optional[float] = None) -> None:
+        self._debounce = debounce_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dirty: Set[str] = set()
+
+    def schedule(self, session_id: str, bind: Any, keep_last_n: int = 10) -> bool:
+        """Queue a summarize-and-trim run; returns False when folded into an existing job."""
+        task = self._tasks.get(session_id)
+        loop = asyncio.get_running_loop()
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self._dirty.add(session_id)
+            return False
+        self._dirty.discard(session_id)
+        self._tasks[session_id] = loop.create_task(self._run(session_id, bind, keep_last_n))
+        return True
+
+    def is_pending(self, session_id: str) -> bool:
+        task = self._tasks.get(session_id)
+        return task is not None and not task.done()
+
+    async def _run(self, session_id: str, bind: Any, keep_last_n: int) -> None:
+        debounce = get_summary_debounce_seconds() if self._debounce is None else self._debounce
+        metrics = get_metrics()
+        backlog = False
+        try:
+            while True:
+                if not backlog:
+                    await asyncio.sleep(debounce)
+                self._dirty.discard(session_id)
+                backlog = False
+                t0 = time.perf_counter()
+                try:
+                    with Session(bind) as db:
+                        cm = ContextManager(db)
+                        await cm.summarize_and_trim_async(session_id, keep_last_n=keep_last_n)
+                        # Each run folds one bounded chunk; keep going until caught up
+                        backlog = cm.has_summary_backlog(session_id, keep_last_n=keep_last_n)
+                    metrics.incr("summary_jobs_total")
+                except Exception:
+                    metrics.incr("summary_jobs_failed")
+                metrics.observe("summary_job_ms", (time.perf_counter() - t0) * 1000.0)
+                if session_id not in self._dirty and not backlog:
+                    break
+        finally:
+            if self._tasks.get(session_id) is asyncio.current_task():
+                self._tasks.pop(session_id, None)
+
+    async def drain(self) -> None:
+        """Wait for every scheduled job (tests, shutdown)."""
+        while True:
+            tasks = [t for t in self._tasks.values() if not t.done()]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def cancel_all(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+        self._dirty.clear()
+
+
+_SUMMARY_SCHEDULER_INSTANCE: SummaryScheduler | None = None
+
+
+def get_summary_scheduler() -> SummaryScheduler:
+    global _SUMMARY_SCHEDULER_INSTANCE
+    if _SUMMARY_SCHEDULER_INSTANCE is None:
+        _SUMMARY_SCHEDULER_INSTANCE = SummaryScheduler()
+    return _SUMMARY_SCHEDULER_INSTANCE
@@ -10,6 +10,7 @@ from app.models.settings import (
     SessionThemeSettingsModel,
     ThemePresetModel,
 )
+from app.services.settings_service import get_settings_cache, invalidate_settings
 
 
 BUILT_IN_PRESETS: dict[str, dict[str, str]] = {
@@ -67,6 +68,9 @@ class ThemeService:
         return row
 
     def get_current(self) -> Dict[str, Any]:
+        return get_settings_cache(self.db).get("theme", 1, self._load_current)
+
+    def _load_current(self) -> Dict[str, Any]:
         row = self._get_or_create()
         return {
             "background_color": row.background_color,
@@ -94,6 +98,7 @@ class ThemeService:
                 row.preset_name = value
         self.db.add(row)
         self.db.commit()
+        invalidate_settings(self.db)
         self.db.refresh(row)
         return self.get_current()
 
@@ -127,18 +132,19 @@ class ThemeService:
         row.preset_name = name_norm
         self.db.add(row)
         self.db.commit()
+        invalidate_settings(self.db)
         self.db.refresh(row)
         return self.get_current()
 
     def get_effective_for_session(self, session_id: str) -> Dict[str, Any]:
-        base = self.get_current()
-        ov = self.db.get(SessionThemeSettingsModel, session_id)
-        overrides = dict(ov.overrides_json) if ov and ov.overrides_json else {}
-        return {**base, **overrides}
+        return {**self.get_current(), **self.get_session_overrides(session_id)}
 
     def get_session_overrides(self, session_id: str) -> Dict[str, Any]:
-        ov = self.db.get(SessionThemeSettingsModel, session_id)
-        return dict(ov.overrides_json) if ov and ov.overrides_json else {}
+        def load() -> Dict[str, Any]:
+            ov = self.db.get(SessionThemeSettingsModel, session_id)
+            return dict(ov.overrides_json) if ov and ov.overrides_json else {}
+
+        return get_settings_cache(self.db).get("theme_override", session_id, load)
 
     def update_session_overrides(self, session_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         # Allow applying a preset to session overrides
@@ -168,6 +174,7 @@ class ThemeService:
         row.overrides_json = {**(row.overrides_json or {}), **updates}
         self.db.add(row)
         self.db.commit()
+        invalidate_settings(self.db)
         self.db.refresh(row)
         return dict(row.overrides_json or {})
 
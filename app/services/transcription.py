@@ -3,13 +3,28 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple
 from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import tempfile
+import threading
+import time
 
 try:  # pragma: no cover - allow tests to run without faster_whisper installed
 	from faster_whisper import WhisperModel  # type: ignore
 
+	try:
+		from faster_whisper import decode_audio as _fw_decode_audio  # type: ignore
+		from faster_whisper.vad import VadOptions, get_speech_timestamps  # type: ignore
+	except Exception:
+		_fw_decode_audio = None  # type: ignore
+		VadOptions = None  # type: ignore
+		get_speech_timestamps = None  # type: ignore
+
 	class _FWNamespace:
 		WhisperModel = WhisperModel  # type: ignore
+		decode_audio = _fw_decode_audio
+		VadOptions = VadOptions
+		get_speech_timestamps = get_speech_timestamps
 except Exception:  # pragma: no cover - fallback for test envs
 	class _PlaceholderWhisperModel:  # allows monkeypatching of .transcribe without import
 		def __init__(self, *args, **kwargs) -> None:  # accept any args
@@ -18,37 +33,230 @@ except Exception:  # pragma: no cover - fallback for test envs
 		def transcribe(self, *args, **kwargs):
 			raise RuntimeError("faster-whisper is not installed")
 
-	faster_whisper = SimpleNamespace(WhisperModel=_PlaceholderWhisperModel)  # type: ignore
+	faster_whisper = SimpleNamespace(  # type: ignore
+		WhisperModel=_PlaceholderWhisperModel,
+		decode_audio=None,
+		VadOptions=None,
+		get_speech_timestamps=None,
+	)
 else:
 	faster_whisper = _FWNamespace()  # type: ignore
 
 
+SAMPLE_RATE = 16000
+
+
+# Process-wide pool: one warm model per (size, device, compute_type, threads, workers)
+_MODEL_POOL: Dict[Tuple[Any, ...], Any] = {}
+_MODEL_POOL_LOCK = threading.Lock()
+_EXECUTORS: Dict[int, ThreadPoolExecutor] = {}
+
+
+def get_whisper_model(
+	model_size: str,
+	*,
+	device: str = "cpu",
+	compute_type: str = "int8",
+	cpu_threads: int = 0,
+	num_workers: int = 1,
+) -> Any:
+	"""Return the shared WhisperModel for this configuration, loading it on first use."""
+	key = (model_size, device, compute_type, cpu_threads, num_workers)
+	model = _MODEL_POOL.get(key)
+	if model is not None:
+		return model
+	with _MODEL_POOL_LOCK:
+		model = _MODEL_POOL.get(key)
+		if model is None:
+			model = faster_whisper.WhisperModel(
+				model_size,
+				device=device,
+				compute_type=compute_type,
+				cpu_threads=cpu_threads,
+				num_workers=num_workers,
+			)
+			_MODEL_POOL[key] = model
+	return model
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+	with _MODEL_POOL_LOCK:
+		ex = _EXECUTORS.get(workers)
+		if ex is None:
+			ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper")
+			_EXECUTORS[workers] = ex
+	return ex
+
+
+def sniff_audio_suffix(audio_bytes: bytes) -> str:
+	"""Best-effort container detection from magic bytes; defaults to .wav."""
+	head = audio_bytes[:12]
+	if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+		return ".wav"
+	if head[:4] == b"fLaC":
+		return ".flac"
+	if head[:4] == b"OggS":
+		return ".ogg"
+	if head[4:8] == b"ftyp":
+		return ".m4a"
+	if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+		return ".mp3"
+	return ".wav"
+
+
+def _decode_audio(audio_bytes: bytes) -> Any:
+	"""Decode to mono 16 kHz float32 samples; None when decoding is unavailable or fails."""
+	decode = getattr(faster_whisper, "decode_audio", None)
+	if decode is None:
+		return None
+	try:
+		return decode(BytesIO(audio_bytes), sampling_rate=SAMPLE_RATE)
+	except Exception:
+		return None
+
+
+def _speech_windows(audio: Any, max_window_seconds: float) -> List[Tuple[int, int]]:
+	"""Group VAD speech regions into windows of at most ``max_window_seconds``.
+
+	Window boundaries always fall into silence so no word is cut in half.
+	Returns (start_sample, end_sample) pairs; empty when VAD is unavailable.
+	"""
+	get_ts = getattr(faster_whisper, "get_speech_timestamps", None)
+	if get_ts is None:
+		return []
+	try:
+		opts_cls = getattr(faster_whisper, "VadOptions", None)
+		opts = opts_cls(max_speech_duration_s=max_window_seconds) if opts_cls else None
+		regions = get_ts(audio, opts) if opts is not None else get_ts(audio)
+	except Exception:
+		return []
+	max_len = int(max_window_seconds * SAMPLE_RATE)
+	windows: List[Tuple[int, int]] = []
+	cur_start: Optional[int] = None
+	cur_end = 0
+	for r in regions:
+		start, end = int(r["start"]), int(r["end"])
+		if cur_start is None:
+			cur_start, cur_end = start, end
+		elif end - cur_start <= max_len:
+			cur_end = end
+		else:
+			windows.append((cur_start, cur_end))
+			cur_start, cur_end = start, end
+	if cur_start is not None:
+		windows.append((cur_start, cur_end))
+	return windows
+
+
 class AudioTranscriptionService:
-	def __init__(self, model_size: Optional[str] = None) -> None:
-		if model_size is None:
-			from app.core.config import get_whisper_model_size
-			model_size = get_whisper_model_size()
-		self._model_size = model_size
-		self._model = None  # lazy init to avoid heavy load unless needed
+	"""Transcribes audio with a shared, warm Faster-Whisper model.
+
+	Long recordings are split on VAD silence into windows that are transcribed
+	in parallel and merged back in order with absolute offsets. Stats for the
+	last job (including real-time factor) are kept on ``last_stats``.
+	"""
+
+	def __init__(
+		self,
+		model_size: Optional[str] = None,
+		*,
+		device: Optional[str] = None,
+		compute_type: Optional[str] = None,
+		cpu_threads: Optional[int] = None,
+		num_workers: Optional[int] = None,
+	) -> None:
+		from app.core import config
+
+		self._model_size = model_size or config.get_whisper_model_size()
+		self._device = device or config.get_whisper_device()
+		self._compute_type = compute_type or config.get_whisper_compute_type()
+		self._cpu_threads = config.get_whisper_cpu_threads() if cpu_threads is None else cpu_threads
+		self._num_workers = config.get_whisper_num_workers() if num_workers is None else max(1, num_workers)
+		self._parallel_min_seconds = config.get_whisper_parallel_min_seconds()
+		self._chunk_seconds = config.get_whisper_chunk_seconds()
+		self._model = None  # resolved from the process-wide pool on first use
+		self.last_stats: Dict[str, Any] = {}
 
 	def _ensure_model(self) -> None:
 		if self._model is None:
-			# Prefer int8/float16 if GPU/CPU available; leave defaults to library
-			self._model = faster_whisper.WhisperModel(self._model_size)
+			self._model = get_whisper_model(
+				self._model_size,
+				device=self._device,
+				compute_type=self._compute_type,
+				cpu_threads=self._cpu_threads,
+				num_workers=self._num_workers,
+			)
 
-	def transcribe(self, audio_bytes: bytes, language: Optional[str] = None) -> List[Dict[str, Any]]:
+	def transcribe(self, audio_bytes: bytes, language: Optional[str] = None, suffix: Optional[str] = None) -> List[Dict[str, Any]]:
 		self._ensure_model()
+		t0 = time.perf_counter()
+		audio = _decode_audio(audio_bytes)
+		windows: List[Tuple[int, int]] = []
+		if audio is None:
+			# Let the library decode from a file carrying the real container suffix
+			out, detected = self._transcribe_file(audio_bytes, language, suffix or sniff_audio_suffix(audio_bytes))
+			audio_seconds = out[-1]["end"] if out else 0.0
+		else:
+			audio_seconds = len(audio) / float(SAMPLE_RATE)
+			if audio_seconds >= self._parallel_min_seconds and self._num_workers > 1:
+				windows = _speech_windows(audio, self._chunk_seconds)
+			if len(windows) > 1:
+				out, detected = self._transcribe_windows(audio, windows, language)
+			else:
+				out, detected = self._transcribe_array(audio, language, offset=0.0)
+		elapsed = time.perf_counter() - t0
+		self.last_stats = {
+			"audio_seconds": round(audio_seconds, 3),
+			"processing_seconds": round(elapsed, 3),
+			"real_time_factor": (round(elapsed / audio_seconds, 4) if audio_seconds > 0 else None),
+			"windows": max(1, len(windows)),
+			"segments": len(out),
+			"language": detected,
+		}
+		return out
+
+	def _transcribe_file(self, audio_bytes: bytes, language: Optional[str], suffix: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
 		# Write to a temp file to satisfy library expectations
-		with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as tmp:
+		with tempfile.NamedTemporaryFile(suffix=suffix, delete=True) as tmp:
 			tmp.write(audio_bytes)
 			tmp.flush()
-			segments, _info = self._model.transcribe(tmp.name, language=language)
+			segments, info = self._model.transcribe(tmp.name, language=language)
+			# Segments may be a lazy generator reading from the file; consume while it exists
+			return self._collect(segments, offset=0.0), _info_language(info)
+
+	def _transcribe_array(self, audio: Any, language: Optional[str], offset: float) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+		segments, info = self._model.transcribe(audio, language=language)
+		return self._collect(segments, offset=offset), _info_language(info)
+
+	def _transcribe_windows(
+		self, audio: Any, windows: List[Tuple[int, int]], language: Optional[str]
+	) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+		ex = _get_executor(self._num_workers)
+		futures = [
+			ex.submit(self._transcribe_array, audio[start:end], language, start / float(SAMPLE_RATE))
+			for start, end in windows
+		]
+		merged: List[Dict[str, Any]] = []
+		detected: Optional[str] = None
+		# Futures are consumed in submission order so segments stay chronological
+		for fut in futures:
+			segs, lang = fut.result()
+			merged.extend(segs)
+			detected = detected or lang
+		return merged, detected
+
+	@staticmethod
+	def _collect(segments: Any, offset: float) -> List[Dict[str, Any]]:
 		out: List[Dict[str, Any]] = []
 		for seg in segments:
 			text = getattr(seg, "text", "") or ""
-			start = float(getattr(seg, "start", 0.0))
-			end = float(getattr(seg, "end", 0.0))
+			start = float(getattr(seg, "start", 0.0)) + offset
+			end = float(getattr(seg, "end", 0.0)) + offset
 			out.append({"text": text.strip(), "start": start, "end": end})
 		return out
 
 
+def _info_language(info: Any) -> Optional[str]:
+	if isinstance(info, dict):
+		return info.get("language")
+	return getattr(info, "language", None)
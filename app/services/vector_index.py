@@ -0,0 +1,728 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from app.services.ann_index import make_ann_index
+from app.services.quantization import (
+    RESCORE_MULTIPLIER,
+    STORAGE_DTYPES,
+    QuantizedMatrix,
+    as_float32_matrix,
+    rescore_rows,
+)
+
+try:  # POSIX advisory locks coordinate writers across worker processes
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+# Metadata fields with inverted indexes; filters on them never scan records
+INDEXED_FIELDS = ("session_id", "source_type", "file_id", "is_deleted", "memory_type")
+
+_INITIAL_ROWS = 1024
+
+
+def _ensure_file_size(path: Path, size: int) -> None:
+    path.touch(exist_ok=True)
+    if path.stat().st_size < size:
+        with open(path, "r+b") as fh:
+            fh.truncate(size)
+
+
+def _normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms > 0, norms, 1.0)
+
+
+class _MappedMatrix(QuantizedMatrix):
+    """QuantizedMatrix whose codes (and int8 scales) live in memory-mapped files.
+
+    Files grow by doubling; other processes see appended rows through the
+    shared mapping and remap when a row lies past their mapped capacity.
+    Quantized matrices given an ``originals_path`` also keep the float32
+    vectors in a mapped file; queries only touch the rows they rescore, so
+    the scan itself stays on the compact codes. That file makes the store
+    larger on disk than float32 alone; only the scanned set shrinks.
+    """
+
+    def __init__(
+        self,
+        codes_path: Path,
+        scales_path: Path,
+        dim: int,
+        dtype: str,
+        originals_path: Optional[Path] = None,
+    ) -> None:
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported storage dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self._n = 0
+        self._codes_path = codes_path
+        self._scales_path = scales_path if dtype == "int8" else None
+        self._originals_path = originals_path if dtype != "float32" else None
+        row_bytes = dim * np.dtype(dtype).itemsize
+        existing = self._codes_path.stat().st_size // row_bytes if self._codes_path.exists() else 0
+        self._map(max(_INITIAL_ROWS, existing))
+
+    def _map(self, capacity: int) -> None:
+        _ensure_file_size(self._codes_path, capacity * self.dim * np.dtype(self.dtype).itemsize)
+        self._codes = np.memmap(self._codes_path, dtype=np.dtype(self.dtype), mode="r+", shape=(capacity, self.dim))
+        if self._scales_path is not None:
+            _ensure_file_size(self._scales_path, capacity * 4)
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+        else:
+            self._scales = None
+        if self._originals_path is not None:
+            _ensure_file_size(self._originals_path, capacity * self.dim * 4)
+            self._originals = np.memmap(self._originals_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        else:
+            self._originals = None
+
+    def _reserve(self, rows: int) -> None:
+        cap = self._codes.shape[0]
+        if rows <= cap:
+            return
+        self.flush()
+        self._map(max(rows, cap * 2))
+
+    def append(self, vectors: object) -> np.ndarray:
+        vecs = as_float32_matrix(vectors)
+        rows = super().append(vecs)
+        if self._originals is not None and rows.size:
+            self._originals[rows[0] : rows[-1] + 1] = vecs
+        return rows
+
+    def set_rows(self, rows: np.ndarray, vectors: object) -> None:
+        vecs = as_float32_matrix(vectors)
+        super().set_rows(rows, vecs)
+        if self._originals is not None:
+            self._originals[rows] = vecs
+
+    @property
+    def has_originals(self) -> bool:
+        return self._originals is not None
+
+    def original_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Full-precision vectors for ``rows``; only valid when ``has_originals``."""
+        assert self._originals is not None
+        return np.asarray(self._originals[rows], dtype=np.float32)
+
+    def flush(self) -> None:
+        self._codes.flush()
+        if self._scales is not None:
+            self._scales.flush()
+        if self._originals is not None:
+            self._originals.flush()
+
+
+class NumpyVectorCollection:
+    """In-process vector collection exposing the Chroma collection surface.
+
+    Vectors are L2-normalized and kept in one contiguous (memory-mapped) matrix
+    so a query is a single vectorized dot product plus an ``argpartition``
+    top-k. Fields in ``INDEXED_FIELDS`` have inverted indexes that turn
+    filters into boolean row bitmaps before scoring; other metadata filters
+    fall back to a scan. Records and mutations are appended to a JSONL
+    op log that is replayed on open and tailed before every call, so several
+    worker processes can share one directory.
+
+    Large collections add an ANN layer (VECTOR_ANN) once they reach
+    ``ANN_MIN_ROWS``; selective filters still take the exact path. Deleted
+    rows are tombstones until ``compact`` rewrites the files, which happens
+    automatically once ``VECTOR_COMPACT_DEAD_RATIO`` of the rows are dead.
+    """
+
+    def __init__(self, path: Path | str, dtype: Optional[str] = None) -> None:
+        self._dir = Path(path)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._log_path = self._dir / "records.jsonl"
+        self._meta_path = self._dir / "index.json"
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._dtype = (dtype or os.getenv("VECTOR_STORAGE_DTYPE") or "float32").lower()
+        self._reset()
+        with self._lock:
+            self._sync()
+
+    def _reset(self) -> None:
+        self._log_offset = 0
+        self._log_ino: Optional[int] = None
+        self._generation = 0
+        self._matrix: Optional[_MappedMatrix] = None
+        self._alive = np.zeros(_INITIAL_ROWS, dtype=bool)
+        self._row_of: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._documents: Dict[int, Optional[str]] = {}
+        self._metadatas: Dict[int, dict] = {}
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {f: {} for f in INDEXED_FIELDS}
+        self._ann: Any = None
+        self._ann_pending: Set[int] = set()
+
+    # ---- Chroma-compatible surface ----
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._row_of)
+
+    @property
+    def dead_rows(self) -> int:
+        return (len(self._matrix) if self._matrix is not None else 0) - len(self._row_of)
+
+    def add(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+        embeddings: object = None,
+    ) -> None:
+        if not ids:
+            return
+        if embeddings is None:
+            raise ValueError("NumpyVectorCollection requires embeddings")
+        vecs = _normalize_rows(as_float32_matrix(embeddings))
+        if len(vecs) != len(ids):
+            raise ValueError("ids and embeddings length mismatch")
+        with self._lock, self._write_lock():
+            self._sync()
+            matrix = self._ensure_matrix(vecs.shape[1])
+            rows = matrix.append(vecs)
+            matrix.flush()
+            self._write_ops(
+                [
+                    {
+                        "op": "add",
+                        "ids": list(ids),
+                        "rows": [int(r) for r in rows],
+                        "documents": list(documents) if documents is not None else [None] * len(ids),
+                        "metadatas": list(metadatas) if metadatas is not None else [{} for _ in ids],
+                    }
+                ]
+            )
+
+    # Re-adding an id replaces the previous record, so upsert is add
+    upsert = add
+
+    def update(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+        embeddings: object = None,
+    ) -> None:
+        """Update records in place; metadata is merged key by key like Chroma."""
+        if not ids:
+            return
+        with self._lock, self._write_lock():
+            self._sync()
+            present = [i for i, _id in enumerate(ids) if _id in self._row_of]
+            if not present:
+                return
+            if embeddings is not None and self._matrix is not None:
+                vecs = _normalize_rows(as_float32_matrix(embeddings))
+                rows = np.array([self._row_of[ids[i]] for i in present], dtype=np.int64)
+                self._matrix.set_rows(rows, vecs[present])
+                self._matrix.flush()
+            self._write_ops(
+                [
+                    {
+                        "op": "update",
+                        "ids": [ids[i] for i in present],
+                        "documents": [documents[i] for i in present] if documents is not None else None,
+                        "metadatas": [metadatas[i] for i in present] if metadatas is not None else None,
+                        "embeddings": embeddings is not None and self._matrix is not None,
+                    }
+                ]
+            )
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            self._sync()
+            rows = self._select_rows(ids, where)
+            start = offset or 0
+            rows = rows[start : start + limit] if limit is not None else rows[start:]
+            return self._result(rows, include)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> None:
+        if not ids and not where:
+            return
+        with self._lock, self._write_lock():
+            self._sync()
+            rows = self._select_rows(ids, where)
+            if rows.size:
+                self._write_ops([{"op": "delete", "ids": [self._ids[int(r)] for r in rows]}])
+                self._maybe_compact()
+
+    def query(
+        self,
+        query_embeddings: object,
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        queries = _normalize_rows(as_float32_matrix(query_embeddings))
+        out: Dict[str, list] = {"ids": []}
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key in include:
+                out[key] = []
+        with self._lock:
+            self._sync()
+            mask = self._where_mask(where) if self._matrix is not None else None
+            matches = int(mask.sum()) if mask is not None else 0
+            ann = self._ann_for_query(matches, n_results)
+            # Quantized rows are ranked on the codes, then the over-fetched
+            # candidates are rescored against the stored float32 vectors
+            originals = self._matrix.original_rows if self._matrix is not None and self._matrix.has_originals else None
+            for q in queries:
+                if self._matrix is None or mask is None or matches == 0:
+                    rows, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+                elif ann is not None:
+                    fetch = n_results * RESCORE_MULTIPLIER if originals is not None else n_results
+                    rows, scores = ann.search(self._matrix, q, fetch, mask=mask if matches < len(self._row_of) else None)
+                    if originals is not None:
+                        rows, scores = rescore_rows(q, rows, n_results, originals)
+                else:
+                    rows, scores = self._matrix.search(q, n_results, mask=mask, originals=originals)
+                res = self._result(rows, include)
+                for key in out:
+                    if key == "distances":
+                        # Cosine distance; RagService maps it back to a similarity
+                        out[key].append((1.0 - scores).tolist())
+                    else:
+                        out[key].append(res.get(key, []))
+        return out
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite vectors and log with live rows only; returns row counts."""
+        with self._lock, self._write_lock():
+            self._sync()
+            before = len(self._matrix) if self._matrix is not None else 0
+            if self._matrix is None or self.dead_rows == 0:
+                return {"rows_before": before, "rows_after": before}
+            live = np.array(sorted(self._row_of.values()), dtype=np.int64)
+            self._rewrite(live)
+            return {"rows_before": before, "rows_after": len(live)}
+
+    @contextmanager
+    def frozen(self) -> Iterator[None]:
+        """Hold off writers in every process while the body reads a consistent state."""
+        with self._lock, self._write_lock():
+            self._sync()
+            yield
+
+    def copy_to(self, dest: Path) -> None:
+        """Copy the current generation into ``dest`` as a standalone collection.
+
+        Only the log entries replayed so far are copied, together with the
+        vector files they point at, so the copy is a point-in-time image even
+        when other processes keep writing afterwards.
+        """
+        with self.frozen():
+            dest.mkdir(parents=True, exist_ok=True)
+            if self._matrix is not None:
+                self._matrix.flush()
+            for path in (self._meta_path, *self._vector_paths(self._generation)):
+                if path.exists():
+                    shutil.copyfile(path, dest / path.name)
+            with open(dest / self._log_path.name, "wb") as out:
+                remaining = self._log_offset
+                if remaining:
+                    with open(self._log_path, "rb") as fh:
+                        while remaining:
+                            chunk = fh.read(min(remaining, 1 << 20))
+                            if not chunk:
+                                break
+                            out.write(chunk)
+                            remaining -= len(chunk)
+
+    def clear(self) -> None:
+        """Remove every record (and its vector files) in one step."""
+        with self._lock, self._write_lock():
+            self._sync()
+            if self._matrix is not None:
+                self._rewrite(np.empty(0, dtype=np.int64))
+
+    def _rewrite(self, live: np.ndarray) -> None:
+        """Write ``live`` rows into the next file generation and swap the log in.
+
+        Replacing the log with an atomic rename commits the new generation, so
+        readers in other processes either see the old one or reload the new one.
+        """
+        assert self._matrix is not None
+        gen = self._generation + 1
+        codes_path, scales_path, originals_path = self._vector_paths(gen)
+        fresh = _MappedMatrix(
+            codes_path,
+            scales_path,
+            self._matrix.dim,
+            self._matrix.dtype,
+            originals_path if self._matrix.has_originals else None,
+        )
+        fresh._reserve(max(1, len(live)))
+        for start in range(0, len(live), 65536):
+            block = live[start : start + 65536]
+            fresh._codes[start : start + len(block)] = self._matrix._codes[block]
+            if fresh._scales is not None and self._matrix._scales is not None:
+                fresh._scales[start : start + len(block)] = self._matrix._scales[block]
+            if fresh._originals is not None:
+                fresh._originals[start : start + len(block)] = self._matrix.original_rows(block)
+        fresh.flush()
+        ops: List[dict] = [{"op": "generation", "generation": gen}]
+        if len(live):
+            ops.append(
+                {
+                    "op": "add",
+                    "ids": [self._ids[int(r)] for r in live],
+                    "rows": list(range(len(live))),
+                    "documents": [self._documents[int(r)] for r in live],
+                    "metadatas": [self._metadatas[int(r)] for r in live],
+                }
+            )
+        tmp = self._log_path.with_suffix(".tmp")
+        tmp.write_bytes("".join(json.dumps(op, separators=(",", ":")) + "\n" for op in ops).encode("utf-8"))
+        os.replace(tmp, self._log_path)
+        old_paths = self._vector_paths(self._generation)
+        self._reset()
+        self._sync()
+        for path in old_paths:
+            try:
+                path.unlink()
+            except OSError:
+                # Missing, or still mapped on platforms that forbid unlinking
+                pass
+
+    def _maybe_compact(self) -> None:
+        from app.core.config import get_vector_compact_dead_ratio
+
+        total = len(self._matrix) if self._matrix is not None else 0
+        if total >= _INITIAL_ROWS and self.dead_rows > total * get_vector_compact_dead_ratio():
+            self.compact()
+
+    def _ann_for_query(self, matches: int, k: int) -> Any:
+        """ANN index to use for this query, or None for the exact scan."""
+        from app.core.config import get_ann_min_rows, get_ann_exact_filter_ratio
+
+        live = len(self._row_of)
+        if self._matrix is None or live < get_ann_min_rows():
+            return None
+        # Selective filters: scanning the few matching rows is exact and cheap
+        if matches <= max(k * 10, live * get_ann_exact_filter_ratio()):
+            return None
+        if self._ann is None or self._ann.needs_rebuild(live):
+            ann = make_ann_index(self._matrix.dim)
+            if ann is None:
+                return None
+            ann.build(self._matrix, np.array(sorted(self._row_of.values()), dtype=np.int64))
+            self._ann = ann
+            self._ann_pending = set()
+        elif self._ann_pending:
+            rows = np.array(sorted(self._ann_pending), dtype=np.int64)
+            self._ann.add(rows, self._matrix.rows(rows))
+            self._ann_pending = set()
+        return self._ann
+
+    # ---- selection ----
+
+    def _select_rows(self, ids: Optional[List[str]], where: Optional[dict]) -> np.ndarray:
+        if ids:
+            rows = np.array([self._row_of[i] for i in ids if i in self._row_of], dtype=np.int64)
+            if where:
+                mask = self._where_mask(where)
+                rows = rows[mask[rows]]
+            return rows
+        return np.flatnonzero(self._where_mask(where))
+
+    def _where_mask(self, where: Optional[dict]) -> np.ndarray:
+        n = len(self._matrix) if self._matrix is not None else 0
+        mask = np.zeros(n, dtype=bool)
+        live = min(n, len(self._alive))
+        mask[:live] = self._alive[:live]
+        if not where:
+            return mask
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._where_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub in cond:
+                    any_mask |= self._where_mask(sub)
+                mask &= any_mask
+            else:
+                ops = cond if isinstance(cond, dict) else {"$eq": cond}
+                for op, value in ops.items():
+                    mask &= self._field_mask(key, op, value, n)
+        return mask
+
+    def _field_mask(self, key: str, op: str, value: Any, n: int) -> np.ndarray:
+        if key in self._postings and op in ("$eq", "$ne", "$in", "$nin"):
+            values = value if op in ("$in", "$nin") else [value]
+            mask = np.zeros(n, dtype=bool)
+            for v in values:
+                rows = self._postings[key].get(v)
+                if rows:
+                    mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            return ~mask if op in ("$ne", "$nin") else mask
+        mask = np.zeros(n, dtype=bool)
+        for row in np.flatnonzero(self._alive[: min(n, len(self._alive))]):
+            mask[row] = _compare(self._metadatas[int(row)].get(key), op, value)
+        return mask
+
+    def _result(self, rows: np.ndarray, include: List[str]) -> dict:
+        out: Dict[str, Any] = {"ids": [self._ids[int(r)] for r in rows]}
+        if "documents" in include:
+            out["documents"] = [self._documents[int(r)] for r in rows]
+        if "metadatas" in include:
+            out["metadatas"] = [dict(self._metadatas[int(r)]) for r in rows]
+        if "embeddings" in include:
+            out["embeddings"] = self._matrix.rows(rows) if self._matrix is not None and rows.size else np.empty((0, 0), dtype=np.float32)
+        return out
+
+    # ---- storage ----
+
+    def _vector_paths(self, generation: int) -> tuple[Path, Path, Path]:
+        if generation == 0:
+            return self._dir / "vectors.bin", self._dir / "scales.bin", self._dir / "originals.bin"
+        return (
+            self._dir / f"vectors-{generation}.bin",
+            self._dir / f"scales-{generation}.bin",
+            self._dir / f"originals-{generation}.bin",
+        )
+
+    def _open_matrix(self) -> Optional[_MappedMatrix]:
+        if self._matrix is None and self._meta_path.exists():
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            self._dtype = meta.get("dtype", self._dtype)
+            codes_path, scales_path, originals_path = self._vector_paths(self._generation)
+            # Collections written before originals were kept search on the codes alone
+            self._matrix = _MappedMatrix(
+                codes_path,
+                scales_path,
+                int(meta["dim"]),
+                self._dtype,
+                originals_path if meta.get("originals") else None,
+            )
+        return self._matrix
+
+    def _ensure_matrix(self, dim: int) -> _MappedMatrix:
+        if self._open_matrix() is None:
+            from app.core.config import get_vector_keep_originals
+
+            meta = {"dim": dim, "dtype": self._dtype, "originals": self._dtype != "float32" and get_vector_keep_originals()}
+            self._meta_path.write_text(json.dumps(meta), encoding="utf-8")
+            self._open_matrix()
+        assert self._matrix is not None
+        if self._matrix.dim != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match index dimension {self._matrix.dim}")
+        return self._matrix
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        # Re-entrant: delete() may compact() while already holding the lock
+        if fcntl is None or self._write_depth:
+            self._write_depth += 1
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+            return
+        with open(self._dir / "write.lock", "a+") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            self._write_depth += 1
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _write_ops(self, ops: List[dict]) -> None:
+        payload = "".join(json.dumps(op, separators=(",", ":")) + "\n" for op in ops).encode("utf-8")
+        with open(self._log_path, "ab") as fh:
+            fh.write(payload)
+            fh.flush()
+        self._log_offset += len(payload)
+        for op in ops:
+            self._apply(op)
+
+    def _sync(self) -> None:
+        """Replay log entries written since the last call (by this or another process)."""
+        try:
+            st = self._log_path.stat()
+        except FileNotFoundError:
+            if self._log_ino is not None:
+                # Dropped by another process
+                self._reset()
+            return
+        if self._log_ino is not None and (st.st_ino != self._log_ino or st.st_size < self._log_offset):
+            # Another process compacted the collection; reload the new generation
+            self._reset()
+        self._log_ino = st.st_ino
+        size = st.st_size
+        if size <= self._log_offset:
+            return
+        with open(self._log_path, "rb") as fh:
+            fh.seek(self._log_offset)
+            chunk = fh.read(size - self._log_offset)
+        # A writer may be mid-line; only consume complete entries
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._log_offset += end
+
+    def _apply(self, op: dict) -> None:
+        kind = op.get("op")
+        if kind == "generation":
+            self._generation = int(op["generation"])
+            self._matrix = None
+        elif kind == "add":
+            for _id, row, doc, meta in zip(op["ids"], op["rows"], op["documents"], op["metadatas"]):
+                self._drop(_id)
+                self._place(_id, int(row), doc, meta or {})
+        elif kind == "update":
+            if op.get("embeddings"):
+                # Moved vectors may belong elsewhere in the graph/lists; every
+                # process replaying the op rebuilds its index lazily
+                self._ann = None
+                self._ann_pending = set()
+            docs = op.get("documents")
+            metas = op.get("metadatas")
+            for i, _id in enumerate(op["ids"]):
+                row = self._row_of.get(_id)
+                if row is None:
+                    continue
+                if docs is not None and docs[i] is not None:
+                    self._documents[row] = docs[i]
+                if metas is not None and metas[i] is not None:
+                    merged = dict(self._metadatas[row])
+                    for k, v in metas[i].items():
+                        if v is None:
+                            merged.pop(k, None)
+                        else:
+                            merged[k] = v
+                    self._unindex(row)
+                    self._metadatas[row] = merged
+                    self._index(row)
+        elif kind == "delete":
+            for _id in op["ids"]:
+                self._drop(_id)
+
+    def _place(self, _id: str, row: int, doc: Optional[str], meta: dict) -> None:
+        if self._open_matrix() is not None:
+            self._matrix._reserve(row + 1)
+            self._matrix._n = max(self._matrix._n, row + 1)
+        if row >= len(self._alive):
+            alive = np.zeros(max(row + 1, len(self._alive) * 2), dtype=bool)
+            alive[: len(self._alive)] = self._alive
+            self._alive = alive
+        self._alive[row] = True
+        self._row_of[_id] = row
+        self._ids[row] = _id
+        self._documents[row] = doc
+        self._metadatas[row] = meta
+        self._index(row)
+        if self._ann is not None:
+            self._ann_pending.add(row)
+
+    def _drop(self, _id: str) -> None:
+        row = self._row_of.pop(_id, None)
+        if row is None:
+            return
+        # The vector row stays in the file as a dead slot
+        self._alive[row] = False
+        self._unindex(row)
+        self._ids.pop(row, None)
+        self._documents.pop(row, None)
+        self._metadatas.pop(row, None)
+        if self._ann is not None:
+            if row in self._ann_pending:
+                self._ann_pending.discard(row)
+            else:
+                self._ann.remove([row])
+
+    def _index(self, row: int) -> None:
+        meta = self._metadatas[row]
+        for field in INDEXED_FIELDS:
+            if field in meta:
+                self._postings[field].setdefault(meta[field], set()).add(row)
+
+    def _unindex(self, row: int) -> None:
+        meta = self._metadatas.get(row) or {}
+        for field in INDEXED_FIELDS:
+            rows = self._postings[field].get(meta.get(field))
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    self._postings[field].pop(meta.get(field), None)
+
+
+def _compare(actual: Any, op: str, value: Any) -> bool:
+    if op == "$eq":
+        return actual == value
+    if op == "$ne":
+        return actual != value
+    if op == "$in":
+        return actual in value
+    if op == "$nin":
+        return actual not in value
+    if actual is None:
+        return False
+    try:
+        if op == "$gt":
+            return actual > value
+        if op == "$gte":
+            return actual >= value
+        if op == "$lt":
+            return actual < value
+        if op == "$lte":
+            return actual <= value
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported where operator: {op}")
+
+
+# Process-wide collections keyed by directory; RagService is constructed per request
+_COLLECTIONS: Dict[str, NumpyVectorCollection] = {}
+_COLLECTIONS_LOCK = threading.Lock()
+
+
+def get_numpy_collection(path: Path | str) -> NumpyVectorCollection:
+    key = str(Path(path).resolve())
+    with _COLLECTIONS_LOCK:
+        coll = _COLLECTIONS.get(key)
+        if coll is None:
+            coll = NumpyVectorCollection(key)
+            _COLLECTIONS[key] = coll
+    return coll
+
+
+def drop_numpy_collection(path: Path | str) -> None:
+    """Delete a collection directory and forget its cached handle."""
+    target = Path(path).resolve()
+    with _COLLECTIONS_LOCK:
+        _COLLECTIONS.pop(str(target), None)
+    if not target.exists():
+        return
+    # Rename first so concurrent openers never see a half-deleted directory
+    trash = target.with_name(f".{target.name}.dropped-{os.getpid()}-{threading.get_ident()}")
+    os.replace(target, trash)
+    shutil.rmtree(trash, ignore_errors=True)
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+GLOBAL_PARTITION = "GLOBAL"
+
+# Chroma collection names must start and end alphanumeric and stay under 64 chars
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,46}[A-Za-z0-9])?$")
+
+
+def partition_key(session_id: Optional[str]) -> str:
+    """Filesystem/Chroma-safe partition name for a session (GLOBAL when unscoped)."""
+    if not session_id or session_id == GLOBAL_PARTITION:
+        return GLOBAL_PARTITION
+    if _SAFE_KEY.match(session_id):
+        return session_id
+    return hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+
+
+def _flat(value: Any) -> list:
+    # Chroma get() returns flat lists; some versions/stubs nest them once
+    if isinstance(value, list) and value and isinstance(value[0], list):
+        return value[0]
+    return list(value) if value is not None else []
+
+
+def _take(values: Any, idx: List[int]) -> Any:
+    if values is None:
+        return None
+    if isinstance(values, np.ndarray):
+        return values[idx]
+    return [values[i] for i in idx]
+
+
+def _session_values(where: Optional[dict]) -> Optional[List[str]]:
+    """Session ids a filter is pinned to, or None when it may match any session."""
+    if not where:
+        return None
+    cond = where.get("session_id")
+    if isinstance(cond, str):
+        return [cond]
+    if isinstance(cond, dict):
+        if isinstance(cond.get("$eq"), str):
+            return [cond["$eq"]]
+        if isinstance(cond.get("$in"), list):
+            return [str(v) for v in cond["$in"]]
+    for sub in where.get("$and", []) or []:
+        found = _session_values(sub)
+        if found is not None:
+            return found
+    return None
+
+
+def _strip_session(where: Optional[dict]) -> Optional[dict]:
+    """Drop the session condition once routing has already applied it."""
+    if not where:
+        return None
+    out = {k: v for k, v in where.items() if k != "session_id"}
+    if "$and" in out:
+        rest = [s for s in (_strip_session(sub) for sub in out["$and"]) if s]
+        out.pop("$and")
+        if len(rest) == 1:
+            out.update(rest[0])
+        elif rest:
+            out["$and"] = rest
+    return out or None
+
+
+class PartitionedCollection:
+    """One vector collection per session plus a GLOBAL one, behind the collection API.
+
+    Records are routed by their ``session_id`` metadata. Filters pinned to a
+    session only touch that partition (and drop the now-redundant session
+    condition); other filters fan out over all partitions and merge. Moving a
+    file between sessions copies stored vectors, so nothing is re-embedded,
+    and dropping a session removes its partition wholesale.
+    """
+
+    def __init__(
+        self,
+        open_partition: Callable[[str, bool], Optional[Any]],
+        list_partitions: Callable[[], List[str]],
+        drop_partition: Callable[[str], None],
+    ) -> None:
+        self._open = open_partition
+        self._list = list_partitions
+        self._drop = drop_partition
+
+    def _partitions(self, where: Optional[dict]) -> Dict[str, Any]:
+        sessions = _session_values(where)
+        keys = [partition_key(s) for s in sessions] if sessions is not None else self._list()
+        out: Dict[str, Any] = {}
+        for key in keys:
+            coll = self._open(key, False)
+            if coll is not None:
+                out[key] = coll
+        return out
+
+    def count(self) -> int:
+        return sum(coll.count() for coll in self._partitions(None).values())
+
+    def add(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+        embeddings: object = None,
+    ) -> None:
+        groups: Dict[str, List[int]] = {}
+        for i in range(len(ids)):
+            meta = metadatas[i] if metadatas is not None else {}
+            groups.setdefault(partition_key(meta.get("session_id")), []).append(i)
+        for key, idx in groups.items():
+            kwargs: Dict[str, Any] = {"ids": _take(ids, idx)}
+            if documents is not None:
+                kwargs["documents"] = _take(documents, idx)
+            if metadatas is not None:
+                kwargs["metadatas"] = _take(metadatas, idx)
+            if embeddings is not None:
+                kwargs["embeddings"] = _take(embeddings, idx)
+            self._open(key, True).add(**kwargs)
+
+    def upsert(self, **kwargs: Any) -> None:
+        self.add(**kwargs)
+
+    def update(
+        self,
+        ids: List[str],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+        embeddings: object = None,
+    ) -> None:
+        def _slice(idx: List[int]) -> Dict[str, Any]:
+            kwargs: Dict[str, Any] = {"ids": _take(ids, idx)}
+            if documents is not None:
+                kwargs["documents"] = _take(documents, idx)
+            if metadatas is not None:
+                kwargs["metadatas"] = _take(metadatas, idx)
+            if embeddings is not None:
+                kwargs["embeddings"] = _take(embeddings, idx)
+            return kwargs
+
+        # Route by the session_id in the metadata; only records that are not where
+        # it points (no session given, or the session is changing) are searched for
+        groups: Dict[str, List[int]] = {}
+        unrouted: List[int] = []
+        for i in range(len(ids)):
+            target = metadatas[i].get("session_id") if metadatas is not None and metadatas[i] else None
+            if target is None:
+                unrouted.append(i)
+            else:
+                groups.setdefault(partition_key(target), []).append(i)
+        for key, idx in groups.items():
+            coll = self._open(key, False)
+            have = set(_flat(coll.get(ids=_take(ids, idx), include=[]).get("ids"))) if coll is not None else set()
+            hit = [i for i in idx if ids[i] in have]
+            if hit:
+                coll.update(**_slice(hit))
+            unrouted.extend(i for i in idx if ids[i] not in have)
+        if not unrouted:
+            return
+
+        wanted = {ids[i] for i in unrouted}
+        moves: Dict[str, List[str]] = {}
+        for key, coll in self._partitions(None).items():
+            have = set(_flat(coll.get(ids=list(wanted), include=[]).get("ids")))
+            if not have:
+                continue
+            idx = [i for i in unrouted if ids[i] in have]
+            coll.update(**_slice(idx))
+            # A changed session_id means the records belong to another partition now
+            if metadatas is not None:
+                for i in idx:
+                    target = metadatas[i].get("session_id") if metadatas[i] else None
+                    if target is not None and partition_key(target) != key:
+                        moves.setdefault(target, []).append(ids[i])
+            wanted -= have
+            if not wanted:
+                break
+        for target, moved_ids in moves.items():
+            self.move(target, ids=moved_ids)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include if include is not None else ["documents", "metadatas"]
+        parts = self._partitions(where)
+        out: Dict[str, list] = {"ids": []}
+        for key in include:
+            out[key] = []
+        for coll in parts.values():
+            kwargs: Dict[str, Any] = {"include": include}
+            if ids:
+                kwargs["ids"] = ids
+            sub_where = _strip_session(where) if len(parts) == 1 else where
+            if sub_where:
+                kwargs["where"] = sub_where
+            got = coll.get(**kwargs)
+            out["ids"].extend(_flat(got.get("ids")))
+            for key in include:
+                # Embedding rows are lists themselves; never unwrap them
+                values = got.get(key)
+                out[key].extend(list(values) if key == "embeddings" and values is not None else _flat(values))
+        start = offset or 0
+        end = start + limit if limit is not None else None
+        return {key: values[start:end] for key, values in out.items()}
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> None:
+        if not ids and not where:
+            return
+        kwargs: Dict[str, Any] = {}
+        if ids:
+            kwargs["ids"] = ids
+        if where:
+            kwargs["where"] = where
+        for coll in self._partitions(where).values():
+            coll.delete(**kwargs)
+
+    def query(
+        self,
+        query_embeddings: object,
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        parts = self._partitions(where)
+        if len(parts) == 1:
+            return next(iter(parts.values())).query(
+                query_embeddings=query_embeddings, n_results=n_results, where=_strip_session(where), include=include
+            )
+        n_queries = len(query_embeddings) if not isinstance(query_embeddings, np.ndarray) else query_embeddings.shape[0]
+        keys = ["ids"] + [k for k in include if k != "ids"]
+        merged: Dict[str, list] = {k: [[] for _ in range(n_queries)] for k in keys}
+        dists: List[list] = [[] for _ in range(n_queries)]
+        for coll in parts.values():
+            res = coll.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=list({*include, "distances"}),
+            )
+            for q in range(n_queries):
+                dists[q].extend(res.get("distances", [[]] * n_queries)[q] or [])
+                for k in keys:
+                    merged[k][q].extend((res.get(k) or [[]] * n_queries)[q] or [])
+        for q in range(n_queries):
+            order = np.argsort(np.asarray(dists[q], dtype=np.float32), kind="stable")[:n_results].tolist()
+            for k in keys:
+                merged[k][q] = [merged[k][q][i] for i in order] if k != "distances" else [dists[q][i] for i in order]
+        return merged
+
+    # ---- partition management ----
+
+    def partitions(self) -> Dict[str, Any]:
+        """Existing partitions by key."""
+        return self._partitions(None)
+
+    def drop(self, session_id: Optional[str]) -> None:
+        self._drop(partition_key(session_id))
+
+    def drop_all(self) -> None:
+        for key in self._list():
+            self._drop(key)
+
+    def move(
+        self,
+        session_id: Optional[str],
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+    ) -> int:
+        """Move matching records to ``session_id``'s partition, reusing stored vectors."""
+        target_key = partition_key(session_id)
+        target_value = session_id or GLOBAL_PARTITION
+        moved = 0
+        for key, coll in self._partitions(None).items():
+            kwargs: Dict[str, Any] = {"include": ["documents", "metadatas", "embeddings"]}
+            if ids:
+                kwargs["ids"] = ids
+            if where:
+                kwargs["where"] = where
+            got = coll.get(**kwargs)
+            found = _flat(got.get("ids"))
+            if not found:
+                continue
+            metas = [dict(m or {}, session_id=target_value) for m in _flat(got.get("metadatas"))]
+            if key == target_key:
+                coll.update(ids=found, metadatas=metas)
+                continue
+            self._open(target_key, True).add(
+                ids=found,
+                documents=_flat(got.get("documents")),
+                metadatas=metas,
+                embeddings=got.get("embeddings"),
+            )
+            coll.delete(ids=found)
+            moved += len(found)
+        return moved
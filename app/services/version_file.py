@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+def file_version(path: Optional[Path]) -> Optional[Tuple[int, int, int]]:
+    """Signature of a version file (one ``stat``); changes whenever ``bump_version_file`` runs."""
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def bump_version_file(path: Optional[Path]) -> None:
+    """Tell other workers something changed by replacing ``path``.
+
+    A unique token plus the rename gives the file a new inode and mtime on
+    every call, so concurrent bumps from several workers are never lost.
+    """
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(f"{os.getpid()}:{os.urandom(8).hex()}", encoding="utf-8")
+        tmp.replace(path)
+    except Exception:
+        # Without the file only this worker sees the change; never fail the write over it
+        pass
@@ -48,3 +48,43 @@ def use_temp_chroma(tmp_path, monkeypatch):
     yield
 
 
+@pytest.fixture(autouse=True)
+def use_temp_ocr_cache(tmp_path, monkeypatch):
+    # Keep OCR results cached by image hash isolated per test
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def use_temp_summary_cache(tmp_path, monkeypatch):
+    # Cached summaries are keyed by message range; keep them per test
+    monkeypatch.setenv("SUMMARY_CACHE_DIR", str(tmp_path / "summary_cache"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def use_temp_settings_version(tmp_path, monkeypatch):
+    # Cross-worker settings cache version file, isolated per test
+    monkeypatch.setenv("SETTINGS_VERSION_FILE", str(tmp_path / "settings.version"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def use_temp_vector_version(tmp_path, monkeypatch):
+    # Cross-worker retrieval cache version file, isolated per test
+    monkeypatch.setenv("VECTOR_VERSION_FILE", str(tmp_path / "vectors.version"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def use_temp_file_catalog_version(tmp_path, monkeypatch):
+    # Cross-worker file catalog version file, isolated per test
+    monkeypatch.setenv("FILE_CATALOG_VERSION_FILE", str(tmp_path / "files.version"))
+    yield
+
+
+@pytest.fixture(autouse=True)
+def use_temp_maintenance_lock(tmp_path, monkeypatch):
+    # Cross-worker maintenance gate, isolated per test
+    monkeypatch.setenv("MAINTENANCE_LOCK_FILE", str(tmp_path / "maintenance.lock"))
+    yield
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from app.services.ann_index import HnswIndex, IvfIndex, benchmark, synthetic_corpus
+from app.services.quantization import QuantizedMatrix
+from app.services.vector_index import NumpyVectorCollection
+
+
+def test_ivf_recall_and_tombstones():
+    vecs = synthetic_corpus(5000, 32, seed=1)
+    matrix = QuantizedMatrix(32)
+    matrix.append(vecs)
+    index = IvfIndex(32, nprobe=8)
+    index.build(matrix, np.arange(5000))
+
+    rows, scores = index.search(matrix, vecs[123], 10)
+    assert rows[0] == 123
+    assert np.all(np.diff(scores) <= 0)
+
+    index.remove([123])
+    rows, _ = index.search(matrix, vecs[123], 10)
+    assert 123 not in rows.tolist()
+
+    mask = np.zeros(5000, dtype=bool)
+    mask[::2] = True
+    rows, _ = index.search(matrix, vecs[124], 10, mask=mask)
+    assert rows.size and all(r % 2 == 0 for r in rows.tolist())
+
+
+def test_hnsw_falls_back_to_exact_when_filter_leaves_fewer_than_k():
+    pytest.importorskip("hnswlib")
+    vecs = synthetic_corpus(2000, 16, seed=3)
+    matrix = QuantizedMatrix(16)
+    matrix.append(vecs)
+    index = HnswIndex(16)
+    index.build(matrix, np.arange(2000))
+
+    mask = np.zeros(2000, dtype=bool)
+    mask[[5, 500, 1500]] = True
+    rows, scores = index.search(matrix, vecs[500], 10, mask=mask)
+    assert sorted(rows.tolist()) == [5, 500, 1500]
+    assert rows[0] == 500 and np.all(np.diff(scores) <= 0)
+
+
+def test_benchmark_reports_recall_against_exact():
+    report = benchmark(n=3000, dim=16, queries=20, k=5, settings=[{"kind": "IVF", "nprobe": 64}])
+    assert report[0]["index"] == "exact" and report[0]["recall_at_k"] == 1.0
+    assert report[1]["recall_at_k"] >= 0.95
+
+
+def test_collection_uses_ann_and_compacts(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_ANN", "IVF")
+    monkeypatch.setenv("ANN_MIN_ROWS", "1000")
+    monkeypatch.setenv("ANN_IVF_NPROBE", "16")
+    vecs = synthetic_corpus(4000, 16, seed=2)
+    coll = NumpyVectorCollection(tmp_path / "idx")
+    coll.add(
+        ids=[f"c{i}" for i in range(4000)],
+        documents=[str(i) for i in range(4000)],
+        metadatas=[{"session_id": "S1" if i % 2 else "GLOBAL", "file_id": f"f{i // 100}"} for i in range(4000)],
+        embeddings=vecs,
+    )
+
+    res = coll.query(query_embeddings=vecs[7:8], n_results=5)
+    assert res["ids"][0][0] == "c7"
+    assert coll._ann is not None
+
+    # Incremental insert is visible through the ANN layer
+    coll.add(ids=["new"], documents=["new"], metadatas=[{"session_id": "S1"}], embeddings=vecs[8:9] * -1)
+    assert coll.query(query_embeddings=-vecs[8:9], n_results=1)["ids"][0] == ["new"]
+
+    res = coll.query(query_embeddings=vecs[7:8], n_results=5, where={"session_id": "S1"})
+    assert "c7" in res["ids"][0] and all(m["session_id"] == "S1" for m in res["metadatas"][0])
+
+    # Deleting past the dead-row ratio triggers compaction into a new generation
+    other = NumpyVectorCollection(tmp_path / "idx")
+    coll.delete(where={"file_id": {"$in": [f"f{i}" for i in range(20)]}})
+    assert coll.dead_rows == 0
+    assert coll.count() == 2001
+    assert other.count() == 2001
+    res = other.query(query_embeddings=vecs[3000:3001], n_results=1)
+    assert res["ids"][0] == ["c3000"]
+    assert not (tmp_path / "idx" / "vectors.bin").exists()
+
+
+def test_collection_retrains_ivf_once_rows_double(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_ANN", "IVF")
+    monkeypatch.setenv("ANN_MIN_ROWS", "1000")
+    vecs = synthetic_corpus(2500, 16, seed=4)
+    coll = NumpyVectorCollection(tmp_path / "idx")
+
+    def _add(lo: int, hi: int) -> None:
+        coll.add(
+            ids=[f"c{i}" for i in range(lo, hi)],
+            documents=[str(i) for i in range(lo, hi)],
+            metadatas=[{"session_id": "S1"} for _ in range(lo, hi)],
+            embeddings=vecs[lo:hi],
+        )
+
+    _add(0, 1200)
+    coll.query(query_embeddings=vecs[:1], n_results=5)
+    first = coll._ann
+    _add(1200, 2000)
+    coll.query(query_embeddings=vecs[:1], n_results=5)
+    # Still within twice the trained size: new rows are only appended to the lists
+    assert coll._ann is first
+    _add(2000, 2500)
+    res = coll.query(query_embeddings=vecs[2400:2401], n_results=1)
+    assert coll._ann is not first and len(coll._ann) == 2500
+    assert res["ids"][0] == ["c2400"]
+
+
+def test_embedding_updates_reset_ann_in_other_processes(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_ANN", "IVF")
+    monkeypatch.setenv("ANN_MIN_ROWS", "1000")
+    monkeypatch.setenv("ANN_IVF_NPROBE", "1")
+    vecs = synthetic_corpus(1500, 16, seed=5)
+    writer = NumpyVectorCollection(tmp_path / "idx")
+    writer.add(
+        ids=[f"c{i}" for i in range(1500)],
+        documents=[str(i) for i in range(1500)],
+        metadatas=[{"session_id": "S1"} for _ in range(1500)],
+        embeddings=vecs,
+    )
+    reader = NumpyVectorCollection(tmp_path / "idx")
+    reader.query(query_embeddings=vecs[:1], n_results=5)
+    built = reader._ann
+    assert built is not None
+
+    writer.update(ids=["c0"], embeddings=-vecs[1:2])
+    res = reader.query(query_embeddings=-vecs[1:2], n_results=1)
+    assert reader._ann is not built
+    assert res["ids"][0] == ["c0"]
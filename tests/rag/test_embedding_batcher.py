@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.embedding_batcher import MicroBatchingEmbedder
+
+
+class _RecordingEmbedder:
+    def __init__(self, fail: bool = False) -> None:
+        self.calls: list[list[str]] = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model down")
+        time.sleep(0.01)
+        return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+
+def test_concurrent_thread_callers_share_batched_forward_passes():
+    inner = _RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=50, max_batch=64)
+    texts = [f"query number {i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda t: batcher.embed([t]), texts))
+    # Every caller gets its own vector back
+    for t, vecs in zip(texts, results):
+        assert vecs == inner.embed([t])
+    assert len(inner.calls) - len(texts) < len(texts)
+    assert batcher.stats["requests"] == 8
+
+
+def test_concurrent_callers_are_coalesced_and_duplicates_embedded_once():
+    inner = _RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=30, max_batch=64)
+    requests = [["same question"], ["same question"], ["chunk a", "chunk b"]]
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        out = list(ex.map(batcher.embed, requests))
+    assert out[0] == out[1]
+    assert len(out[2]) == 2
+    assert len(inner.calls) == 1
+    assert sorted(inner.calls[0]) == ["chunk a", "chunk b", "same question"]
+
+
+def test_large_requests_bypass_the_batching_thread():
+    inner = _RecordingEmbedder()
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=1000, max_batch=4)
+    chunks = [f"chunk {i}" for i in range(10)]
+    start = time.monotonic()
+    assert len(batcher.embed(chunks)) == 10
+    # Embedded directly on the caller's thread, without waiting for max_wait
+    assert time.monotonic() - start < 0.5
+    assert inner.calls == [chunks]
+    assert batcher.stats["batches"] == 0
+
+
+def test_max_batch_caps_waiting_and_errors_reach_every_caller():
+    inner = _RecordingEmbedder(fail=True)
+    batcher = MicroBatchingEmbedder(inner, max_wait_ms=1000, max_batch=1)
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        batcher.embed(["a"])
+    # A full batch is dispatched immediately instead of waiting for max_wait
+    assert time.monotonic() - start < 0.5
+
+
+def test_shared_embedder_caches_the_fallback(monkeypatch):
+    from app.services import rag as rag_module
+
+    attempts: list[str] = []
+
+    def _unavailable(model_name: str, device: str):
+        attempts.append(model_name)
+        raise ImportError("sentence_transformers")
+
+    monkeypatch.setenv("EMBEDDINGS_BACKEND", "SENTENCE_TRANSFORMERS")
+    monkeypatch.setattr(rag_module, "SentenceTransformerEmbeddingModel", _unavailable)
+    monkeypatch.setattr(rag_module, "_EMBEDDERS", {})
+    first = rag_module.get_shared_embedder()
+    assert isinstance(first, rag_module.FakeEmbeddingModel)
+    assert rag_module.get_shared_embedder() is first
+    assert len(attempts) == 1
@@ -1,7 +1,10 @@
 import uuid
 
+import numpy as np
+import pytest
 from fpdf import FPDF
 
+from app.services import rag as rag_module
 from app.services.rag import RagService, FakeEmbeddingModel
 
 
@@ -38,3 +41,28 @@ def test_embeddings_persisted_and_retrievable(tmp_path):
         assert isinstance(r["metadata"]["chunk_index"], int)
 
 
+
+
+def test_chroma_call_retries_only_on_array_rejection(monkeypatch):
+
+    monkeypatch.setattr(rag_module, "_CHROMA_ACCEPTS_ARRAYS", True)
+    seen: list[type] = []
+
+    def _old_chroma(embeddings):
+        seen.append(type(embeddings))
+        if isinstance(embeddings, np.ndarray):
+            raise ValueError("Expected each embedding in the embeddings to be a list, got [...]")
+        return "ok"
+
+    assert rag_module._chroma_call(_old_chroma, embeddings=np.zeros((1, 2), dtype=np.float32)) == "ok"
+    assert seen == [np.ndarray, list]
+    assert rag_module._CHROMA_ACCEPTS_ARRAYS is False
+
+    monkeypatch.setattr(rag_module, "_CHROMA_ACCEPTS_ARRAYS", True)
+
+    def _broken(embeddings):
+        raise ValueError("Collection expecting embedding with dimension of 384, got 8")
+
+    with pytest.raises(ValueError, match="dimension"):
+        rag_module._chroma_call(_broken, embeddings=np.zeros((1, 8), dtype=np.float32))
+    assert rag_module._CHROMA_ACCEPTS_ARRAYS is True
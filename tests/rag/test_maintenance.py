@@ -0,0 +1,152 @@
+import sqlite3
+import threading
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import maintenance
+from app.services.maintenance import (
+    RequestGate,
+    compact_vectors,
+    create_snapshot,
+    list_snapshots,
+    maintenance_mode,
+    restore_snapshot,
+)
+from app.services.rag import RagService, FakeEmbeddingModel
+
+
+class _CountingEmbedder(FakeEmbeddingModel):
+    calls: int = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        return super().embed(texts)
+
+
+def _db(path, file_ids):
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS files (id TEXT PRIMARY KEY, name TEXT)")
+        conn.execute("DELETE FROM files")
+        conn.executemany("INSERT INTO files VALUES (?, ?)", [(f, f"{f}.pdf") for f in file_ids])
+
+
+def _ids(rag, where=None):
+    got = rag._collection.get(where=where) if where else rag._collection.get()
+    return sorted(got["ids"])
+
+
+def test_snapshot_restore_round_trip_without_reembedding(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    monkeypatch.setenv("SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    db_file = tmp_path / "app.db"
+    db_url = f"sqlite:///{db_file}"
+    uploads = tmp_path / "uploads"
+    (uploads / "pdfs").mkdir(parents=True)
+    (uploads / "pdfs" / "fa.pdf").write_bytes(b"%PDF-a")
+    (uploads / "pdfs" / "fb.pdf").write_bytes(b"%PDF-b")
+    _db(db_file, ["fa", "fb"])
+
+    embedder = _CountingEmbedder(embed_dim=8)
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=embedder)
+    rag.persist_chunks("fa", "s1", ["alpha one", "alpha two"])
+    rag.persist_chunks("fb", "s1", ["beta one"])
+    # Chunks of a file the DB no longer knows are left out of the snapshot
+    rag.persist_chunks("gone", "s1", ["orphan"])
+    rag.upsert_memory(["s1:fact:1"], ["likes alpha"], [{"session_id": "s1", "memory_type": "fact"}])
+
+    phases = []
+    manifest = create_snapshot(rag=rag, db_url=db_url, uploads_dir=uploads, progress=lambda p, d, t: phases.append(p))
+    assert manifest["vectors"] == 4 and manifest["memory"] == 1 and manifest["originals"] == 2
+    assert {"database", "vectors", "originals"} <= set(phases)
+    assert [s["name"] for s in list_snapshots()] == [manifest["name"]]
+
+    # Diverge: drop a file everywhere and add another
+    rag._collection.delete(where={"file_id": "fa"})
+    (uploads / "pdfs" / "fa.pdf").unlink()
+    rag.persist_chunks("fc", "s1", ["gamma"])
+    (uploads / "pdfs" / "fc.pdf").write_bytes(b"%PDF-c")
+    _db(db_file, ["fb", "fc"])
+    rag.memory_collection().delete(ids=["s1:fact:1"])
+    rag.upsert_memory(["s1:fact:2"], ["likes gamma"], [{"session_id": "s1", "memory_type": "fact"}])
+
+    calls = embedder.calls
+    result = restore_snapshot(tmp_path / "snapshots" / manifest["name"], rag=rag, db_url=db_url, uploads_dir=uploads)
+    assert result["vectors"] == 4
+    assert embedder.calls == calls
+    assert _ids(rag) == ["fa:0", "fa:1", "fb:0"]
+    assert sorted(rag.memory_collection().get()["ids"]) == ["s1:fact:1"]
+    assert rag.query("alpha one", top_k=1, where={"file_id": "fa"})[0]["score"] > 0.99
+    assert sorted(p.name for p in (uploads / "pdfs").iterdir()) == ["fa.pdf", "fb.pdf"]
+    with sqlite3.connect(str(db_file)) as conn:
+        assert sorted(r[0] for r in conn.execute("SELECT id FROM files")) == ["fa", "fb"]
+
+
+def test_compaction_reclaims_deleted_rows(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    monkeypatch.setenv("VECTOR_COMPACT_DEAD_RATIO", "1.0")
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    rag.persist_chunks("fa", "s1", [f"chunk {i}" for i in range(10)])
+    rag.persist_chunks("fb", "s1", ["keep me"])
+    rag._collection.delete(where={"file_id": "fa"})
+
+    out = compact_vectors(rag=rag)
+    assert out["collections"]["documents"] == {"rows_before": 11, "rows_after": 1}
+    assert _ids(rag) == ["fb:0"]
+    assert out["memory"] == {"rows_before": 0, "rows_after": 0}
+
+
+def test_snapshot_is_point_in_time_while_writers_continue(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    db_file = tmp_path / "app.db"
+    _db(db_file, ["fa", "fb"])
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    rag.persist_chunks("fa", "s1", ["alpha one"])
+
+    # A chunk written while the DB is being copied must wait for the vector
+    # copy to finish, so it shows up in neither the DB nor the vector copy
+    writer = threading.Thread(target=lambda: rag.persist_chunks("fb", "s1", ["late"]))
+    backup = maintenance._backup_sqlite
+
+    def slow_backup(src, dest):
+        writer.start()
+        writer.join(timeout=0.2)
+        assert writer.is_alive()
+        backup(src, dest)
+
+    monkeypatch.setattr(maintenance, "_backup_sqlite", slow_backup)
+    manifest = create_snapshot(tmp_path / "snap", rag=rag, db_url=f"sqlite:///{db_file}", uploads_dir=tmp_path / "uploads")
+    writer.join()
+    assert manifest["vectors"] == 1
+    assert _ids(rag) == ["fa:0", "fb:0"]
+    assert not (tmp_path / "snap" / "frozen").exists()
+
+
+def test_maintenance_mode_waits_for_requests_in_every_worker(monkeypatch, tmp_path):
+    monkeypatch.setenv("MAINTENANCE_DRAIN_SECONDS", "0.2")
+    # A second gate on the same lock file stands in for another worker process
+    other = RequestGate(tmp_path / "maintenance.lock")
+    assert other.enter() is None
+    with pytest.raises(RuntimeError):
+        with maintenance_mode("restore"):
+            pass
+    other.leave()
+
+    with maintenance_mode("restore"):
+        assert other.enter() == "restore"
+    assert other.enter() is None
+    other.leave()
+
+
+@pytest.mark.asyncio
+async def test_api_answers_503_during_maintenance_except_admin():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        with maintenance_mode("restoring snapshot x"):
+            resp = await client.get("/api/sessions")
+            assert resp.status_code == 503
+            assert "restoring snapshot x" in resp.json()["detail"]
+            assert (await client.get("/api/admin/jobs")).status_code == 200
+            assert (await client.get("/health")).status_code == 200
+        assert (await client.get("/api/sessions")).status_code == 200
@@ -0,0 +1,66 @@
+import io
+import threading
+import time
+
+from fpdf import FPDF
+from PIL import Image
+
+from app.services.rag import RagService, FakeEmbeddingModel
+
+
+def _scanned_pdf(pages: list[str | None]) -> bytes:
+    """Build a PDF where None entries become image-only (scanned) pages."""
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for text in pages:
+        pdf.add_page()
+        if text is None:
+            buf = io.BytesIO()
+            Image.new("RGB", (120, 60), color=(255, 255, 255)).save(buf, format="PNG")
+            buf.seek(0)
+            pdf.image(buf, x=10, y=10, w=100)
+        else:
+            pdf.multi_cell(0, 10, text=text)
+    return bytes(pdf.output(dest="S"))
+
+
+def test_image_only_pages_are_ocrd_and_merged_in_page_order(monkeypatch, tmp_path):
+    from app.services import ocr as ocr_module
+
+    monkeypatch.setattr(ocr_module.pytesseract, "image_to_string", lambda img, lang=None: "scanned words")
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=4))
+    pdf_bytes = _scanned_pdf(["native first page", None, "native last page"])
+
+    text = rag.parse_pdf(pdf_bytes)
+    assert text.index("native first page") < text.index("scanned words") < text.index("native last page")
+    # Disabling the fallback keeps the previous behavior
+    assert "scanned words" not in rag.parse_pdf(pdf_bytes, ocr_fallback=False)
+
+
+def test_pdf_ocr_keeps_a_bounded_window_of_rendered_pages(monkeypatch, tmp_path):
+    from app.services import rag as rag_module
+
+    monkeypatch.setenv("PDF_OCR_WINDOW", "2")
+    monkeypatch.setenv("PDF_OCR_WORKERS", "4")
+    lock = threading.Lock()
+    state = {"alive": 0, "peak": 0}
+
+    def _render(pdf_bytes, reader, page_indexes, dpi=300):
+        for idx in page_indexes:
+            with lock:
+                state["alive"] += 1
+                state["peak"] = max(state["peak"], state["alive"])
+            yield idx, [b"page"]
+
+    def _ocr(ocr, images):
+        time.sleep(0.01)
+        with lock:
+            state["alive"] -= 1
+        return "ocr text"
+
+    monkeypatch.setattr(rag_module, "_render_pdf_pages", _render)
+    monkeypatch.setattr(rag_module, "_ocr_page_images", _ocr)
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=4))
+    text = rag.parse_pdf(_scanned_pdf([None] * 8))
+    assert text.count("ocr text") == 8
+    assert state["peak"] <= 2
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.services.quantization import QuantizedMatrix, quantize, dequantize, top_k_indices
+
+
+def _unit_rows(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype,ratio", [("float16", 2), ("int8", 3.5)])
+def test_quantized_storage_shrinks_memory(dtype, ratio):
+    vecs = _unit_rows(2000, 384)
+    full = QuantizedMatrix(384, "float32")
+    full.append(vecs)
+    small = QuantizedMatrix(384, dtype)
+    small.append(vecs)
+    assert full.nbytes / small.nbytes >= ratio
+
+
+def test_int8_round_trip_is_close():
+    vecs = _unit_rows(100, 64)
+    codes, scales = quantize(vecs, "int8")
+    assert codes.dtype == np.int8 and scales.dtype == np.float32
+    assert np.max(np.abs(dequantize(codes, scales) - vecs)) < 0.01
+
+
+def test_int8_search_with_rescoring_matches_exact_top_k():
+    vecs = _unit_rows(5000, 128, seed=1)
+    query = vecs[42] + 0.05 * _unit_rows(1, 128, seed=2)[0]
+    exact = top_k_indices(vecs @ query, 10)
+
+    m = QuantizedMatrix(128, "int8")
+    m.append(vecs)
+    rows, scores = m.search(query, 10, rescore_multiplier=4, originals=lambda r: vecs[r])
+    assert rows[0] == 42
+    assert list(rows) == list(exact)
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_search_respects_mask_prefilter():
+    vecs = _unit_rows(50, 16, seed=3)
+    m = QuantizedMatrix(16, "float16")
+    m.append(vecs)
+    mask = np.zeros(50, dtype=bool)
+    mask[[3, 7, 11]] = True
+    rows, _ = m.search(vecs[0], 5, mask=mask)
+    assert set(rows.tolist()) == {3, 7, 11}
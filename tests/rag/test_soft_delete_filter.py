@@ -0,0 +1,79 @@
+import pytest
+
+from app.services.rag import RagService, FakeEmbeddingModel
+
+
+def test_soft_deleted_chunks_are_filtered_before_top_k(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    rag.persist_chunks("fa", "s1", ["alpha one", "alpha two", "alpha three"])
+    rag.persist_chunks("fb", "s1", ["beta one"])
+
+    assert rag.set_file_deleted("fa", True) == 3
+    # top_k=1 would return an fa chunk if deletion were applied after ranking
+    hits = rag.query("alpha one", top_k=1, where={"session_id": "s1"})
+    assert [h["metadata"]["file_id"] for h in hits] == ["fb"]
+    assert {h["metadata"]["file_id"] for h in rag.query("alpha", top_k=5, include_deleted=True)} == {"fa", "fb"}
+
+    rag.set_file_deleted("fa", False)
+    hits = rag.query("alpha one", top_k=1, where={"session_id": "s1"})
+    assert hits[0]["id"] == "fa:0"
+
+
+def test_backfill_flags_legacy_chunks_once(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    vecs = rag._embedder.embed(["old a", "old b"])
+    # Records written before the flag existed carry no is_deleted key
+    rag._collection.add(
+        ids=["fa:0", "fb:0"],
+        documents=["old a", "old b"],
+        metadatas=[{"file_id": "fa", "session_id": "s1"}, {"file_id": "fb", "session_id": "s1"}],
+        embeddings=[list(map(float, v)) for v in vecs],
+    )
+
+    assert rag.ensure_deleted_flags(lambda: ["fb"]) == 2
+    got = rag._collection.get(include=["metadatas"])
+    flags = {m["file_id"]: m["is_deleted"] for m in got["metadatas"]}
+    assert flags == {"fa": False, "fb": True}
+    assert [h["id"] for h in rag.query("old", top_k=5)] == ["fa:0"]
+    assert rag.ensure_deleted_flags(lambda: ["fa"]) == 0
+
+
+def test_vector_epoch_sees_deletes_from_other_workers(monkeypatch, tmp_path):
+    from app.services import rag as rag_module
+    from app.services.version_file import bump_version_file
+
+    version_file = tmp_path / "vectors.version"
+    monkeypatch.setenv("VECTOR_VERSION_FILE", str(version_file))
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    before = rag_module.vector_epoch()
+
+    # Another worker soft-deletes a file: only the shared version file changes here
+    bump_version_file(version_file)
+    seen = rag_module.vector_epoch()
+    assert seen != before and seen[0] == before[0]
+
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    rag.persist_chunks("fa", "s1", ["alpha one"])
+    rag.set_file_deleted("fa", True)
+    assert rag_module.vector_epoch() != seen
+
+
+@pytest.mark.asyncio
+async def test_startup_runs_the_backfill_off_the_chat_path(monkeypatch):
+    from app.main import _startup
+
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    rag = RagService()
+    vecs = rag._embedder.embed(["old a"])
+    rag._collection.add(
+        ids=["fa:0"],
+        documents=["old a"],
+        metadatas=[{"file_id": "fa", "session_id": "s1"}],
+        embeddings=[list(map(float, v)) for v in vecs],
+    )
+
+    await _startup()
+    got = RagService()._collection.get(include=["metadatas"])
+    assert got["metadatas"][0]["is_deleted"] is False
@@ -0,0 +1,109 @@
+import numpy as np
+
+from app.services.vector_index import NumpyVectorCollection
+
+
+def _unit_rows(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _add(coll: NumpyVectorCollection, vecs: np.ndarray, session_of) -> None:
+    ids = [f"f{i % 5}:{i}" for i in range(len(vecs))]
+    metas = [
+        {"file_id": f"f{i % 5}", "session_id": session_of(i), "chunk_index": i, "source_type": "pdf"}
+        for i in range(len(vecs))
+    ]
+    coll.add(ids=ids, documents=[f"doc {i}" for i in range(len(vecs))], metadatas=metas, embeddings=vecs)
+
+
+def test_query_ranks_by_cosine_similarity(tmp_path):
+    vecs = _unit_rows(300, 32)
+    coll = NumpyVectorCollection(tmp_path / "idx")
+    _add(coll, vecs, lambda i: "S1")
+
+    res = coll.query(query_embeddings=vecs[17:18], n_results=5)
+    assert res["ids"][0][0] == "f2:17"
+    assert res["distances"][0][0] < 1e-5
+    expected = np.argsort(-(vecs @ vecs[17]), kind="stable")[:5]
+    assert res["documents"][0] == [f"doc {i}" for i in expected]
+
+
+def test_where_filters_use_indexes_and_operators(tmp_path):
+    vecs = _unit_rows(100, 16, seed=1)
+    coll = NumpyVectorCollection(tmp_path / "idx")
+    _add(coll, vecs, lambda i: "S1" if i < 50 else "GLOBAL")
+
+    res = coll.query(query_embeddings=vecs[70:71], n_results=10, where={"session_id": "S1"})
+    assert all(m["session_id"] == "S1" for m in res["metadatas"][0])
+    assert "f0:70" not in res["ids"][0]
+
+    got = coll.get(where={"$and": [{"file_id": {"$in": ["f1", "f2"]}}, {"chunk_index": {"$lt": 20}}]})
+    assert sorted(m["chunk_index"] for m in got["metadatas"]) == [i for i in range(20) if i % 5 in (1, 2)]
+
+    coll.delete(where={"file_id": "f3"})
+    assert coll.count() == 80
+    assert not coll.get(where={"file_id": "f3"})["ids"]
+
+
+def test_update_merges_metadata_and_reindexes(tmp_path):
+    vecs = _unit_rows(10, 8, seed=2)
+    coll = NumpyVectorCollection(tmp_path / "idx")
+    _add(coll, vecs, lambda i: "S1")
+
+    ids = coll.get(where={"file_id": "f1"})["ids"]
+    coll.update(ids=ids, metadatas=[{"session_id": "S2"} for _ in ids])
+    moved = coll.get(where={"session_id": "S2"})
+    assert sorted(moved["ids"]) == sorted(ids)
+    assert all(m["chunk_index"] is not None for m in moved["metadatas"])
+    assert not set(ids) & set(coll.get(where={"session_id": "S1"})["ids"])
+
+
+def test_persists_and_follows_other_writers(tmp_path):
+    vecs = _unit_rows(40, 8, seed=3)
+    writer = NumpyVectorCollection(tmp_path / "idx")
+    _add(writer, vecs[:20], lambda i: "S1")
+
+    reader = NumpyVectorCollection(tmp_path / "idx")
+    assert reader.count() == 20
+
+    # A second handle on the same directory sees later writes and deletes
+    writer.add(ids=["late"], documents=["late doc"], metadatas=[{"session_id": "S9"}], embeddings=vecs[30:31])
+    writer.delete(ids=["f0:0"])
+    res = reader.query(query_embeddings=vecs[30:31], n_results=1, where={"session_id": "S9"})
+    assert res["ids"][0] == ["late"]
+    assert reader.count() == 20
+    assert np.allclose(reader.get(ids=["late"], include=["embeddings"])["embeddings"][0], vecs[30], atol=1e-6)
+
+
+def test_int8_collection_rescores_with_stored_originals(tmp_path):
+    # Clustered rows score within a few int8 steps of each other, so ranking
+    # on the codes alone reorders the top-k; rescoring must restore exact order
+    base = _unit_rows(1, 64, seed=4)[0]
+    vecs = base + 0.2 * _unit_rows(3000, 64, seed=5)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    query = vecs[10] + 0.01 * _unit_rows(1, 64, seed=6)[0]
+    exact = np.argsort(-(vecs @ (query / np.linalg.norm(query))), kind="stable")[:10]
+
+    coll = NumpyVectorCollection(tmp_path / "idx", dtype="int8")
+    _add(coll, vecs, lambda i: "S1")
+    res = coll.query(query_embeddings=[query], n_results=10)
+    assert [int(i.split(":")[1]) for i in res["ids"][0]] == exact.tolist()
+
+    # Compaction carries the originals into the new generation
+    coll.delete(ids=["f0:0"])
+    coll.compact()
+    reader = NumpyVectorCollection(tmp_path / "idx")
+    res = reader.query(query_embeddings=[query], n_results=9)
+    assert [int(i.split(":")[1]) for i in res["ids"][0]] == [r for r in exact.tolist() if r != 0][:9]
+
+
+def test_int8_collection_can_skip_originals(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_KEEP_ORIGINALS", "false")
+    vecs = _unit_rows(200, 16, seed=7)
+    coll = NumpyVectorCollection(tmp_path / "idx", dtype="int8")
+    _add(coll, vecs, lambda i: "S1")
+    assert not (tmp_path / "idx" / "originals.bin").exists()
+    res = coll.query(query_embeddings=[vecs[3]], n_results=1)
+    assert res["ids"][0] == ["f3:3"]
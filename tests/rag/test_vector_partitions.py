@@ -0,0 +1,74 @@
+from app.services.rag import RagService, FakeEmbeddingModel
+
+
+class _CountingEmbedder(FakeEmbeddingModel):
+    calls: int = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        return super().embed(texts)
+
+
+def _ids(got):
+    ids = got.get("ids", [])
+    return ids[0] if ids and isinstance(ids[0], list) else ids
+
+
+def test_session_partitions_route_and_move_without_reembedding(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    monkeypatch.setenv("VECTOR_PARTITIONS", "true")
+    embedder = _CountingEmbedder(embed_dim=8)
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=embedder)
+
+    rag.persist_chunks("fa", "s1", ["alpha one", "alpha two"])
+    rag.persist_chunks("fb", "s2", ["beta one"])
+    rag.persist_chunks("fg", None, ["global one"])
+    parts = tmp_path / "chroma" / "partitions"
+    assert sorted(p.name for p in parts.iterdir()) == ["GLOBAL", "s1", "s2"]
+
+    hits = rag.query("alpha", top_k=5, where={"session_id": "s1"})
+    assert {h["metadata"]["file_id"] for h in hits} == {"fa"}
+    assert {h["metadata"]["file_id"] for h in rag.query("one", top_k=10)} == {"fa", "fb", "fg"}
+    assert len(_ids(rag._collection.get(where={"file_id": "fa"}))) == 2
+
+    calls = embedder.calls
+    rag.reassign_file("fa", "s2")
+    assert embedder.calls == calls
+    assert not _ids(rag._collection.get(where={"session_id": "s1"}))
+    moved = rag._collection.get(where={"file_id": "fa"}, include=["metadatas"])
+    assert all(m["session_id"] == "s2" for m in moved["metadatas"])
+    hits = rag.query("alpha one", top_k=1, where={"session_id": "s2"})
+    assert hits and hits[0]["id"] == "fa:0" and hits[0]["score"] > 0.99
+
+    rag.drop_session("s2")
+    assert sorted(p.name for p in parts.iterdir()) == ["GLOBAL", "s1"]
+    assert rag.query("alpha", top_k=5, where={"session_id": "s2"}) == []
+    assert _ids(rag._collection.get(where={"file_id": "fg"})) == ["fg:0"]
+
+
+def test_update_routes_by_session_metadata(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "NUMPY")
+    monkeypatch.setenv("VECTOR_PARTITIONS", "true")
+    rag = RagService(chroma_path=tmp_path / "chroma", embedder=FakeEmbeddingModel(embed_dim=8))
+    rag.persist_chunks("fa", "s1", ["alpha one"])
+    rag.persist_chunks("fb", "s2", ["beta one"])
+    rag.persist_chunks("fg", None, ["global one"])
+
+    coll = rag._collection
+    opened: list[str] = []
+    open_partition = coll._open
+
+    def _tracking_open(key, create):
+        opened.append(key)
+        return open_partition(key, create)
+
+    monkeypatch.setattr(coll, "_open", _tracking_open)
+    coll.update(ids=["fa:0"], metadatas=[{"session_id": "s1", "file_name": "again.pdf"}])
+    assert opened == ["s1"]
+    got = coll.get(where={"file_id": "fa"}, include=["metadatas"])
+    assert got["metadatas"][0]["file_name"] == "again.pdf"
+
+    # A changed session_id still finds the record and moves it
+    coll.update(ids=["fa:0"], metadatas=[{"session_id": "s2"}])
+    assert sorted(_ids(coll.get(where={"session_id": "s2"}))) == ["fa:0", "fb:0"]
+    assert not _ids(coll.get(where={"session_id": "s1"}))
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+class _StubWhisperModel:
+	"""Stands in for faster_whisper.WhisperModel so no weights are downloaded."""
+
+	loads: list = []
+
+	def __init__(self, model_size, **kwargs) -> None:
+		self.model_size = model_size
+		self.kwargs = kwargs
+		_StubWhisperModel.loads.append((model_size, kwargs))
+
+	def transcribe(self, *args, **kwargs):
+		raise AssertionError("transcribe is not stubbed for this test")
+
+
+@pytest.fixture
+def stub_whisper(monkeypatch):
+	from app.services import transcription as tr_module
+
+	monkeypatch.setattr(tr_module.faster_whisper, "WhisperModel", _StubWhisperModel)
+	monkeypatch.setattr(tr_module, "_MODEL_POOL", {})
+	_StubWhisperModel.loads = []
+	return _StubWhisperModel
+
+
+def test_services_share_a_warm_model_from_the_pool(monkeypatch, stub_whisper):
+	from app.services import transcription as tr_module
+
+	monkeypatch.setenv("WHISPER_COMPUTE_TYPE", "int8")
+	a = tr_module.AudioTranscriptionService(model_size="tiny")
+	b = tr_module.AudioTranscriptionService(model_size="tiny")
+	a._ensure_model()
+	b._ensure_model()
+	assert a._model is b._model
+	assert len(stub_whisper.loads) == 1
+	assert stub_whisper.loads[0][1]["compute_type"] == "int8"
+	# A different configuration gets its own pooled instance
+	c = tr_module.AudioTranscriptionService(model_size="tiny", compute_type="float32")
+	c._ensure_model()
+	assert c._model is not a._model
+	assert len(stub_whisper.loads) == 2
+
+
+def test_long_audio_is_split_and_merged_in_order_with_offsets(monkeypatch, stub_whisper):
+	from app.services import transcription as tr_module
+
+	sr = tr_module.SAMPLE_RATE
+	monkeypatch.setenv("WHISPER_NUM_WORKERS", "3")
+	monkeypatch.setenv("WHISPER_PARALLEL_MIN_SECONDS", "10")
+	# 5 minutes of "audio"; plain list supports len() and slicing like an ndarray
+	audio = [0.0] * (sr * 300)
+	windows = [(0, sr * 60), (sr * 100, sr * 150), (sr * 200, sr * 290)]
+	monkeypatch.setattr(tr_module, "_decode_audio", lambda data: audio)
+	monkeypatch.setattr(tr_module, "_speech_windows", lambda a, max_s: windows)
+
+	def _fake_transcribe(self, audio_path_or_bytes, language=None):
+		n = len(audio_path_or_bytes) // sr
+		segs = [
+			SimpleNamespace(text=f"len{n} a", start=0.5, end=1.0),
+			SimpleNamespace(text=f"len{n} b", start=2.0, end=3.0),
+		]
+		return segs, {"language": "en"}
+
+	monkeypatch.setattr(stub_whisper, "transcribe", _fake_transcribe)
+
+	service = tr_module.AudioTranscriptionService(model_size="base")
+	segments = service.transcribe(b"LONG_AUDIO")
+	assert [s["text"] for s in segments] == ["len60 a", "len60 b", "len50 a", "len50 b", "len90 a", "len90 b"]
+	assert [s["start"] for s in segments] == [0.5, 2.0, 100.5, 102.0, 200.5, 202.0]
+	stats = service.last_stats
+	assert stats["windows"] == 3
+	assert stats["audio_seconds"] == pytest.approx(300.0)
+	assert stats["real_time_factor"] is not None and stats["real_time_factor"] >= 0
+	assert stats["language"] == "en"
+
+
+def test_sniff_audio_suffix():
+	from app.services.transcription import sniff_audio_suffix
+
+	assert sniff_audio_suffix(b"RIFF\x00\x00\x00\x00WAVEfmt ") == ".wav"
+	assert sniff_audio_suffix(b"ID3\x04\x00\x00\x00\x00\x00\x00") == ".mp3"
+	assert sniff_audio_suffix(b"fLaC\x00\x00\x00\x22") == ".flac"
+	assert sniff_audio_suffix(b"OggS\x00\x02\x00\x00") == ".ogg"
+	assert sniff_audio_suffix(b"\x00\x00\x00\x20ftypM4A ") == ".m4a"
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from sqlmodel import create_engine
+
+from app.services import summary_scheduler as sched_module
+from app.services.context_manager import ContextManager
+from app.services.summary_scheduler import SummaryScheduler
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_deduplicated_and_debounced_per_session(monkeypatch):
+    calls: list[str] = []
+
+    async def fake_summarize(self, session_id, keep_last_n=10, max_tokens=400, use_llm=True):
+        calls.append(session_id)
+        await asyncio.sleep(0.2)
+        return "summary"
+
+    monkeypatch.setattr(ContextManager, "summarize_and_trim_async", fake_summarize)
+    monkeypatch.setattr(ContextManager, "has_summary_backlog", lambda self, session_id, keep_last_n=10: False)
+    bind = create_engine("sqlite://")
+    scheduler = SummaryScheduler(debounce_seconds=0.05)
+
+    # A burst of turns inside the debounce window collapses into a single run
+    assert scheduler.schedule("s1", bind) is True
+    assert scheduler.schedule("s1", bind) is False
+    assert scheduler.schedule("s1", bind) is False
+    scheduler.schedule("s2", bind)
+    assert scheduler.is_pending("s1")
+    await scheduler.drain()
+    assert calls.count("s1") == 1 and calls.count("s2") == 1
+    assert not scheduler.is_pending("s1")
+
+    # A turn arriving while a run is in progress costs exactly one more pass
+    scheduler.schedule("s1", bind)
+    await asyncio.sleep(0.1)
+    assert scheduler.schedule("s1", bind) is False
+    await scheduler.drain()
+    assert calls.count("s1") == 3
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_does_not_wait_for_the_llm_summary(monkeypatch):
+    import httpx
+
+    from app.main import app
+    from app.services import summarization
+
+    started = asyncio.Event()
+
+    async def slow_summary(self, text, max_tokens=400, context=""):
+        started.set()
+        await asyncio.sleep(30)
+        return "never", True
+
+    monkeypatch.setattr(summarization.SummarizationService, "summarize_with_status", slow_summary)
+    monkeypatch.setattr(sched_module, "_SUMMARY_SCHEDULER_INSTANCE", SummaryScheduler(debounce_seconds=0))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        session_id = (await client.post("/api/sessions", json={"name": "Background"})).json()["id"]
+        msgs = [{"role": "user", "content": "Favorite color: blue"}] + [
+            {"role": "user", "content": f"Filler message {i}"} for i in range(41)
+        ]
+        resp = await asyncio.wait_for(client.post("/api/chat", json={"session_id": session_id, "messages": msgs}), 10)
+        assert resp.status_code == 200
+        assert ": MEMORY_DEBUG " in resp.text
+        summary = (await client.get("/api/context/summary", params={"session_id": session_id})).json()["summary"]
+        assert "blue" in summary.lower()
+    sched_module.get_summary_scheduler().cancel_all()
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.session import MessageModel, SessionModel
+from app.services.context_manager import ContextManager
+
+
+def _message_updates(engine) -> list[str]:
+    seen: list[str] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        if statement.lstrip().upper().startswith("UPDATE MESSAGES"):
+            seen.append(statement)
+
+    return seen
+
+
+def _trimmed_ids(db: Session, sid: str) -> list[int]:
+    return list(
+        db.exec(
+            select(MessageModel.id).where(MessageModel.session_id == sid, MessageModel.is_trimmed == True)  # noqa: E712
+        ).all()
+    )
+
+
+@pytest.mark.asyncio
+async def test_trim_and_restore_are_single_range_updates():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    updates = _message_updates(engine)
+    with Session(engine) as db:
+        session = SessionModel(name="Huge")
+        db.add(session)
+        db.commit()
+        sid = session.id
+        db.add_all([MessageModel(session_id=sid, role="user", content=f"m{i}") for i in range(500)])
+        db.commit()
+        ids = sorted(db.exec(select(MessageModel.id).where(MessageModel.session_id == sid)).all())
+
+        cm = ContextManager(db)
+        await cm.summarize_and_trim_async(sid, keep_last_n=10, use_llm=False)
+        assert len(updates) == 1
+        assert _trimmed_ids(db, sid) == ids[:490]
+        assert db.get(SessionModel, sid).metadata_json["trimmed_watermark"] == ids[489]
+
+        updates.clear()
+        assert cm.restore_trimmed(sid, 5) == 5
+        assert len(updates) == 1
+        assert _trimmed_ids(db, sid) == ids[:485]
+        assert db.get(SessionModel, sid).metadata_json["trimmed_watermark"] == ids[485] - 1
+
+        # Restoring lowers the watermark, so the next trim covers the restored messages again
+        db.add_all([MessageModel(session_id=sid, role="user", content=f"n{i}") for i in range(3)])
+        db.commit()
+        updates.clear()
+        await cm.summarize_and_trim_async(sid, keep_last_n=10, use_llm=False)
+        assert len(updates) == 1
+        assert _trimmed_ids(db, sid) == ids[:493]
+
+        assert cm.restore_range(sid, ids[10], ids[19]) == 10
+        assert len(_trimmed_ids(db, sid)) == 483
+        assert db.get(SessionModel, sid).metadata_json["trimmed_watermark"] == ids[10] - 1
+        assert cm.restore_trimmed(sid, 10_000) == 483
+        assert _trimmed_ids(db, sid) == []
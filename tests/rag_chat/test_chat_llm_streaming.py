@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services import llm_backend
+from app.services.llm_standin import create_standin_app
+
+
+@pytest.mark.asyncio
+async def test_chat_streams_backend_tokens_and_persists_reply(monkeypatch):
+    standin = create_standin_app(tokens=["Streamed", " reply", " here"])
+    standin_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=standin), base_url="http://standin")
+    monkeypatch.setenv("LLM_BACKEND", "OLLAMA")
+    monkeypatch.setenv("LLM_BASE_URL", "http://standin")
+    monkeypatch.setenv("LLM_MODEL", "standin-model")
+    monkeypatch.setattr(llm_backend, "get_http_client", lambda: standin_client)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        session_id = (await client.post("/api/sessions", json={"name": "LLM"})).json()["id"]
+        await client.post(f"/api/settings/session/{session_id}", json={"temperature": 0.2, "max_tokens": 32})
+
+        tokens: list[str] = []
+        llm_debug = None
+        prompt_debug = None
+        async with client.stream(
+            "POST", "/api/chat", json={"session_id": session_id, "messages": [{"role": "user", "content": "Hi"}]}
+        ) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    tokens.append(line[len("data: "):])
+                elif line.startswith(": PROMPT_DEBUG "):
+                    prompt_debug = json.loads(line[len(": PROMPT_DEBUG "):])
+                elif line.startswith(": LLM_DEBUG "):
+                    llm_debug = json.loads(line[len(": LLM_DEBUG "):])
+
+        assert tokens == ["Streamed", " reply", " here"]
+        assert llm_debug["backend"] == "ollama" and llm_debug["tokens"] == 3
+        assert llm_debug["ttft_ms"] is not None
+        assert prompt_debug["prefix_tokens"] > 0 and "personality" in prompt_debug["sections"]
+
+        _, sent = standin.state.requests[-1]
+        assert sent["model"] == "standin-model"
+        assert sent["options"]["temperature"] == 0.2 and sent["options"]["num_predict"] == 32
+        assert sent["messages"][-1] == {"role": "user", "content": "Hi"}
+
+        messages = (await client.get(f"/api/sessions/{session_id}")).json()["messages"]
+        assert messages[-1]["role"] == "assistant"
+        assert messages[-1]["content"] == "Streamed reply here"
+    await standin_client.aclose()
+
+
+class SlowBackend(llm_backend.LlmBackend):
+    """Stand-in model that keeps streaming for far longer than the client stays."""
+
+    name = "slow"
+
+    def __init__(self) -> None:
+        super().__init__("slow-model")
+        self.closed = asyncio.Event()
+
+    async def stream(self, messages, settings):  # noqa: ANN001
+        try:
+            for i in range(1000):
+                await asyncio.sleep(0.02)
+                yield f"tok{i} "
+        finally:
+            self.closed.set()
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_mid_generation_keeps_partial_reply(monkeypatch):
+    from app.api import chat as chat_module
+    from app.services.metrics import get_metrics
+
+    backend = SlowBackend()
+    monkeypatch.setattr(chat_module, "get_llm_backend_instance", lambda: backend)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        session_id = (await client.post("/api/sessions", json={"name": "Gone"})).json()["id"]
+
+    # httpx's ASGI transport buffers whole responses, so drive the app directly
+    # and report a disconnect once a few tokens have gone out
+    body = json.dumps({"session_id": session_id, "messages": [{"role": "user", "content": "Hi"}]}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    gone = asyncio.Event()
+    request_sent = False
+    tokens = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal tokens
+        if message["type"] == "http.response.body" and message.get("body", b"").startswith(b"data: "):
+            tokens += 1
+            if tokens == 3:
+                gone.set()
+
+    before = get_metrics().snapshot()["counters"].get("chat_cancelled_total", 0)
+    await asyncio.wait_for(app(scope, receive, send), timeout=10)
+
+    assert backend.closed.is_set()
+    assert get_metrics().snapshot()["counters"]["chat_cancelled_total"] == before + 1
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        messages = (await client.get(f"/api/sessions/{session_id}")).json()["messages"]
+    reply = messages[-1]
+    assert reply["role"] == "assistant"
+    assert reply["content"].startswith("tok0 tok1 tok2") and "tok999" not in reply["content"]
@@ -115,3 +115,39 @@ async def test_chat_skips_rag_for_short_query_with_high_threshold(monkeypatch):
         assert debug.get("used") is False
 
 
+
+
+@pytest.mark.asyncio
+async def test_chat_uses_rag_context_with_debug_mode_off(monkeypatch):
+    monkeypatch.setenv("RAG_DEBUG_MODE", "false")
+    monkeypatch.setenv("RAG_SIMILARITY_THRESHOLD", "0.0")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        create_resp = await client.post("/api/sessions", json={"name": "RAG Without Debug"})
+        assert create_resp.status_code == 201
+        session_id = create_resp.json()["id"]
+
+        pdf_bytes = _pdf_bytes("Session-linked PDF content for the retrieval without debug test.")
+        files = {"file": ("doc1.pdf", pdf_bytes, "application/pdf")}
+        up = await client.post("/api/files", files=files, data={"session_id": session_id})
+        assert up.status_code == 201
+
+        payload = {
+            "session_id": session_id,
+            "messages": [{"role": "user", "content": "Please summarize the content"}],
+        }
+
+        rag_lines: list[str] = []
+        prompt_debug: dict | None = None
+        async with client.stream("POST", "/api/chat", json=payload) as response:
+            assert response.status_code == 200
+            async for line in response.aiter_lines():
+                if line.startswith(": RAG_DEBUG "):
+                    rag_lines.append(line)
+                elif line.startswith(": PROMPT_DEBUG "):
+                    prompt_debug = json.loads(line[len(": PROMPT_DEBUG "):])
+
+        # The flag only hides the debug line; retrieved chunks still reach the prompt
+        assert rag_lines == []
+        assert prompt_debug is not None
+        assert "context" in prompt_debug["sections"]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.db import ensure_indexes
+from app.models.settings import KnowledgeEntryModel
+from app.services.context_manager import ContextManager
+from app.services.rag import RagService
+
+
+VOCAB = ["favorite", "color", "blue", "city", "warsaw", "name", "alice", "dog", "rex", "live"]
+
+
+class WordEmbedder:
+    """Bag-of-words vectors so relevance is predictable in tests."""
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(":", " ").replace("?", " ").split():
+                if word in VOCAB:
+                    out[row, VOCAB.index(word)] += 1.0
+        return out
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_upsert_keeps_one_entry_per_normalized_key(tmp_path):
+    with Session(_engine()) as db:
+        cm = ContextManager(db, rag=RagService(embedder=WordEmbedder()))
+        assert cm.upsert_knowledge("s1", [("Favorite color", "blue", 1), ("City", "Warsaw", 2)]) == [
+            ("Favorite color", "blue"),
+            ("City", "Warsaw"),
+        ]
+        # Re-capturing the same facts writes nothing
+        assert cm.upsert_knowledge("s1", [("favorite  color ", "blue", 3), ("City", "Warsaw", 4)]) == []
+        # A changed value updates the existing entry in place
+        assert cm.upsert_knowledge("s1", [("FAVORITE COLOR", "green", 5)]) == [("Favorite color", "green")]
+
+        rows = db.exec(select(KnowledgeEntryModel).where(KnowledgeEntryModel.session_id == "s1")).all()
+        assert sorted((r.key, r.value) for r in rows) == [("City", "Warsaw"), ("Favorite color", "green")]
+        assert [f"{e.key}: {e.value}" for e in cm.list_knowledge("s1")][0] == "Favorite color: green"
+
+
+def test_unique_index_migration_drops_duplicates():
+    engine = _engine()
+    with Session(engine) as db:
+        for value in ("red", "green", "blue"):
+            db.add(KnowledgeEntryModel(session_id="s1", key="Favorite color", value=value))
+        db.add(KnowledgeEntryModel(session_id="s2", key="favorite color", value="pink"))
+        db.add(KnowledgeEntryModel(session_id="s3", key="Żona", value="Anna"))
+        db.add(KnowledgeEntryModel(session_id="s3", key="ŻONA", value="Ewa"))
+        db.commit()
+    ensure_indexes(engine)
+    with Session(engine) as db:
+        rows = db.exec(select(KnowledgeEntryModel).order_by(KnowledgeEntryModel.session_id)).all()
+        assert [(r.session_id, r.value) for r in rows] == [("s1", "blue"), ("s2", "pink"), ("s3", "Ewa")]
+    with pytest.raises(IntegrityError):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO knowledgeentrymodel (session_id, key, value, created_at, norm_key) "
+                "VALUES ('s1', ' FAVORITE color', 'grey', '2024-01-01 00:00:00', 'favorite color')"
+            )
+
+
+def test_non_ascii_keys_update_in_place():
+    engine = _engine()
+    with Session(engine) as db:
+        cm = ContextManager(db, rag=RagService(embedder=WordEmbedder()))
+        assert cm.upsert_knowledge("s1", [("Żona", "Anna", 1)]) == [("Żona", "Anna")]
+        assert cm.upsert_knowledge("s1", [("ŻONA", "Ewa", 2)]) == [("Żona", "Ewa")]
+        rows = db.exec(select(KnowledgeEntryModel).where(KnowledgeEntryModel.session_id == "s1")).all()
+        assert [(r.key, r.value) for r in rows] == [("Żona", "Ewa")]
+
+
+def test_relevant_facts_are_ranked_for_the_question_under_budget():
+    with Session(_engine()) as db:
+        cm = ContextManager(db, rag=RagService(embedder=WordEmbedder()))
+        cm.upsert_knowledge(
+            "s1",
+            [("Name", "Alice", 1), ("Favorite color", "blue", 2), ("City", "Warsaw", 3), ("Dog", "Rex", 4)],
+        )
+        cm.upsert_knowledge("other", [("Favorite color", "red", 5)])
+
+        facts = cm.relevant_knowledge("s1", "What is my favorite color?", budget_tokens=100)
+        assert facts[0] == "Favorite color: blue"
+        assert "Favorite color: red" not in facts
+        # A tight budget keeps only the best match
+        assert cm.relevant_knowledge("s1", "What is my favorite color?", budget_tokens=3) == ["Favorite color: blue"]
+        # Updated values replace the stored vector record
+        cm.upsert_knowledge("s1", [("favorite color", "green", 6)])
+        assert cm.relevant_knowledge("s1", "favorite color", budget_tokens=3) == ["Favorite color: green"]
@@ -0,0 +1,130 @@
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.memory_artifacts import MemoryArtifactService, MemoryItem
+from app.services.rag import RagService
+
+
+VOCAB = ["trip", "japan", "flight", "hotel", "kyoto", "budget", "dog", "rex", "weather", "rain"]
+
+
+class WordEmbedder:
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(":", " ").replace("?", " ").replace(".", " ").split():
+                if word in VOCAB:
+                    out[row, VOCAB.index(word)] += 1.0
+        return out
+
+
+def _service() -> tuple[MemoryArtifactService, list[dict]]:
+    rag = RagService(embedder=WordEmbedder())
+    queries: list[dict] = []
+    original = rag.query_memory
+
+    def counting(text, top_k=5, where=None):  # noqa: ANN001
+        queries.append(where)
+        return original(text, top_k=top_k, where=where)
+
+    rag.query_memory = counting  # type: ignore[method-assign]
+    return MemoryArtifactService(rag), queries
+
+
+def test_all_kinds_come_back_from_one_scoped_query_within_budget():
+    svc, queries = _service()
+    svc.put_summaries(
+        "s1",
+        [
+            {"level": 1, "first_id": 1, "last_id": 40, "text": "Planned a trip to Japan with a flight in May."},
+            {"level": 0, "first_id": 41, "last_id": 50, "text": "Talked about the dog Rex."},
+        ],
+    )
+    svc.put_facts("s1", [("Hotel", "Kyoto ryokan"), ("Dog", "Rex")])
+    svc.put_tools("s1", "japan weather", [{"title": "Kyoto weather", "url": "https://w.example/kyoto", "snippet": "Rain in Kyoto"}])
+    svc.put_facts("s2", [("Trip", "Japan flight hotel")])
+
+    bundle = svc.retrieve(
+        "s1",
+        "What about the Japan trip flight and the Kyoto hotel weather?",
+        budget_tokens=40,
+        pinned=[MemoryItem("summary", "Talked about the dog Rex.")],
+    )
+    assert len(queries) == 1
+    assert bundle.items[0].text == "Talked about the dog Rex."
+    assert "Planned a trip to Japan with a flight in May." in bundle.texts("summary")
+    assert "Hotel: Kyoto ryokan" in bundle.texts("facts")
+    assert bundle.texts("tools") == ["Kyoto weather: Rain in Kyoto"]
+    # Other sessions never leak in, and the pinned summary is not repeated
+    assert all("Japan flight hotel" not in item.text for item in bundle.items)
+    assert bundle.texts("summary").count("Talked about the dog Rex.") == 1
+    assert bundle.tokens <= 40
+
+    tight = svc.retrieve("s1", "Japan trip flight", budget_tokens=6, pinned=[MemoryItem("summary", "word " * 50)])
+    assert tight.tokens <= 6 and [i.memory_type for i in tight.items] == ["summary"]
+
+
+def test_summary_artifacts_follow_the_current_segments():
+    svc, _ = _service()
+    svc.put_summaries("s1", [{"level": 0, "first_id": i, "last_id": i, "text": f"trip part {i}"} for i in range(1, 4)])
+    svc.put_summaries("s1", [{"level": 1, "first_id": 1, "last_id": 4, "text": "whole trip"}])
+    bundle = svc.retrieve("s1", "trip", budget_tokens=100)
+    assert bundle.texts("summary") == ["whole trip"]
+
+
+@pytest.mark.asyncio
+async def test_chat_memory_stays_within_the_per_turn_budget(monkeypatch):
+    from app.main import app
+
+    monkeypatch.setenv("RAG_DEBUG_MODE", "true")
+    monkeypatch.setenv("RAG_PER_TURN_MEMORY_BUDGET_TOKENS", "6")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        session_id = (await client.post("/api/sessions", json={"name": "Budget"})).json()["id"]
+        msgs = [{"role": "user", "content": f"Fact {i}: a fairly long value number {i}"} for i in range(45)]
+        resp = await client.post("/api/chat", json={"session_id": session_id, "messages": msgs})
+        assert resp.status_code == 200
+        line = next(l for l in resp.text.splitlines() if l.startswith(": MEMORY_DEBUG "))
+        md = json.loads(line[len(": MEMORY_DEBUG "):])
+        assert md["summary_included"] is True
+        assert md["tokens"] <= 6 and md["budget"] == 6 and md["budget_ok"] is True
+        assert set(md["summary_cache"]) >= {"hits", "misses", "stores"}
+
+
+@pytest.mark.asyncio
+async def test_rolling_summary_embeds_memory_off_the_event_loop(monkeypatch):
+    import threading
+
+    from sqlmodel import Session, SQLModel, create_engine
+
+    from app.models.session import MessageModel, SessionModel
+    from app.services import context_manager as cm_module
+    from app.services.context_manager import ContextManager
+    from app.services.summarization import CircuitBreaker, SummarizationService
+
+    threads: list[threading.Thread] = []
+
+    class ThreadRecordingEmbedder(WordEmbedder):
+        def embed(self, texts: list[str]) -> np.ndarray:
+            threads.append(threading.current_thread())
+            return super().embed(texts)
+
+    monkeypatch.setattr(cm_module, "get_summarization_service", lambda: SummarizationService(backend=None, breaker=CircuitBreaker()))
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        session = SessionModel(name="Loop")
+        db.add(session)
+        db.commit()
+        for i in range(30):
+            db.add(MessageModel(session_id=session.id, role="user", content=f"Hotel {i}: Kyoto ryokan {i}"))
+        db.commit()
+        cm = ContextManager(db, rag=RagService(embedder=ThreadRecordingEmbedder()))
+        await cm.summarize_and_trim_async(session.id, keep_last_n=10)
+
+    # Both the facts and the summary segments were embedded, never on the loop thread
+    assert len(threads) >= 2
+    assert threading.main_thread() not in threads
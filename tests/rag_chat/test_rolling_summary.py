@@ -0,0 +1,116 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models.session import MessageModel, SessionModel
+from app.services import summarization
+from app.services.context_manager import ContextManager
+
+
+@pytest.mark.asyncio
+async def test_summary_folds_only_new_messages_in_bounded_chunks(monkeypatch):
+    monkeypatch.setenv("SUMMARY_CHUNK_CHARS", "500")
+    calls: list[tuple[str, str]] = []
+
+    async def fake_summarize(self, text, max_tokens=400, context=""):
+        calls.append((text, context))
+        return f"S{len(calls)}", True
+
+    monkeypatch.setattr(summarization.SummarizationService, "summarize_with_status", fake_summarize)
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        session = SessionModel(name="Long")
+        db.add(session)
+        db.commit()
+        sid = session.id
+        for i in range(50):
+            db.add(MessageModel(session_id=sid, role="user", content=f"message {i:03d} " + "x" * 88))
+        db.commit()
+
+        cm = ContextManager(db)
+        runs = 0
+        while True:
+            await cm.summarize_and_trim_async(sid, keep_last_n=10)
+            runs += 1
+            if not cm.has_summary_backlog(sid, keep_last_n=10):
+                break
+        # 40 older messages of ~100 chars at 500 chars per run
+        assert runs == 8
+        chunk_texts = [text for text, _ in calls if text.startswith("message")]
+        assert len(chunk_texts) == 8
+        assert all(len(text) <= 500 for text in chunk_texts)
+        # Every run after the first sees the summary so far as context
+        assert all(context for text, context in calls[1:] if text.startswith("message"))
+
+        meta = db.get(SessionModel, sid).metadata_json
+        levels = [s["level"] for s in meta["summary_segments"]]
+        # Eight chunk summaries with fanout 4 collapse into two level-1 segments
+        assert levels == [1, 1]
+        assert meta["last_summary"] == "\n".join(s["text"] for s in meta["summary_segments"])
+
+        # New turns only cost a summary of what arrived since the watermark
+        for i in range(5):
+            db.add(MessageModel(session_id=sid, role="user", content=f"later {i}"))
+        db.commit()
+        calls.clear()
+        await cm.summarize_and_trim_async(sid, keep_last_n=10)
+        assert len(calls) == 1
+        # The five turns that just left the verbatim window, nothing older
+        assert calls[0][0].startswith("message 040") and "message 039" not in calls[0][0]
+        assert calls[0][0].count("\n") == 4
+
+
+@pytest.mark.asyncio
+async def test_heuristic_summary_does_not_advance_the_watermark():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        session = SessionModel(name="Quick")
+        db.add(session)
+        db.commit()
+        sid = session.id
+        db.add(MessageModel(session_id=sid, role="user", content="Favorite color: blue"))
+        for i in range(20):
+            db.add(MessageModel(session_id=sid, role="user", content=f"Filler {i}"))
+        db.commit()
+
+        cm = ContextManager(db)
+        summary = await cm.summarize_and_trim_async(sid, keep_last_n=10, use_llm=False)
+        assert "Favorite color: blue" in summary
+        assert cm.has_summary_backlog(sid, keep_last_n=10)
+        assert "summary_watermark" not in db.get(SessionModel, sid).metadata_json
+
+
+@pytest.mark.asyncio
+async def test_llm_runs_only_trim_what_the_summary_covers(monkeypatch):
+    monkeypatch.setenv("SUMMARY_CHUNK_CHARS", "500")
+
+    async def fake_summarize(self, text, max_tokens=400, context=""):
+        return "S", True
+
+    monkeypatch.setattr(summarization.SummarizationService, "summarize_with_status", fake_summarize)
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        session = SessionModel(name="Gap")
+        db.add(session)
+        db.commit()
+        sid = session.id
+        for i in range(30):
+            db.add(MessageModel(session_id=sid, role="user", content=f"message {i:03d} " + "x" * 88))
+        db.commit()
+
+        def untrimmed() -> list[int]:
+            rows = db.exec(select(MessageModel).where(MessageModel.session_id == sid)).all()
+            return sorted(m.id for m in rows if not m.is_trimmed)
+
+        cm = ContextManager(db)
+        await cm.summarize_and_trim_async(sid, keep_last_n=10)
+        watermark = db.get(SessionModel, sid).metadata_json["summary_watermark"]
+        # The first chunk is summarized and trimmed; the rest of the older history stays verbatim
+        assert watermark == 5
+        assert untrimmed() == list(range(watermark + 1, 31))
+
+        while cm.has_summary_backlog(sid, keep_last_n=10):
+            await cm.summarize_and_trim_async(sid, keep_last_n=10)
+        assert untrimmed() == list(range(21, 31))
@@ -0,0 +1,119 @@
+import httpx
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.db import get_session
+from app.main import app
+
+from app.models.session import MessageModel, SessionModel
+from app.services import context_manager as cm_module
+from app.services import summary_cache
+from app.services.context_manager import ContextManager
+from app.services.llm_backend import LlmBackend
+from app.services.summarization import CircuitBreaker, SummarizationService
+from app.services.summary_cache import SummaryCache
+
+
+class CountingBackend(LlmBackend):
+    def __init__(self) -> None:
+        super().__init__("sum-model")
+        self.calls = 0
+
+    async def stream(self, messages, settings):  # noqa: ANN001
+        self.calls += 1
+        yield f"- summary {self.calls}"
+
+
+def _session(db: Session, n: int) -> str:
+    session = SessionModel(name="Cache")
+    db.add(session)
+    db.commit()
+    for i in range(n):
+        db.add(MessageModel(session_id=session.id, role="user", content=f"message {i}"))
+    db.commit()
+    return session.id
+
+
+@pytest.fixture
+def shared_engine(tmp_path):
+    # The API and the test read and write the same database
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+
+    def _override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = _override
+    yield engine
+    app.dependency_overrides.pop(get_session, None)
+
+
+async def _restore(sid: str, from_id: int) -> int:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        resp = await client.post("/api/context/restore", json={"session_id": sid, "from_id": from_id})
+    assert resp.status_code == 200
+    return resp.json()["restored"]
+
+
+def _trimmed(db: Session, sid: str) -> list[int]:
+    db.expire_all()
+    return list(
+        db.exec(
+            select(MessageModel.id).where(MessageModel.session_id == sid, MessageModel.is_trimmed == True)  # noqa: E712
+        ).all()
+    )
+
+
+@pytest.mark.asyncio
+async def test_same_message_range_is_summarized_once(monkeypatch, shared_engine):
+    backend = CountingBackend()
+    svc = SummarizationService(backend=backend, breaker=CircuitBreaker())
+    monkeypatch.setattr(cm_module, "get_summarization_service", lambda: svc)
+    with Session(shared_engine) as db:
+        sid = _session(db, 30)
+        cm = ContextManager(db)
+        first = await cm.summarize_and_trim_async(sid, keep_last_n=10)
+        assert first == "- summary 1" and backend.calls == 1
+        assert _trimmed(db, sid) == list(range(1, 21))
+
+        # Restoring part of the summarized range rewinds the summary to before it
+        assert await _restore(sid, 5) == 16
+        meta = db.get(SessionModel, sid).metadata_json
+        assert meta["summary_segments"] == [] and meta["summary_watermark"] == 0
+        assert meta["trimmed_watermark"] == 4 and meta["last_summary"] == ""
+
+        # Summarizing and trimming the same range again reuses the stored output,
+        # also after the in-process LRU is gone (the file store persists it)
+        summary_cache._MEMORY_CACHE.clear()
+        before = SummaryCache.stats()
+        assert await cm.summarize_and_trim_async(sid, keep_last_n=10) == first
+        assert backend.calls == 1
+        assert SummaryCache.stats()["hits"] == before["hits"] + 1
+        assert _trimmed(db, sid) == list(range(1, 21))
+
+        # A different max_tokens or edited content is a different fingerprint
+        assert await _restore(sid, 1) == 20
+        db.expire_all()
+        await cm.summarize_and_trim_async(sid, keep_last_n=10, max_tokens=200)
+        assert backend.calls == 2
+        msg = db.get(MessageModel, 5)
+        msg.content = "message 5 (edited)"
+        db.add(msg)
+        db.commit()
+        assert await _restore(sid, 1) == 20
+        db.expire_all()
+        await cm.summarize_and_trim_async(sid, keep_last_n=10)
+        assert backend.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_fallback_summaries_are_not_cached():
+    cache = SummaryCache()
+    svc = SummarizationService(backend=None, breaker=CircuitBreaker())
+    stores = SummaryCache.stats()["stores"]
+    out = await ContextManager._summarize_cached(svc, "chunk", [(1, "hello there")], "hello there", 50)
+    assert out == "hello there"
+    assert SummaryCache.stats()["stores"] == stores
+    assert cache.get(cache.fingerprint("chunk", [(1, "hello there")], svc.model_id, 50)) is None
@@ -0,0 +1,78 @@
+import io
+
+from PIL import Image, ImageDraw
+
+
+def _image_bytes(size=(300, 100), fmt="PNG", text="Hello") -> bytes:
+    img = Image.new("RGB", size, color=(255, 255, 255))
+    d = ImageDraw.Draw(img)
+    d.text((10, 10), text, fill=(0, 0, 0))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_ocr_results_are_cached_by_image_hash(monkeypatch, tmp_path):
+    from app.services import ocr as ocr_module
+
+    calls: list[tuple] = []
+
+    def _fake(img, lang=None):
+        calls.append(img.size)
+        return "cached text"
+
+    monkeypatch.setattr(ocr_module.pytesseract, "image_to_string", _fake)
+    data = _image_bytes()
+    svc = ocr_module.OcrService(cache_dir=tmp_path / "ocr")
+    assert svc.extract_text(data) == "cached text"
+    assert svc.last_timings["cache_hit"] is False
+    for stage in ("decode_ms", "preprocess_ms", "recognize_ms", "total_ms"):
+        assert stage in svc.last_timings
+    assert svc.extract_text(data) == "cached text"
+    assert svc.last_timings["cache_hit"] is True
+    assert len(calls) == 1
+
+    # Persistent cache survives the in-memory cache being dropped
+    ocr_module._MEMORY_CACHE.clear()
+    svc2 = ocr_module.OcrService(cache_dir=tmp_path / "ocr")
+    assert svc2.extract_text(data) == "cached text"
+    assert len(calls) == 1
+
+
+def test_tall_images_are_tiled_and_overlap_lines_deduplicated(monkeypatch, tmp_path):
+    from app.services import ocr as ocr_module
+
+    bands: list[tuple] = []
+
+    def _fake(img, lang=None):
+        bands.append(img.size)
+        idx = len(bands)
+        # Each band repeats the last line of the previous one (overlap region)
+        return f"line {idx - 1}\nline {idx}" if idx > 1 else "line 1"
+
+    monkeypatch.setattr(ocr_module.pytesseract, "image_to_string", _fake)
+    svc = ocr_module.OcrService(tile_height=1000, tile_overlap=100, max_workers=1, cache_dir=tmp_path / "ocr")
+    text = svc.extract_text(_image_bytes(size=(300, 2500)))
+    assert len(bands) == 3
+    assert all(h <= 1000 for _w, h in bands)
+    assert text.splitlines() == ["line 1", "line 2", "line 3"]
+    assert svc.last_timings["tiles"] == 3
+
+
+def test_multi_page_tiff_is_processed_page_by_page(monkeypatch, tmp_path):
+    from app.services import ocr as ocr_module
+
+    seen: list[int] = []
+
+    def _fake(img, lang=None):
+        seen.append(1)
+        return f"page {len(seen)}"
+
+    monkeypatch.setattr(ocr_module.pytesseract, "image_to_string", _fake)
+    pages = [Image.new("RGB", (200, 80), color=(255, 255, 255)) for _ in range(2)]
+    buf = io.BytesIO()
+    pages[0].save(buf, format="TIFF", save_all=True, append_images=pages[1:])
+    svc = ocr_module.OcrService(max_workers=1, cache_dir=tmp_path / "ocr")
+    text = svc.extract_text(buf.getvalue())
+    assert text == "page 1\n\npage 2"
+    assert svc.last_timings["pages"] == 2
@@ -0,0 +1,88 @@
+import io
+import threading
+import time
+
+import pytest
+import httpx
+from fpdf import FPDF
+from PIL import Image
+
+from app.main import app
+
+
+def _pdf_bytes(text: str) -> bytes:
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.multi_cell(0, 10, text=text)
+    return bytes(pdf.output(dest="S"))
+
+
+def _png_bytes(color: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 32), color=(color, color, color)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_multi_upload_reports_failures_and_batches_embeddings(monkeypatch):
+    from app.services import rag as rag_module
+
+    embed_calls: list[int] = []
+    original_embed = rag_module.FakeEmbeddingModel.embed
+
+    def _counting_embed(self, texts):
+        embed_calls.append(len(texts))
+        return original_embed(self, texts)
+
+    monkeypatch.setattr(rag_module.FakeEmbeddingModel, "embed", _counting_embed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        files = [
+            ("files", ("a.pdf", _pdf_bytes("alpha " * 50), "application/pdf")),
+            ("files", ("notes.txt", b"plain text", "text/plain")),
+            ("files", ("b.pdf", _pdf_bytes("beta " * 50), "application/pdf")),
+            ("files", ("broken.pdf", b"not a pdf", "application/pdf")),
+            ("files", ("c.pdf", _pdf_bytes("gamma " * 50), "application/pdf")),
+        ]
+        up = await client.post("/api/files/upload", files=files)
+        assert up.status_code == 201
+        results = up.json()
+        # One entry per input, in input order
+        assert [r["name"] for r in results] == ["a.pdf", "notes.txt", "b.pdf", "broken.pdf", "c.pdf"]
+        assert [r["status"] for r in results] == ["ok", "error", "ok", "error", "ok"]
+        assert "Unsupported" in results[1]["detail"]
+        assert all(r["id"] and r["chunk_count"] > 0 for r in results if r["status"] == "ok")
+        # Chunks of all three PDFs went through a single embedding call
+        assert len(embed_calls) == 1
+
+        listed = await client.get("/api/files", params={"type": "pdf"})
+        assert {i["name"] for i in listed.json()} == {"a.pdf", "b.pdf", "c.pdf"}
+
+
+@pytest.mark.asyncio
+async def test_multi_upload_bounds_concurrency_per_media_type(monkeypatch):
+    monkeypatch.setenv("INGEST_CONCURRENCY_IMAGE", "2")
+    from app.services import ocr as ocr_module
+
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def _slow_ocr(img, lang=None):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        return "image words"
+
+    monkeypatch.setattr(ocr_module.pytesseract, "image_to_string", _slow_ocr)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        files = [("files", (f"img{i}.png", _png_bytes(200 + i), "image/png")) for i in range(6)]
+        up = await client.post("/api/files/upload", files=files)
+        assert up.status_code == 201
+        assert all(r["status"] == "ok" for r in up.json())
+    assert 1 < state["peak"] <= 2
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services.cancellation import ClientDisconnected, DisconnectWatcher
+from app.services.metrics import Metrics
+
+
+class _FakeRequest:
+    def __init__(self) -> None:
+        self.gone = False
+
+    async def is_disconnected(self) -> bool:
+        return self.gone
+
+
+@pytest.mark.asyncio
+async def test_guard_cancels_the_pending_stage_on_disconnect():
+    request = _FakeRequest()
+    watcher = DisconnectWatcher(request, poll_interval=0.01).start()
+    cancelled = asyncio.Event()
+
+    async def slow_stage() -> str:
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    assert await watcher.guard(asyncio.sleep(0, result="fast"), "rag") == "fast"
+    asyncio.get_running_loop().call_later(0.05, setattr, request, "gone", True)
+    with pytest.raises(ClientDisconnected) as info:
+        await asyncio.wait_for(watcher.guard(slow_stage(), "summarize"), timeout=2)
+    assert info.value.stage == "summarize"
+    assert cancelled.is_set() and watcher.disconnected
+    watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_iterate_stops_and_closes_the_stream():
+    request = _FakeRequest()
+    watcher = DisconnectWatcher(request, poll_interval=0.01).start()
+    closed = asyncio.Event()
+
+    async def tokens():
+        try:
+            for i in range(1000):
+                await asyncio.sleep(0.01)
+                yield str(i)
+        finally:
+            closed.set()
+
+    got = []
+    with pytest.raises(ClientDisconnected):
+        async for piece in watcher.iterate(tokens(), "generate"):
+            got.append(piece)
+            if len(got) == 3:
+                request.gone = True
+    assert 3 <= len(got) < 1000
+    assert closed.is_set()
+    watcher.stop()
+
+
+def test_metrics_snapshot_counts_and_percentiles():
+    metrics = Metrics()
+    metrics.incr("chat_cancelled_total")
+    metrics.incr("chat_cancelled_total")
+    for v in range(1, 101):
+        metrics.observe("chat_ttft_ms", v)
+    snap = metrics.snapshot()
+    assert snap["counters"] == {"chat_cancelled_total": 2}
+    assert snap["timings"]["chat_ttft_ms"]["p50"] == 51 and snap["timings"]["chat_ttft_ms"]["max"] == 100
@@ -187,3 +187,63 @@ async def test_reassign_and_reprocess(monkeypatch, tmp_path):
         assert len(ids0) > 0
 
 
+
+
+@pytest.mark.asyncio
+async def test_rename_updates_chunk_metadata(monkeypatch, tmp_path):
+    monkeypatch.setenv("CHROMA_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setenv("EMBEDDINGS_BACKEND", "FAKE")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        up = await client.post(
+            "/api/files/upload",
+            files=[("files", ("before.pdf", _pdf_bytes("rename me"), "application/pdf"))],
+        )
+        file_id = up.json()[0]["id"]
+
+        rag = RagService(chroma_path=tmp_path / "chroma")
+
+        def _names() -> set:
+            got = rag._collection.get(where={"file_id": file_id}, include=["metadatas"])  # type: ignore[arg-type]
+            metas = got.get("metadatas", [])
+            if isinstance(metas, list) and metas and isinstance(metas[0], list):
+                metas = metas[0]
+            return {m.get("file_name") for m in metas}
+
+        # Display names are stored on chunks at ingest
+        assert _names() == {"before.pdf"}
+
+        rn = await client.post(f"/api/files/{file_id}/rename", json={"name": "after.pdf"})
+        assert rn.status_code == 200
+        assert rn.json()["name"] == "after.pdf"
+        assert _names() == {"after.pdf"}
+
+        bad = await client.post(f"/api/files/{file_id}/rename", json={"name": "  "})
+        assert bad.status_code == 400
+
+
+def test_file_catalog_invalidation_reaches_other_workers(tmp_path):
+    from sqlmodel import Session, SQLModel, create_engine
+
+    from app.models.file import FileModel
+    from app.services.file_catalog import FileCatalog
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    version_file = tmp_path / "files.version"
+    worker_a, worker_b = FileCatalog(version_file), FileCatalog(version_file)
+    with Session(engine) as db:
+        record = FileModel(name="old.pdf", session_id=None, size_bytes=1)
+        db.add(record)
+        db.commit()
+        file_id = record.id
+        assert worker_a.lookup([file_id], db)[file_id].name == "old.pdf"
+
+        record.name = "new.pdf"
+        db.add(record)
+        db.commit()
+        # Still cached until some worker invalidates the entry
+        assert worker_a.lookup([file_id], db)[file_id].name == "old.pdf"
+        worker_b.invalidate(file_id)
+        assert worker_a.lookup([file_id], db)[file_id].name == "new.pdf"
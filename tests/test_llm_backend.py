@@ -0,0 +1,63 @@
+import httpx
+import pytest
+
+from app.services.llm_backend import (
+    LlmError,
+    MockBackend,
+    OllamaBackend,
+    OpenAICompatBackend,
+    StreamStats,
+    sse_data,
+)
+from app.services.llm_standin import create_standin_app
+
+
+SETTINGS = {"temperature": 0.3, "top_p": 0.9, "max_tokens": 64, "presence_penalty": None, "frequency_penalty": 0.1}
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://standin")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend_cls", [OllamaBackend, OpenAICompatBackend])
+async def test_http_backends_stream_standin_tokens_with_settings(backend_cls):
+    app = create_standin_app(tokens=["Hi", " there", "\nfriend"])
+    async with _client(app) as client:
+        backend = backend_cls("http://standin", "test-model", client=client)
+        stats = StreamStats(backend=backend.name, model=backend.model, started=0.0)
+        pieces = []
+        async for piece in backend.stream([{"role": "user", "content": "hey"}], SETTINGS):
+            stats.mark()
+            pieces.append(piece)
+
+    assert backend.join(pieces) == "Hi there\nfriend"
+    assert stats.tokens == 3 and stats.first_token_at is not None
+    kind, payload = app.state.requests[0]
+    assert payload["model"] == "test-model" and payload["stream"] is True
+    if kind == "ollama":
+        assert payload["options"] == {"temperature": 0.3, "top_p": 0.9, "num_predict": 64, "frequency_penalty": 0.1}
+        assert payload["keep_alive"] == "30m"
+    else:
+        assert payload["max_tokens"] == 64 and "presence_penalty" not in payload
+
+
+@pytest.mark.asyncio
+async def test_http_error_status_raises_llm_error():
+    async with _client(create_standin_app()) as client:
+        backend = OpenAICompatBackend("http://standin/missing", "m", client=client)
+        with pytest.raises(LlmError):
+            async for _ in backend.stream([], {}):
+                pass
+
+
+@pytest.mark.asyncio
+async def test_mock_backend_keeps_canned_reply():
+    backend = MockBackend()
+    pieces = [p async for p in backend.stream([], {})]
+    assert pieces == ["Hello", "from", "mock", "AI!"]
+    assert backend.join(pieces) == "Hello from mock AI!"
+
+
+def test_sse_framing_splits_newlines():
+    assert sse_data("a\nb") == b"data: a\ndata: b\n\n"
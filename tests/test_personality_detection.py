@@ -0,0 +1,63 @@
+import json
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models.session import MessageModel, SessionModel
+from app.services.personality_service import CueMatcher, PersonalityService, get_cue_matcher, load_cues
+
+
+def test_cues_match_on_word_boundaries_and_overlaps():
+	matcher = CueMatcher(load_cues())
+	assert matcher.decide(matcher.score("Could you tell me what they think?")) == {}
+	updates = matcher.decide(matcher.score("Short pls, HEY!! great!"))
+	assert updates == {"formality": "casual", "length": "concise", "humor": "frequent"}
+	assert matcher.decide(matcher.score("wow!!")) == {}
+
+
+def test_detection_only_scans_new_messages_and_forgets_old_ones(monkeypatch):
+	engine = create_engine("sqlite://")
+	SQLModel.metadata.create_all(engine)
+	scanned: list[str] = []
+	matcher = get_cue_matcher()
+	original = matcher.score
+
+	def counting(text):  # noqa: ANN001
+		scanned.append(text)
+		return original(text)
+
+	monkeypatch.setattr(matcher, "score", counting)
+	with Session(engine) as db:
+		session = SessionModel(name="Cues")
+		db.add(session)
+		db.commit()
+		ps = PersonalityService(db)
+
+		db.add(MessageModel(session_id=session.id, role="user", content="hey, show me the sql"))
+		db.add(MessageModel(session_id=session.id, role="assistant", content="Dear user, regards"))
+		db.commit()
+		assert ps.detect_from_messages(session.id) == {"formality": "casual", "style": "technical"}
+		assert scanned == ["hey, show me the sql"]
+
+		for i in range(20):
+			db.add(MessageModel(session_id=session.id, role="user", content=f"plain message {i}"))
+		db.commit()
+		# The cue message slid out of the 20-message window
+		assert ps.detect_from_messages(session.id) == {}
+		assert len(scanned) == 21
+		assert ps.detect_from_messages(session.id) == {}
+		assert len(scanned) == 21
+
+
+def test_weighted_cues_from_config(tmp_path, monkeypatch):
+	cues = tmp_path / "cues.json"
+	cues.write_text(
+		json.dumps({"formality": {"casual": {"cheers": 2.0}}, "swearing": {"true": {"damn": 0}}}),
+		encoding="utf-8",
+	)
+	assert CueMatcher(load_cues()).decide(CueMatcher(load_cues()).score("Regards, cheers")) == {"formality": "formal"}
+	monkeypatch.setenv("PERSONALITY_CUES_FILE", str(cues))
+	matcher = get_cue_matcher()
+	# The weighted casual cue now outweighs the formal one
+	assert matcher.decide(matcher.score("Regards, cheers")) == {"formality": "casual"}
+	# Weight 0 drops a built-in cue
+	assert matcher.decide(matcher.score("damn")) == {}
@@ -0,0 +1,39 @@
+from app.services.prompt_builder import PromptBuilder
+
+
+def _turns(n):
+    out = []
+    for i in range(n):
+        out.append({"role": "user", "content": f"question number {i} about the trip"})
+        out.append({"role": "assistant", "content": f"answer number {i} with some detail"})
+    return out
+
+
+def test_prefix_is_byte_identical_and_reuse_is_reported():
+    builder = PromptBuilder()
+    base = dict(personality="Tone: casual", summary="User plans a trip to Oslo.\r\n", knowledge=["b: 2", "a: 1"])
+
+    first = builder.build("s1", history=_turns(2) + [{"role": "user", "content": "next?"}], context=["chunk one"], **base)
+    assert first.reused_prefix_tokens == 0
+    assert [m["role"] for m in first.messages] == ["system", "user", "assistant", "user", "assistant", "system", "user"]
+    # Volatile context sits right before the latest user turn
+    assert "chunk one" in first.messages[-2]["content"] and "- a: 1\n- b: 2" in first.messages[-2]["content"]
+
+    history = _turns(2) + [{"role": "user", "content": "next?"}, {"role": "assistant", "content": "sure"}]
+    second = builder.build("s1", history=history + [{"role": "user", "content": "more"}], context=["chunk two"], **base)
+    assert second.messages[0] == first.messages[0]
+    assert second.prefix_hash == first.prefix_hash
+    # Everything up to the old context block is shared with the previous turn
+    assert second.reused_prefix_tokens >= first.prefix_tokens
+    assert second.reused_prefix_tokens < second.prompt_tokens
+
+    other = builder.build("s1", history=history, personality="Tone: formal", summary=base["summary"])
+    assert other.prefix_hash != first.prefix_hash
+
+
+def test_sessions_are_tracked_independently():
+    builder = PromptBuilder(max_sessions=1)
+    builder.build("s1", history=_turns(1))
+    builder.build("s2", history=_turns(1))
+    # s1 was evicted, so nothing is reported as reusable for it
+    assert builder.build("s1", history=_turns(1)).reused_prefix_tokens == 0
@@ -65,3 +65,37 @@ async def test_chat_unknown_session_returns_404():
         assert resp.status_code == 404
 
 
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partitions", ["false", "true"])
+async def test_deleting_a_session_deletes_its_files(monkeypatch, partitions):
+    from fpdf import FPDF
+
+    from app.services.rag import RagService
+
+    monkeypatch.setenv("VECTOR_PARTITIONS", partitions)
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=12)
+    pdf.multi_cell(0, 10, text="Quarterly harbour report for the session.")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        session_id = (await client.post("/api/sessions", json={"name": "Owner"})).json()["id"]
+        other_id = (await client.post("/api/sessions", json={"name": "Other"})).json()["id"]
+        up = await client.post(
+            "/api/files",
+            files={"file": ("report.pdf", bytes(pdf.output(dest="S")), "application/pdf")},
+            data={"session_id": session_id},
+        )
+        file_id = up.json()["id"]
+
+        assert (await client.delete(f"/api/sessions/{session_id}")).status_code == 204
+
+        listed = {f["id"] for f in (await client.get("/api/files")).json()}
+        assert file_id not in listed
+    # A private document must not surface in any other scope
+    rag = RagService()
+    for scope in ("GLOBAL", other_id, session_id):
+        hits = rag.query("harbour report", top_k=3, where={"session_id": scope})
+        assert all((h.get("metadata") or {}).get("file_id") != file_id for h in hits)
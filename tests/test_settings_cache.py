@@ -0,0 +1,69 @@
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.main import app
+from app.services.personality_service import PersonalityService
+from app.services.settings_service import SettingsCache, get_effective_settings, get_search_values
+from app.services.theme_service import ThemeService
+
+
+def _read_config(db: Session, session_id: str) -> tuple:
+    return (
+        get_effective_settings(db, session_id),
+        get_search_values(db),
+        PersonalityService(db).get_effective_for_session(session_id),
+        ThemeService(db).get_effective_for_session(session_id),
+    )
+
+
+def test_warm_chat_configuration_reads_run_no_sql(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cfg.db'}")
+    SQLModel.metadata.create_all(engine)
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, stmt, *a: statements.append(stmt))
+
+    with Session(engine) as db:
+        first = _read_config(db, "s1")
+    assert statements
+    statements.clear()
+    for _ in range(3):
+        with Session(engine) as db:
+            assert _read_config(db, "s1") == first
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_updates_are_visible_on_the_next_read():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        sid = (await client.post("/api/sessions", json={"name": "Cached"})).json()["id"]
+        assert (await client.get(f"/api/settings/session/{sid}")).json()["effective"]["temperature"] != 0.15
+        await client.post("/api/settings/global", json={"temperature": 0.15})
+        assert (await client.get(f"/api/settings/session/{sid}")).json()["effective"]["temperature"] == 0.15
+        await client.post(f"/api/settings/session/{sid}", json={"temperature": 0.9})
+        assert (await client.get(f"/api/settings/session/{sid}")).json()["effective"]["temperature"] == 0.9
+
+        await client.get("/api/personality")
+        await client.post("/api/personality", json={"humor": "frequent"})
+        assert (await client.get("/api/personality")).json()["humor"] == "frequent"
+        await client.post(f"/api/personality/session/{sid}", json={"humor": "none"})
+        assert (await client.get(f"/api/personality/session/{sid}")).json()["effective"]["humor"] == "none"
+
+
+def test_a_write_in_another_worker_invalidates_through_the_version_file(tmp_path):
+    version_file = tmp_path / "settings.version"
+    worker_a, worker_b = SettingsCache(version_file), SettingsCache(version_file)
+    loads: list[int] = []
+
+    def load() -> dict:
+        loads.append(1)
+        return {"temperature": 0.1 * len(loads)}
+
+    assert worker_a.get("global", 1, load) == {"temperature": 0.1}
+    assert worker_a.get("global", 1, load) == {"temperature": 0.1}
+    assert len(loads) == 1
+    worker_b.invalidate()
+    assert worker_a.get("global", 1, load) == {"temperature": 0.2}
+    assert worker_a.stats() == {"hits": 1, "misses": 2, "entries": 1}
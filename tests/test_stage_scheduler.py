@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.stage_scheduler import StageScheduler
+
+
+async def _sleep(seconds, value=None):
+    await asyncio.sleep(seconds)
+    return value
+
+
+async def _boom():
+    raise RuntimeError("stage failed")
+
+
+@pytest.mark.asyncio
+async def test_stages_run_concurrently_and_dependencies_release_early():
+    scheduler = StageScheduler(deadline_seconds=5)
+    scheduler.add("memory", lambda: _sleep(0.05, "m"))
+    scheduler.add("personality", lambda: _sleep(0.05, "p"))
+    scheduler.add("search", lambda: _sleep(0.3, "s"))
+    t0 = time.perf_counter()
+    scheduler.start()
+
+    done = [r.name async for r in scheduler.until(("memory", "personality"))]
+    assert sorted(done) == ["memory", "personality"]
+    # Released well before the slow search stage, and not after the sum of the two
+    assert time.perf_counter() - t0 < 0.25
+    assert scheduler.pending() == {"search"}
+    assert scheduler.ready() == []
+
+    rest = [r async for r in scheduler.until()]
+    assert [r.name for r in rest] == ["search"] and rest[0].value == "s"
+
+
+@pytest.mark.asyncio
+async def test_deadline_and_errors_are_isolated_per_stage():
+    scheduler = StageScheduler(deadline_seconds=0.1)
+    scheduler.add("slow", lambda: _sleep(5))
+    scheduler.add("broken", _boom)
+    scheduler.add("fine", lambda: _sleep(0, 1))
+    scheduler.start()
+
+    results = {r.name: r async for r in scheduler.until()}
+    assert results["slow"].timed_out and results["slow"].to_dict()["status"] == "timeout"
+    assert results["broken"].error == "stage failed"
+    assert results["fine"].ok and results["fine"].value == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_running_stages():
+    cancelled = asyncio.Event()
+
+    async def long_stage():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    scheduler = StageScheduler(deadline_seconds=30)
+    scheduler.add("long", long_stage)
+    scheduler.start()
+    await asyncio.sleep(0.01)
+    scheduler.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
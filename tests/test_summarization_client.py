@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm_backend import LlmBackend, OllamaBackend, OpenAICompatBackend
+from app.services.llm_standin import create_standin_app
+from app.services.summarization import CircuitBreaker, SummarizationService
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://standin")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend_cls", [OllamaBackend, OpenAICompatBackend])
+async def test_summary_is_streamed_through_the_shared_client(backend_cls):
+    app = create_standin_app(tokens=["- likes", " tea\n", "- lives", " in Oslo"])
+    async with _client(app) as client:
+        svc = SummarizationService(backend=backend_cls("http://standin", "sum", client=client), breaker=CircuitBreaker())
+        out = await svc.summarize("user: I like tea\nuser: I live in Oslo", max_tokens=64, context="- name: Ana")
+    assert out == "- likes tea\n- lives in Oslo"
+    kind, payload = app.state.requests[0]
+    assert payload["stream"] is True
+    prompt = payload["messages"][-1]["content"]
+    assert "- name: Ana" in prompt and "I live in Oslo" in prompt
+    assert svc.breaker.state == "closed"
+
+
+class PacedBackend(LlmBackend):
+    """Yields pieces with real delays (ASGITransport buffers whole responses)."""
+
+    def __init__(self, pieces, delay: float, first_delay: float = 0.0) -> None:
+        super().__init__("paced")
+        self.pieces, self.delay, self.first_delay = pieces, delay, first_delay
+        self.calls = 0
+
+    async def stream(self, messages, settings):  # noqa: ANN001
+        self.calls += 1
+        await asyncio.sleep(self.first_delay)
+        for i, piece in enumerate(self.pieces):
+            if i:
+                await asyncio.sleep(self.delay)
+            yield piece
+
+
+@pytest.mark.asyncio
+async def test_deadline_keeps_partial_summary_and_counts_a_failure():
+    backend = PacedBackend(["- first point\n", "- second", " point\n", "- never finished"], delay=0.1)
+    breaker = CircuitBreaker(threshold=3)
+    svc = SummarizationService(backend=backend, breaker=breaker, deadline_seconds=0.25)
+    out = await svc.summarize("a long conversation " * 20)
+    # Only complete lines received before the deadline are kept
+    assert out == "- first point\n- second point"
+    assert breaker.state == "closed" and breaker._failures == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_skips_a_slow_provider_until_the_cooldown_ends():
+    backend = PacedBackend(["late"], delay=0.0, first_delay=0.5)
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, cooldown=60.0, clock=clock)
+    svc = SummarizationService(backend=backend, breaker=breaker, deadline_seconds=0.05)
+    text = "one two three four five six seven eight nine ten eleven twelve"
+    # Nothing streamed before the deadline: heuristic fallback
+    assert await svc.summarize(text, max_tokens=10) == " ".join(text.split()[:10])
+    await svc.summarize(text, max_tokens=10)
+    assert breaker.state == "open"
+    assert await svc.summarize(text, max_tokens=10) == " ".join(text.split()[:10])
+    assert backend.calls == 2
+
+    # After the cooldown one trial request goes out; another failure re-opens immediately
+    clock.now = 61.0
+    assert breaker.state == "half_open"
+    await svc.summarize(text, max_tokens=10)
+    assert backend.calls == 3
+    assert breaker.state == "open"
+
+
+def test_breaker_closes_after_successful_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=5.0, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 5.0
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_time_queued_for_a_slot_does_not_count_against_the_deadline(monkeypatch):
+    monkeypatch.setenv("SUMMARIZER_MAX_CONCURRENCY", "1")
+    backend = PacedBackend(["- done\n"], delay=0.0, first_delay=0.15)
+    breaker = CircuitBreaker(threshold=1)
+    svc = SummarizationService(backend=backend, breaker=breaker, deadline_seconds=0.25)
+    # Each call needs 0.15s of the single slot; the later ones queue longer than the deadline
+    results = await asyncio.gather(*(svc.summarize_with_status(f"conversation {i} " * 5) for i in range(3)))
+    assert results == [("- done", True)] * 3
+    assert breaker.state == "closed" and breaker._failures == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_gives_the_half_open_slot_back():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, cooldown=5.0, clock=clock)
+    breaker.record_failure()
+    clock.now = 5.0
+    svc = SummarizationService(backend=PacedBackend(["- late\n"], delay=0.0, first_delay=10.0), breaker=breaker)
+    task = asyncio.create_task(svc.summarize("a conversation " * 5))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.state == "half_open" and breaker.allow()
@@ -83,3 +83,17 @@ async def test_system_settings_toggle_debug_logging_and_mode(monkeypatch):
         assert counter["n"] == 0
 
 
+
+
+@pytest.mark.asyncio
+async def test_system_metrics_endpoint_reports_chat_counters():
+    from app.services.metrics import get_metrics
+
+    get_metrics().incr("chat_cancelled_total")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        resp = await client.get("/api/system/metrics")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert set(data.keys()) == {"counters", "timings"}
+        assert data["counters"]["chat_cancelled_total"] >= 1